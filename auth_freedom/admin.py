@@ -1,6 +1,16 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, RecruiterProfile, CandidateProfile
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from .dedupe import merge
+from .jobs import upload_dir
+from .models import (
+    User, RecruiterProfile, CandidateProfile, Skill, SkillAlias, ProfilingRule, RequestProfile, ResumeJob,
+    DuplicateCandidate, Location, LocationAlias,
+)
+from .profiler import profile_dir
 
 class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'user_type', 'is_staff')
@@ -18,6 +28,146 @@ class CustomUserAdmin(UserAdmin):
             form.base_fields['user_type'].choices = [('candidate', 'Кандидат')]
         return form
 
+class SkillAliasInline(admin.TabularInline):
+    model = SkillAlias
+    extra = 1
+
+class SkillAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind')
+    list_filter = ('kind', 'aliases__curated')
+    search_fields = ('name', 'aliases__alias')
+    inlines = [SkillAliasInline]
+
+class LocationAliasInline(admin.TabularInline):
+    model = LocationAlias
+    extra = 1
+
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind', 'parent')
+    list_filter = ('kind',)
+    search_fields = ('name', 'aliases__alias')
+    raw_id_fields = ('parent',)
+    inlines = [LocationAliasInline]
+
+class ProfilingRuleAdmin(admin.ModelAdmin):
+    list_display = ('path_prefix', 'remaining', 'expires_at')
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    # Самые медленные захваченные запросы первыми; дамп открывается
+    # в snakeviz или через python -m pstats. Профили с отметкой «Цикл
+    # событий» сняты с асинхронных запросов и содержат чужие корутины
+    list_display = (
+        'duration_ms', 'method', 'path', 'view', 'status', 'reason', 'event_loop', 'created_at', 'download',
+    )
+    list_filter = ('reason', 'event_loop', 'method', 'status')
+    search_fields = ('path', 'view')
+    ordering = ('-duration_ms',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:profile_id>/download/', self.admin_site.admin_view(self.download_view),
+                 name='auth_freedom_requestprofile_download'),
+        ] + super().get_urls()
+
+    @admin.display(description='Профиль')
+    def download(self, obj):
+        url = reverse('admin:auth_freedom_requestprofile_download', args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, obj.file_name)
+
+    def download_view(self, request, profile_id):
+        if not self.has_view_permission(request):
+            raise Http404
+        profile = RequestProfile.objects.filter(pk=profile_id).first()
+        file_path = profile_dir() / profile.file_name if profile else None
+        if file_path is None or not file_path.exists():
+            raise Http404
+        return FileResponse(open(file_path, 'rb'), as_attachment=True, filename=profile.file_name)
+
+    def delete_model(self, request, obj):
+        (profile_dir() / obj.file_name).unlink(missing_ok=True)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for file_name in queryset.values_list('file_name', flat=True):
+            (profile_dir() / file_name).unlink(missing_ok=True)
+        super().delete_queryset(request, queryset)
+
+class ResumeJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'original_name', 'profile', 'status', 'attempts', 'run_after', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('original_name', 'profile__email')
+    raw_id_fields = ('profile',)
+    readonly_fields = ('file_name', 'size', 'attempts', 'locked_at', 'error', 'created_at', 'finished_at')
+    actions = ['retry']
+
+    @admin.action(description='Повторить выбранные задачи')
+    def retry(self, request, queryset):
+        # Файл удаляется после разбора и после окончательной ошибки;
+        # без него повторять нечего
+        ids = [
+            job_id for job_id, file_name in queryset.exclude(status='running').values_list('id', 'file_name')
+            if (upload_dir() / file_name).exists()
+        ]
+        updated = ResumeJob.objects.filter(id__in=ids).update(
+            status='pending', attempts=0, error='', run_after=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f'Поставлено в очередь: {updated}')
+
+class DuplicateCandidateAdmin(admin.ModelAdmin):
+    # Очередь проверки дублей из manage.py find_duplicates; объединение
+    # оставляет profile_a и деактивирует profile_b вместе с пользователем
+    list_display = ('id', 'candidate_a', 'candidate_b', 'reason', 'similarity', 'status', 'created_at')
+    list_filter = ('status', 'reason')
+    list_select_related = ('profile_a', 'profile_b')
+    ordering = ('status', '-similarity')
+    raw_id_fields = ('profile_a', 'profile_b')
+    readonly_fields = ('profile_a', 'profile_b', 'reason', 'similarity', 'created_at', 'reviewed_at')
+    actions = ['merge_pairs', 'dismiss_pairs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def describe(self, profile):
+        return f'#{profile.id} {profile.first_name} {profile.last_name} <{profile.email}>'
+
+    @admin.display(description='Основной профиль')
+    def candidate_a(self, obj):
+        return self.describe(obj.profile_a)
+
+    @admin.display(description='Дубль')
+    def candidate_b(self, obj):
+        return self.describe(obj.profile_b)
+
+    @admin.action(description='Объединить выбранные пары')
+    def merge_pairs(self, request, queryset):
+        merged = sum(merge(pair) for pair in queryset.filter(status='pending').order_by('id'))
+        self.message_user(request, f'Объединено: {merged}')
+
+    @admin.action(description='Отметить как не дубли')
+    def dismiss_pairs(self, request, queryset):
+        updated = queryset.filter(status='pending').update(status='dismissed', reviewed_at=timezone.now())
+        self.message_user(request, f'Отмечено: {updated}')
+
+class RecruiterProfileAdmin(admin.ModelAdmin):
+    # Счётчики меняются только через auth_freedom.counters: правка из формы
+    # затёрла бы приращения, перенесённые fold между загрузкой и сохранением
+    readonly_fields = ('processed_applications', 'successful_applications')
+
+class CandidateProfileAdmin(admin.ModelAdmin):
+    readonly_fields = ('applications_count',)
+
 admin.site.register(User, CustomUserAdmin)
-admin.site.register(RecruiterProfile)
-admin.site.register(CandidateProfile)
+admin.site.register(RecruiterProfile, RecruiterProfileAdmin)
+admin.site.register(CandidateProfile, CandidateProfileAdmin)
+admin.site.register(Skill, SkillAdmin)
+admin.site.register(Location, LocationAdmin)
+admin.site.register(ProfilingRule, ProfilingRuleAdmin)
+admin.site.register(RequestProfile, RequestProfileAdmin)
+admin.site.register(ResumeJob, ResumeJobAdmin)
+admin.site.register(DuplicateCandidate, DuplicateCandidateAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AuthFreedomConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'auth_freedom'
+
+    def ready(self):
+        from . import dedupe, extraction, facets, hashing, instrumentation, jobs, locations, matching, profile_cache, similar, skills  # noqa: F401
@@ -0,0 +1,97 @@
+import inspect
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import _clean_credentials, get_user_model, load_backend
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_login_failed
+from django.core.exceptions import PermissionDenied
+from django.views.decorators.debug import sensitive_variables
+
+from .hashing import hash_in_worker, hashing_service, timings, verify_in_worker
+
+logger = logging.getLogger('auth_freedom.hashing')
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    # ModelBackend, у которого PBKDF2 считается в пуле процессов (hashing.py).
+    # Вызывается через django.contrib.auth.authenticate (админка, формы) или
+    # aauthenticate ниже (асинхронные представления), поэтому работают
+    # AUTHENTICATION_BACKENDS и сигнал user_login_failed. Переполненная
+    # очередь пула — HashingBusy, его обрабатывают представления
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Хешируем впустую, чтобы время ответа не выдавало наличие пользователя
+            hashing_service.call(hash_in_worker, password)
+            return None
+        result = hashing_service.call(verify_in_worker, password, user.password)
+        user, rehashed = self.check_result(user, *result)
+        if rehashed:
+            # Только поле пароля: остальные поля пользователя не перезаписываются
+            UserModel._default_manager.filter(pk=user.pk).update(password=rehashed)
+        return user
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        # То же без потока: пока пул считает хеш, цикл событий обслуживает
+        # другие входы, а не ждёт в единственном потоке sync_to_async
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.aget(**{UserModel.USERNAME_FIELD: username})
+        except UserModel.DoesNotExist:
+            await hashing_service.run(hash_in_worker, password)
+            return None
+        result = await hashing_service.run(verify_in_worker, password, user.password)
+        user, rehashed = self.check_result(user, *result)
+        if rehashed:
+            await UserModel._default_manager.filter(pk=user.pk).aupdate(password=rehashed)
+        return user
+
+    def check_result(self, user, result, total_ms):
+        # Пользователь (или None) и новый хеш, если его нужно сохранить
+        valid, rehashed, hash_ms = result
+        spent = timings(total_ms, hash_ms)
+        logger.info('login user=%s queue_ms=%.1f hash_ms=%.1f rehashed=%s',
+                    user.pk, spent['queue_ms'], spent['hash_ms'], rehashed is not None)
+        if not valid or not self.user_can_authenticate(user):
+            return None, None
+        if rehashed:
+            user.password = rehashed
+        return user, rehashed
+
+
+@sensitive_variables('credentials')
+async def aauthenticate(request=None, **credentials):
+    # django.contrib.auth.aauthenticate выполняет authenticate в общем потоке
+    # sync_to_async, и входы шли бы по одному. Здесь бэкенд с aauthenticate
+    # ожидается в цикле событий, остальные вызываются как в Django
+    for backend_path in settings.AUTHENTICATION_BACKENDS:
+        backend = load_backend(backend_path)
+        try:
+            inspect.signature(backend.authenticate).bind(request, **credentials)
+        except TypeError:
+            # Бэкенд не принимает такие учётные данные
+            continue
+        try:
+            if hasattr(backend, 'aauthenticate'):
+                user = await backend.aauthenticate(request, **credentials)
+            else:
+                user = await sync_to_async(backend.authenticate)(request, **credentials)
+        except PermissionDenied:
+            break
+        if user is None:
+            continue
+        user.backend = backend_path
+        return user
+    await user_login_failed.asend(sender=__name__, credentials=_clean_credentials(credentials), request=request)
@@ -0,0 +1,149 @@
+import random
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from . import profile_cache
+from .models import CandidateProfile, CounterShard, RecruiterProfile
+
+# Имя счётчика -> (модель, поле). Поля счётчиков меняются только через
+# increment(); TrackedFieldsMixin не перезаписывает их при обычном save()
+COUNTERS = {
+    'recruiter.processed_applications': (RecruiterProfile, 'processed_applications'),
+    'recruiter.successful_applications': (RecruiterProfile, 'successful_applications'),
+    'candidate.applications_count': (CandidateProfile, 'applications_count'),
+}
+
+PROFILE_KINDS = {RecruiterProfile: 'recruiter', CandidateProfile: 'candidate'}
+
+FOLD_BATCH_SIZE = 5000
+
+
+def shard_count():
+    return getattr(settings, 'COUNTER_SHARDS', 16)
+
+
+def counter_name(model, field):
+    for name, (counter_model, counter_field) in COUNTERS.items():
+        if counter_model is model and counter_field == field:
+            return name
+    raise ValueError(f'Нет счётчика {model.__name__}.{field}')
+
+
+def increment_sql():
+    table = CounterShard._meta.db_table
+    # Только вставка или прибавление в строку случайного шарда: без чтения
+    # и без блокировки строки профиля
+    return (
+        f'INSERT INTO {table} (counter, object_id, shard, delta) VALUES (%s, %s, %s, %s) '
+        f'ON CONFLICT (counter, object_id, shard) DO UPDATE SET delta = {table}.delta + EXCLUDED.delta'
+    )
+
+
+def increment(model, object_id, field, amount=1):
+    params = [counter_name(model, field), object_id, random.randrange(shard_count()), amount]
+    with connection.cursor() as cursor:
+        cursor.execute(increment_sql(), params)
+
+
+async def aincrement(model, object_id, field, amount=1):
+    # Сырой курсор есть только в синхронном API
+    await sync_to_async(increment)(model, object_id, field, amount)
+
+
+def record_application(recruiter_id, candidate_id, successful):
+    # Обработанный рекрутером отклик кандидата: приращения всех трёх
+    # счётчиков записываются вместе или не записываются вовсе
+    with transaction.atomic():
+        increment(RecruiterProfile, recruiter_id, 'processed_applications')
+        if successful:
+            increment(RecruiterProfile, recruiter_id, 'successful_applications')
+        increment(CandidateProfile, candidate_id, 'applications_count')
+
+
+async def arecord_application(recruiter_id, candidate_id, successful):
+    await sync_to_async(record_application)(recruiter_id, candidate_id, successful)
+
+
+def pending(name):
+    return Coalesce(
+        Subquery(
+            CounterShard.objects.filter(counter=name, object_id=OuterRef('pk'))
+            .values('counter')
+            .annotate(total=Sum('delta'))
+            .values('total')
+        ),
+        Value(0),
+    )
+
+
+def live_queryset(model, field, ids):
+    # Значение в профиле плюс ещё не перенесённые приращения, одним запросом:
+    # оба слагаемых читаются из одного снимка, поэтому сумма точная
+    return (
+        model.objects.filter(pk__in=ids)
+        .annotate(live=F(field) + pending(counter_name(model, field)))
+        .values_list('pk', 'live')
+    )
+
+
+def counter_values(model, field, ids):
+    return dict(live_queryset(model, field, ids))
+
+
+async def acounter_values(model, field, ids):
+    return {pk: value async for pk, value in live_queryset(model, field, ids)}
+
+
+def counter_value(model, object_id, field):
+    return counter_values(model, field, [object_id]).get(object_id)
+
+
+def fold(batch_size=FOLD_BATCH_SIZE):
+    # Переносит приращения в поля профилей. Строки шардов удаляются с
+    # SKIP LOCKED: занятые сейчас инкрементом шарды остаются до следующего
+    # прохода, и ни инкременты, ни параллельный fold друг друга не ждут.
+    # Удаление и прибавление к профилю — в одной транзакции
+    table = CounterShard._meta.db_table
+    folded = 0
+    while True:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE id IN ('
+                    f'SELECT id FROM {table} ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED'
+                    f') RETURNING counter, object_id, delta',
+                    [batch_size],
+                )
+                rows = cursor.fetchall()
+            totals = defaultdict(int)
+            for name, object_id, delta in rows:
+                if name in COUNTERS:
+                    totals[name, object_id] += delta
+            touched = set()
+            # Профили обновляются в порядке ключа, чтобы параллельные
+            # проходы не блокировали друг друга крест-накрест
+            for (name, object_id), delta in sorted(totals.items(), key=lambda item: (item[0][1], item[0][0])):
+                if not delta:
+                    continue
+                model, field = COUNTERS[name]
+                model.objects.filter(pk=object_id).update(**{field: F(field) + delta})
+                touched.add((model, object_id))
+            transaction.on_commit(lambda touched=touched: invalidate_profiles(touched))
+        folded += len(rows)
+        if len(rows) < batch_size:
+            return folded
+
+
+def invalidate_profiles(touched):
+    # update() не вызывает post_save, поэтому кеш тела профиля сбрасываем сами
+    ids = defaultdict(list)
+    for model, object_id in touched:
+        ids[model].append(object_id)
+    for model, object_ids in ids.items():
+        for user_id in model.objects.filter(pk__in=object_ids).values_list('user_id', flat=True):
+            profile_cache.invalidate(PROFILE_KINDS[model], user_id)
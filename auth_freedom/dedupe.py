@@ -0,0 +1,280 @@
+import hashlib
+import logging
+import re
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import CandidateProfile, CandidateSignature, DuplicateCandidate, User
+from .skills import normalize
+
+logger = logging.getLogger('auth_freedom.dedupe')
+
+# Поиск дублей кандидатов. Точные совпадения — по нормализованным email и
+# телефону; похожие профили — по MinHash-подписи множества признаков (фразы
+# из резюме, слова имени, навыки) и LSH: подпись режется на BANDS полос, и
+# кандидатами считаются профили, у которых совпала хотя бы одна полоса.
+# Оценка сходства по подписи проверяется порогом DEDUPE_SIMILARITY
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+# Фраза резюме — столько слов подряд
+SHINGLE = 3
+PRIME = (1 << 31) - 1
+
+# Фиксированное зерно: подписи, посчитанные в разных запусках, сравнимы
+_rng = np.random.default_rng(20240601)
+_a = _rng.integers(1, PRIME, NUM_PERM, dtype=np.uint64)
+_b = _rng.integers(0, PRIME, NUM_PERM, dtype=np.uint64)
+
+_words = re.compile(r'\w+')
+
+# Поля, от которых зависит подпись; их изменение помечает её устаревшей
+PROFILE_FIELDS = ('first_name', 'last_name', 'email', 'phone', 'resume_text', 'hard_skill_ids', 'tech_stack_ids')
+USER_FIELDS = ('email', 'phone')
+
+LOAD_FIELDS = ('id', 'user_id', *PROFILE_FIELDS, 'user__email', 'user__phone')
+
+# Поля, которые при объединении берутся у дубля, если у основного профиля пусто
+FILL_FIELDS = (
+    'first_name', 'last_name', 'birth_date', 'about_me', 'specialization', 'phone', 'email',
+    'country', 'region', 'resume_text', 'video_presentation',
+)
+MERGED_ARRAY_FIELDS = ('hard_skills', 'soft_skills', 'tech_stack', 'languages', 'certifications')
+
+
+def email_key(email):
+    # Без регистра и "+метки"; в Gmail точки в имени не значимы
+    email = (email or '').strip().casefold()
+    local, _, domain = email.partition('@')
+    if not local or not domain:
+        return ''
+    local = local.split('+', 1)[0]
+    if domain in ('gmail.com', 'googlemail.com'):
+        local, domain = local.replace('.', ''), 'gmail.com'
+    return f'{local}@{domain}'
+
+
+def phone_key(phone):
+    # Последние 10 цифр: +7 701 ..., 8 701 ... и 701 ... — один номер
+    digits = ''.join(char for char in phone or '' if char.isdigit())
+    return digits[-10:] if len(digits) >= 7 else ''
+
+
+def features(profile):
+    words = _words.findall(normalize(profile.resume_text or ''))
+    shingles = {' '.join(words[i:i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)}
+    if words and not shingles:
+        shingles = {' '.join(words)}
+    tokens = {f'text:{shingle}' for shingle in shingles}
+    tokens |= {f'name:{word}' for word in _words.findall(normalize(f'{profile.first_name} {profile.last_name}'))}
+    tokens |= {f'skill:{skill_id}' for skill_id in [*profile.hard_skill_ids, *profile.tech_stack_ids]}
+    return tokens, len(shingles)
+
+
+def token_hash(token):
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=4).digest(), 'little')
+
+
+def minhash(tokens):
+    # Минимум каждой из NUM_PERM хеш-функций вида (a·x + b) mod p по всем признакам
+    hashes = np.fromiter((token_hash(token) for token in tokens), dtype=np.uint64, count=len(tokens))
+    return ((hashes[:, None] * _a + _b) % PRIME).min(axis=0)
+
+
+def band_hashes(signature):
+    # Номер полосы входит в хеш: одинаковые значения в разных полосах не совпадают
+    bands = []
+    for band in range(BANDS):
+        chunk = signature[band * ROWS:(band + 1) * ROWS].astype('<u4').tobytes()
+        digest = hashlib.blake2b(bytes([band]) + chunk, digest_size=8).digest()
+        bands.append(int.from_bytes(digest, 'little', signed=True))
+    return bands
+
+
+def similarity(a, b):
+    # Доля совпавших позиций подписи — оценка коэффициента Жаккара
+    if not a or not b:
+        return 0.0
+    return float(np.mean(np.asarray(a) == np.asarray(b)))
+
+
+def build_signature(profile):
+    tokens, shingles = features(profile)
+    email = email_key(profile.email or profile.user.email)
+    phone = phone_key(profile.phone or profile.user.phone)
+    source = '\n'.join([email, phone, *sorted(tokens)])
+    signature = CandidateSignature(
+        profile_id=profile.id,
+        email_key=email,
+        phone_key=phone,
+        source_hash=hashlib.blake2b(source.encode(), digest_size=16).hexdigest(),
+        stale=False,
+    )
+    if tokens:
+        values = minhash(tokens)
+        signature.minhash = [int(value) for value in values]
+        # Профиль почти без текста совпадёт с любым тёзкой с теми же
+        # навыками, поэтому в LSH такие не попадают
+        if shingles >= getattr(settings, 'DEDUPE_MIN_SHINGLES', 10):
+            signature.bands = band_hashes(values)
+    return signature
+
+
+def refresh_signatures(profiles):
+    # Пересчитывает подписи; возвращает все подписи пачки и те из них, что
+    # действительно изменились
+    stored = dict(
+        CandidateSignature.objects.filter(profile_id__in=[profile.id for profile in profiles])
+        .values_list('profile_id', 'source_hash')
+    )
+    signatures = [build_signature(profile) for profile in profiles]
+    changed = [signature for signature in signatures if stored.get(signature.profile_id) != signature.source_hash]
+    changed_ids = {signature.profile_id for signature in changed}
+    # Пометка стояла, но значимое для подписи не изменилось
+    CandidateSignature.objects.filter(
+        profile_id__in=[profile.id for profile in profiles if profile.id not in changed_ids], stale=True,
+    ).update(stale=False)
+    if changed:
+        CandidateSignature.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=['profile'],
+            update_fields=['email_key', 'phone_key', 'minhash', 'bands', 'source_hash', 'stale', 'updated_at'],
+        )
+    return signatures, changed
+
+
+def exact_pairs(signatures, field):
+    # Все пары внутри групп с одинаковым ключом, где есть профиль из signatures
+    changed_ids = {signature.profile_id for signature in signatures}
+    keys = {getattr(signature, field) for signature in signatures} - {''}
+    groups = defaultdict(set)
+    for profile_id, key in CandidateSignature.objects.filter(
+        **{f'{field}__in': keys}, profile__is_active=True,
+    ).values_list('profile_id', field):
+        groups[key].add(profile_id)
+    max_block = getattr(settings, 'DEDUPE_MAX_BLOCK', 50)
+    pairs = set()
+    for members in groups.values():
+        if len(members) > max_block:
+            # Общий служебный адрес или телефон (office@, номер колл-центра):
+            # пар стало бы квадратично много, и дублями они не являются
+            logger.warning('dedupe: %s shared by %d profiles (first id %s), block skipped',
+                           field, len(members), min(members))
+            continue
+        # Только пары с изменённым профилем: при обычном запуске их число
+        # линейно от размера группы
+        for profile_id in members & changed_ids:
+            pairs.update(tuple(sorted((profile_id, other))) for other in members if other != profile_id)
+    return pairs
+
+
+def similar_pairs(signatures):
+    # Профили, у которых совпала хотя бы одна полоса с переданным: запрос
+    # на каждую полосу идёт по GIN-индексу, сравнения всех пар нет
+    ids = [signature.profile_id for signature in signatures if signature.bands]
+    if not ids:
+        return set()
+    table = CandidateSignature._meta.db_table
+    profiles = CandidateProfile._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT DISTINCT c.profile_id, s.profile_id '
+            f'FROM {table} c CROSS JOIN LATERAL unnest(c.bands) AS band '
+            f'JOIN {table} s ON s.bands && ARRAY[band] AND s.profile_id <> c.profile_id '
+            f'JOIN {profiles} p ON p.id = s.profile_id AND p.is_active '
+            f'WHERE c.profile_id = ANY(%s)',
+            [ids],
+        )
+        return {tuple(sorted(pair)) for pair in cursor.fetchall()}
+
+
+def find_duplicates(signatures):
+    # Записывает в очередь проверки новые пары для переданных подписей
+    # (обычно изменённых); уже рассмотренные пары (в том числе "не дубли")
+    # повторно не попадают
+    pairs = {}
+    for pair in similar_pairs(signatures):
+        pairs[pair] = 'similar'
+    for pair in exact_pairs(signatures, 'phone_key'):
+        pairs[pair] = 'phone'
+    for pair in exact_pairs(signatures, 'email_key'):
+        pairs[pair] = 'email'
+    if not pairs:
+        return 0
+    involved = {profile_id for pair in pairs for profile_id in pair}
+    hashes = dict(CandidateSignature.objects.filter(profile_id__in=involved).values_list('profile_id', 'minhash'))
+    threshold = getattr(settings, 'DEDUPE_SIMILARITY', 0.7)
+    found = []
+    for (a, b), reason in pairs.items():
+        score = similarity(hashes.get(a), hashes.get(b))
+        if reason == 'similar' and score < threshold:
+            continue
+        found.append(DuplicateCandidate(profile_a_id=a, profile_b_id=b, reason=reason, similarity=score))
+    created = DuplicateCandidate.objects.bulk_create(found, ignore_conflicts=True)
+    return len(created)
+
+
+def pending_profiles(full=False):
+    # Профили без подписи или с устаревшей; full — все активные
+    queryset = CandidateProfile.objects.filter(is_active=True)
+    if not full:
+        queryset = queryset.filter(Q(signature__isnull=True) | Q(signature__stale=True))
+    return queryset.select_related('user').only(*LOAD_FIELDS).order_by('id')
+
+
+def merge(pair):
+    # Объединение: пустые поля основного профиля заполняются из дубля, массивы
+    # объединяются, дубль и его пользователь деактивируются
+    with transaction.atomic():
+        profiles = CandidateProfile.objects.select_for_update().in_bulk([pair.profile_a_id, pair.profile_b_id])
+        keeper, duplicate = profiles.get(pair.profile_a_id), profiles.get(pair.profile_b_id)
+        if keeper is None or duplicate is None:
+            return False
+        for name in FILL_FIELDS:
+            if not getattr(keeper, name) and getattr(duplicate, name):
+                setattr(keeper, name, getattr(duplicate, name))
+        for name in MERGED_ARRAY_FIELDS:
+            keeper_values = getattr(keeper, name)
+            seen = {normalize(value) for value in keeper_values}
+            setattr(keeper, name, keeper_values + [value for value in getattr(duplicate, name) if normalize(value) not in seen])
+        keeper.experience = max(keeper.experience, duplicate.experience)
+        keeper.save()
+        duplicate.is_active = False
+        duplicate.save(update_fields=['is_active'])
+        # update(): сигналы пользователя перезаписали бы профиль
+        User.objects.filter(pk=duplicate.user_id).update(is_active=False)
+        now = timezone.now()
+        DuplicateCandidate.objects.filter(pk=pair.pk).update(status='merged', reviewed_at=now)
+        # Остальные пары с дублем теряют смысл; пары с основным профилем
+        # найдутся заново по его обновлённой подписи
+        DuplicateCandidate.objects.filter(
+            Q(profile_a=duplicate) | Q(profile_b=duplicate), status='pending',
+        ).delete()
+        CandidateSignature.objects.filter(profile_id=keeper.id).update(stale=True)
+    return True
+
+
+@receiver(post_save, sender=CandidateProfile)
+def mark_profile_signature_stale(sender, instance, created, update_fields=None, **kwargs):
+    # Только пометка: подписи пересчитывает manage.py find_duplicates
+    if created or (update_fields is not None and not set(update_fields) & set(PROFILE_FIELDS)):
+        return
+    CandidateSignature.objects.filter(profile_id=instance.id, stale=False).update(stale=True)
+
+
+@receiver(post_save, sender=User)
+def mark_user_signature_stale(sender, instance, created, update_fields=None, **kwargs):
+    if created or instance.user_type != 'candidate':
+        return
+    if update_fields is not None and not set(update_fields) & set(USER_FIELDS):
+        return
+    CandidateSignature.objects.filter(profile__user_id=instance.id, stale=False).update(stale=True)
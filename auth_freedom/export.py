@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import CandidateProfile
+from .search import build_filters
+
+EXPORT_FIELDS = (
+    'id', 'first_name', 'last_name', 'email', 'phone', 'specialization', 'level',
+    'experience', 'country', 'region', 'desired_salary', 'search_status',
+    'relocation_status', 'hard_skills', 'soft_skills', 'tech_stack', 'languages',
+    'certifications', 'education', 'projects',
+)
+
+# Сколько строк читается с сервера за раз и сколько строк собирается в один
+# фрагмент ответа
+CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+
+
+def export_queryset(params, known=None):
+    return (
+        CandidateProfile.objects.filter(build_filters(params, known))
+        .order_by('id')
+        .values_list(*EXPORT_FIELDS)
+    )
+
+
+def csv_cell(value):
+    if isinstance(value, list):
+        return ', '.join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False, cls=DjangoJSONEncoder)
+    return value
+
+
+class ExportWriter:
+    # Превращает пачки строк в байты ответа; при сжатии gzip-поток
+    # продолжается между пачками
+    def __init__(self, file_format='csv', compress=False):
+        self.file_format = file_format
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def _encode(self, text):
+        data = text.encode('utf-8')
+        return self.compressor.compress(data) if self.compressor else data
+
+    def header(self):
+        if self.file_format != 'csv':
+            return b''
+        return self.write_csv([EXPORT_FIELDS], raw=True)
+
+    def write_csv(self, rows, raw=False):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(row if raw else [csv_cell(value) for value in row])
+        return self._encode(buffer.getvalue())
+
+    def write(self, rows):
+        if self.file_format == 'csv':
+            return self.write_csv(rows)
+        lines = [json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False, cls=DjangoJSONEncoder) for row in rows]
+        return self._encode('\n'.join(lines) + '\n')
+
+    def close(self):
+        return self.compressor.flush() if self.compressor else b''
+
+
+def export_candidates(queryset, file_format='csv', compress=False):
+    # queryset — результат export_queryset: ошибки фильтров возникают при его
+    # построении, до начала ответа. iterator() на PostgreSQL читает через
+    # серверный курсор порциями по CHUNK_SIZE, поэтому память не растёт
+    # с числом строк
+    rows = queryset.iterator(chunk_size=CHUNK_SIZE)
+    writer = ExportWriter(file_format, compress)
+    yield writer.header()
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == ROWS_PER_WRITE:
+            yield writer.write(batch)
+            batch = []
+    if batch:
+        yield writer.write(batch)
+    yield writer.close()
+
+
+async def aexport_candidates(queryset, file_format='csv', compress=False):
+    writer = ExportWriter(file_format, compress)
+    yield writer.header()
+    batch = []
+    async for row in queryset.aiterator(chunk_size=CHUNK_SIZE):
+        batch.append(row)
+        if len(batch) == ROWS_PER_WRITE:
+            yield writer.write(batch)
+            batch = []
+    if batch:
+        yield writer.write(batch)
+    yield writer.close()
@@ -0,0 +1,216 @@
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CandidateProfile, Skill, SkillAlias
+from .skills import normalize
+
+# Поиск навыков словаря в resume_text и about_me. Проверенные написания
+# (SkillAlias.curated) собираются в один автомат Ахо — Корасик, и текст
+# проходится один раз независимо от размера словаря. Написания, которые
+# intern() создаёт из ввода пользователей, в автомат не входят, пока их не
+# отметят в админке
+
+TEXT_FIELDS = ('resume_text', 'about_me')
+# Найденные навыки дописываются сюда; tech_stack пользователь ведёт сам
+TARGET_FIELD = 'hard_skills'
+
+
+def is_word_char(char):
+    # "+" и "#" — часть слова: "c" не должен находиться внутри "c++" и "c#"
+    return char.isalnum() or char in '_+#'
+
+
+class Automaton:
+    def __init__(self, patterns):
+        # patterns: нормализованное написание -> (id навыка, название)
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.values = []
+        for pattern, value in patterns.items():
+            self._add(pattern, len(self.values))
+            self.values.append(value)
+        self._link()
+
+    def _add(self, pattern, index):
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append((len(pattern), index))
+
+    def _link(self):
+        # Обход в ширину: суффиксная ссылка ведёт в самое длинное состояние,
+        # совпадающее с суффиксом текущего; выходы наследуются по ссылке
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def __len__(self):
+        return len(self.values)
+
+    def find(self, text):
+        # Значения найденных написаний в порядке первого появления; совпадение
+        # засчитывается только целым словом
+        found = {}
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, index in output[state]:
+                if index in found:
+                    continue
+                start = end - length
+                if start > 0 and is_word_char(text[start - 1]):
+                    continue
+                if end < len(text) and is_word_char(text[end]):
+                    continue
+                found[index] = None
+        return [self.values[index] for index in found]
+
+
+_automaton = None
+_built_at = 0.0
+_lock = threading.Lock()
+
+
+def build():
+    min_length = getattr(settings, 'SKILL_EXTRACTION_MIN_LENGTH', 2)
+    patterns = {}
+    aliases = SkillAlias.objects.filter(kind='skill', curated=True).values_list('alias', 'skill_id', 'skill__name')
+    for alias, skill_id, name in aliases:
+        if len(alias) >= min_length:
+            patterns[alias] = (skill_id, name)
+    return Automaton(patterns)
+
+
+def automaton():
+    # Автомат строится лениво и перестраивается не реже раза в
+    # SKILL_EXTRACTION_RELOAD_SECONDS: новые навыки создаются другими процессами
+    global _automaton, _built_at
+    reload_seconds = getattr(settings, 'SKILL_EXTRACTION_RELOAD_SECONDS', 300)
+    with _lock:
+        if _automaton is not None and time.monotonic() - _built_at < reload_seconds:
+            return _automaton
+    built = build()
+    with _lock:
+        _automaton, _built_at = built, time.monotonic()
+    return built
+
+
+def clear_automaton():
+    global _automaton
+    with _lock:
+        _automaton = None
+
+
+def extract(text):
+    # [(id навыка, название)] для навыков словаря, упомянутых в тексте
+    text = normalize(text or '')
+    if not text:
+        return []
+    return automaton().find(text)
+
+
+def missing_skills(profile):
+    # Навыки из текстов профиля, которых ещё нет ни в hard_skills, ни в tech_stack
+    known_ids = set(profile.hard_skill_ids) | set(profile.tech_stack_ids)
+    known_names = {normalize(name) for name in [*profile.hard_skills, *profile.tech_stack]}
+    missing = []
+    for field_name in TEXT_FIELDS:
+        for skill_id, name in extract(getattr(profile, field_name)):
+            if skill_id not in known_ids and normalize(name) not in known_names:
+                known_ids.add(skill_id)
+                known_names.add(normalize(name))
+                missing.append((skill_id, name))
+    return missing
+
+
+def on_save_enabled():
+    return getattr(settings, 'SKILL_EXTRACTION_ON_SAVE', True)
+
+
+def extract_profile_skills(profile, update_fields=None):
+    # Вызывается из CandidateProfile.save(): если изменился текст резюме или
+    # «о себе», найденные навыки дописываются в hard_skills. Возвращает
+    # изменённые поля
+    if not on_save_enabled():
+        return set()
+    if update_fields is not None and not set(update_fields) & set(TEXT_FIELDS):
+        return set()
+    if not any(field_name in profile.__dict__ for field_name in TEXT_FIELDS):
+        return set()
+    if not profile._state.adding and not profile.get_dirty_fields() & set(TEXT_FIELDS):
+        return set()
+    missing = missing_skills(profile)
+    if not missing:
+        return set()
+    # Названия канонические, intern_profile_skills() сопоставит им id
+    profile.hard_skills = [*profile.hard_skills, *(name for _, name in missing)]
+    return {TARGET_FIELD}
+
+
+LOAD_FIELDS = ('id', 'user_id', *TEXT_FIELDS, 'hard_skills', 'tech_stack', 'hard_skill_ids', 'tech_stack_ids')
+
+
+def extract_chunk(first_id, last_id, dry_run=False):
+    # Выполняется в процессе пула manage.py extract_skills: обрабатывает
+    # профили с id в [first_id, last_id]. Возвращает (профилей, изменено, навыков)
+    close_old_connections()
+    changed = added = 0
+    with transaction.atomic():
+        profiles = CandidateProfile.objects.filter(id__gte=first_id, id__lte=last_id).order_by('id').only(*LOAD_FIELDS)
+        if not dry_run:
+            # Строки заблокированы от чтения до записи: правка профиля,
+            # пришедшая в это время, не затрётся
+            profiles = profiles.select_for_update()
+        profiles = list(profiles)
+        for profile in profiles:
+            missing = missing_skills(profile)
+            if not missing:
+                continue
+            changed += 1
+            added += len(missing)
+            if dry_run:
+                continue
+            profile.hard_skills = [*profile.hard_skills, *(name for _, name in missing)]
+            # save(): id навыков проставит intern_profile_skills, сигналы
+            # запишут дельты фасетов, пометят подписи и векторы устаревшими
+            # и сбросят кеш профиля
+            profile.save(update_fields=[TARGET_FIELD])
+    return len(profiles), changed, added
+
+
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+@receiver(post_save, sender=SkillAlias)
+@receiver(post_delete, sender=SkillAlias)
+def reset_automaton(sender, instance, created=False, **kwargs):
+    # Автомат этого процесса перестраивается и при добавлении проверенного
+    # написания; навыки и написания, созданные intern() из ввода
+    # пользователей, его не меняют. Другие процессы подхватят изменения при
+    # плановой перестройке
+    if created and not getattr(instance, 'curated', False):
+        return
+    clear_automaton()
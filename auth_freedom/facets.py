@@ -0,0 +1,297 @@
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .locations import alocation_names, location_id, location_names
+from .models import CandidateProfile, FacetCount, FacetDelta
+from .search import CHOICE_FILTERS, SearchError
+
+# Измерения фасетов; массивы дают по значению на каждый элемент
+SCALAR_DIMENSIONS = ('level', 'search_status', 'relocation_status', 'country', 'region')
+# Поле профиля для измерения; места считаются по id справочника
+SCALAR_COLUMNS = {dimension: dimension for dimension in SCALAR_DIMENSIONS} | {
+    'country': 'country_id',
+    'region': 'region_id',
+}
+LOCATION_DIMENSIONS = ('country', 'region')
+ARRAY_DIMENSIONS = ('hard_skills', 'languages')
+DIMENSIONS = SCALAR_DIMENSIONS + ARRAY_DIMENSIONS
+
+# Измерения, по значению которых можно сузить фасеты. Навыки сюда не входят:
+# пары навык×навык дали бы квадратичное по числу навыков число счётчиков
+CONTEXT_DIMENSIONS = SCALAR_DIMENSIONS + ('languages',)
+
+# Сколько самых частых значений отдаётся по каждому измерению
+TOP_VALUES = 20
+
+FACET_FIELDS = tuple(SCALAR_COLUMNS.values()) + ARRAY_DIMENSIONS + ('is_active',)
+
+
+def profile_facets(values):
+    # values — словарь поле -> значение; None для неактивного профиля
+    if not values.get('is_active'):
+        return None
+    facets = {}
+    for dimension in SCALAR_DIMENSIONS:
+        value = values.get(SCALAR_COLUMNS[dimension])
+        facets[dimension] = {str(value)} if value not in (None, '') else set()
+    for dimension in ARRAY_DIMENSIONS:
+        facets[dimension] = {value for value in values.get(dimension) or () if value}
+    return facets
+
+
+def facet_keys(facets):
+    # Ключи счётчиков, в которые входит профиль: все значения без контекста
+    # и все пары (значение контекста, значение другого измерения)
+    if facets is None:
+        return []
+    keys = [('', '', dimension, value) for dimension in DIMENSIONS for value in facets[dimension]]
+    for context_dimension in CONTEXT_DIMENSIONS:
+        for context_value in facets[context_dimension]:
+            for dimension in DIMENSIONS:
+                if dimension == context_dimension:
+                    continue
+                keys.extend((context_dimension, context_value, dimension, value) for value in facets[dimension])
+    return keys
+
+
+def apply_delta(delta, cursor):
+    delta = sorted((key, count) for key, count in delta.items() if count)
+    if not delta:
+        return
+    # Один INSERT ... ON CONFLICT на всю пачку; строки в порядке ключа,
+    # чтобы параллельные транзакции блокировали их в одном порядке
+    table = FacetCount._meta.db_table
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s)'] * len(delta))
+    params = [item for key, count in delta for item in (*key, count)]
+    cursor.execute(
+        f'INSERT INTO {table} (context_dimension, context_value, dimension, value, count) '
+        f'VALUES {placeholders} '
+        f'ON CONFLICT (context_dimension, context_value, dimension, value) '
+        f'DO UPDATE SET count = {table}.count + EXCLUDED.count',
+        params,
+    )
+
+
+def update_facets(old, new):
+    # Изменение записывается в очередь FacetDelta в транзакции профиля:
+    # только вставка новых строк, общие счётчики не блокируются
+    delta = Counter(facet_keys(new))
+    delta.subtract(facet_keys(old))
+    FacetDelta.objects.bulk_create(
+        FacetDelta(context_dimension=context_dimension, context_value=context_value,
+                   dimension=dimension, value=value, delta=count)
+        for (context_dimension, context_value, dimension, value), count in delta.items() if count
+    )
+
+
+# Ключ advisory-блокировки: перенос очереди и полный пересчёт не идут одновременно
+FACET_LOCK = 0x46414345
+
+FOLD_BATCH_SIZE = 5000
+
+
+def fold(batch_size=FOLD_BATCH_SIZE):
+    # Переносит очередь FacetDelta в FacetCount пачками: строки очереди
+    # удаляются и прибавляются к счётчикам в одной транзакции. Запускать
+    # часто (manage.py fold_facets): до переноса фасеты не видят изменений
+    table = FacetDelta._meta.db_table
+    folded = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [FACET_LOCK])
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN ('
+                f'SELECT id FROM {table} ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED'
+                f') RETURNING context_dimension, context_value, dimension, value, delta',
+                [batch_size],
+            )
+            rows = cursor.fetchall()
+            totals = Counter()
+            for *key, delta in rows:
+                totals[tuple(key)] += delta
+            apply_delta(totals, cursor)
+        folded += len(rows)
+        if len(rows) < batch_size:
+            return folded
+
+
+def stored_values(instance):
+    # Значения полей фасетов до сохранения: из снимка TrackedFieldsMixin,
+    # а поля без снимка (отложенные при загрузке) — одним запросом к БД
+    loaded = getattr(instance, '_loaded_values', {})
+    values = {name: loaded[name] for name in FACET_FIELDS if name in loaded}
+    missing = [name for name in FACET_FIELDS if name not in values]
+    if missing:
+        values.update(CandidateProfile.objects.filter(pk=instance.pk).values(*missing).first() or {})
+    return values
+
+
+def current_values(instance, stored):
+    # Незагруженное поле не могло быть записано, его значение — прежнее
+    return {name: instance.__dict__[name] if name in instance.__dict__ else stored.get(name)
+            for name in FACET_FIELDS}
+
+
+@receiver(pre_save, sender=CandidateProfile)
+def remember_facets(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding:
+        instance._facet_values = {}
+    elif update_fields is not None and not set(update_fields) & set(FACET_FIELDS):
+        # Поля фасетов не пишутся — счётчики не меняются
+        instance._facet_values = None
+    else:
+        instance._facet_values = stored_values(instance)
+
+
+@receiver(post_save, sender=CandidateProfile)
+def count_facets(sender, instance, **kwargs):
+    # Очередь пишется в той же транзакции, что и профиль
+    stored = getattr(instance, '_facet_values', None)
+    if stored is None:
+        return
+    update_facets(profile_facets(stored), profile_facets(current_values(instance, stored)))
+
+
+@receiver(pre_delete, sender=CandidateProfile)
+def uncount_facets(sender, instance, **kwargs):
+    # pre_delete: после удаления отложенные поля уже не дочитать
+    update_facets(profile_facets(stored_values(instance)), None)
+
+
+def reconcile():
+    # Полный пересчёт из профилей. Массовые операции (bulk_create,
+    # bulk_update, update()) сигналов не вызывают, их изменения попадают
+    # в счётчики здесь. Возвращает число исправленных счётчиков.
+    # Счётчики собираются во временной таблице и в той же транзакции
+    # заменяют строки FacetCount: таблица с её ограничениями и индексами
+    # остаётся, запись профилей пересчёт не останавливает, а чтение до
+    # коммита видит прежние счётчики
+    table = FacetCount._meta.db_table
+    queue = FacetDelta._meta.db_table
+    profiles = CandidateProfile._meta.db_table
+    staging = f'{table}_staging'
+    key = 'context_dimension, context_value, dimension, value'
+    scalar_values = ' UNION ALL '.join(
+        f"SELECT id, '{dimension}' AS dimension, {column}::varchar AS value "
+        f"FROM {profiles} WHERE is_active AND {column}::varchar <> ''"
+        for dimension, column in SCALAR_COLUMNS.items()
+    )
+    array_values = ' UNION ALL '.join(
+        f"SELECT DISTINCT id, '{dimension}', item "
+        f"FROM {profiles}, unnest({dimension}) AS item WHERE is_active AND item <> ''"
+        for dimension in ARRAY_DIMENSIONS
+    )
+    contexts = ', '.join(f"'{dimension}'" for dimension in CONTEXT_DIMENSIONS)
+    outermost = not connection.in_atomic_block
+    with connection.cursor() as cursor:
+        # Сессионная блокировка берётся до транзакции: снимок пересчёта
+        # создаётся уже после того, как закончится идущий перенос очереди
+        cursor.execute('SELECT pg_advisory_lock(%s)', [FACET_LOCK])
+        try:
+            with transaction.atomic():
+                if outermost:
+                    # Все запросы ниже видят один снимок: строки очереди,
+                    # видимые в нём, уже учтены в пересчёте и удаляются, а
+                    # закоммиченные позже остаются для fold
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+                cursor.execute(f'DROP TABLE IF EXISTS pg_temp.{staging}')
+                cursor.execute(f'CREATE TEMP TABLE {staging} AS SELECT {key}, count FROM {table} WITH NO DATA')
+                cursor.execute(
+                    f'INSERT INTO {staging} ({key}, count) '
+                    f'WITH facet_values AS ({scalar_values} UNION ALL {array_values}) '
+                    f"SELECT '', '', dimension, value, count(*) "
+                    f'FROM facet_values GROUP BY dimension, value '
+                    f'UNION ALL '
+                    f'SELECT c.dimension, c.value, f.dimension, f.value, count(*) '
+                    f'FROM facet_values c JOIN facet_values f ON f.id = c.id AND f.dimension <> c.dimension '
+                    f'WHERE c.dimension IN ({contexts}) '
+                    f'GROUP BY c.dimension, c.value, f.dimension, f.value'
+                )
+                # Расхождения с текущими счётчиками вместе с неперенесённой очередью
+                cursor.execute(
+                    f'SELECT count(*) FROM ('
+                    f'SELECT {key}, sum(count) AS count FROM ('
+                    f'SELECT {key}, count FROM {table} UNION ALL SELECT {key}, delta FROM {queue}'
+                    f') current GROUP BY {key}) c '
+                    f'FULL JOIN {staging} s USING ({key}) '
+                    f'WHERE COALESCE(c.count, 0) <> COALESCE(s.count, 0)'
+                )
+                fixed = cursor.fetchone()[0]
+                cursor.execute(f'DELETE FROM {queue}')
+                # DELETE, а не TRUNCATE: TRUNCATE заблокировал бы чтение до коммита
+                cursor.execute(f'DELETE FROM {table}')
+                cursor.execute(f'INSERT INTO {table} ({key}, count) SELECT {key}, count FROM {staging}')
+                cursor.execute(f'DROP TABLE {staging}')
+        finally:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [FACET_LOCK])
+    return fixed
+
+
+def facet_context(params):
+    # Контекст — не больше одного фильтра с одним значением: ?level=senior
+    selected = [(dimension, params[dimension].strip()) for dimension in CONTEXT_DIMENSIONS
+                if params.get(dimension, '').strip()]
+    if len(selected) > 1 or any(',' in value for _, value in selected):
+        raise SearchError('Фасеты считаются для одного фильтра с одним значением')
+    if not selected:
+        return '', ''
+    dimension, value = selected[0]
+    choices = CHOICE_FILTERS.get(dimension)
+    if choices is not None and value not in choices:
+        raise SearchError(f'Некорректное значение {dimension}: {value}')
+    if dimension in LOCATION_DIMENSIONS:
+        # Счётчики хранятся по id места; неизвестное место — пустые фасеты
+        found = location_id(dimension, value)
+        value = str(found) if found is not None else '0'
+    return dimension, value
+
+
+def facet_queryset(params, context=None):
+    # Строки счётчиков для контекста; для измерения самого контекста берутся
+    # общие счётчики, чтобы были видны и соседние значения
+    context_dimension, context_value = context or facet_context(params)
+    condition = Q(context_dimension=context_dimension, context_value=context_value)
+    if context_dimension:
+        condition |= Q(context_dimension='', context_value='', dimension=context_dimension)
+    return (
+        FacetCount.objects.filter(condition, count__gt=0)
+        .annotate(position=Window(
+            RowNumber(), partition_by=F('dimension'), order_by=[F('count').desc(), F('value')],
+        ))
+        .filter(position__lte=TOP_VALUES)
+        .order_by('dimension', 'position')
+        .values_list('dimension', 'value', 'count')
+    )
+
+
+def location_ids(rows):
+    return {value for dimension, value, _ in rows if dimension in LOCATION_DIMENSIONS}
+
+
+def group_facets(rows, names):
+    # names — id места -> название для измерений country и region
+    facets = {dimension: [] for dimension in DIMENSIONS}
+    for dimension, value, count in rows:
+        if dimension in LOCATION_DIMENSIONS:
+            facets[dimension].append({'value': names.get(int(value), ''), 'id': int(value), 'count': count})
+        else:
+            facets[dimension].append({'value': value, 'count': count})
+    return facets
+
+
+def facet_counts(params):
+    rows = list(facet_queryset(params))
+    return group_facets(rows, location_names(location_ids(rows)))
+
+
+async def afacet_counts(params):
+    # Место из контекста ищется в справочнике синхронно
+    context = await sync_to_async(facet_context)(params)
+    rows = [row async for row in facet_queryset(params, context)]
+    return group_facets(rows, await alocation_names(location_ids(rows)))
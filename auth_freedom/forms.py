@@ -1,6 +1,13 @@
+import logging
+import time
+
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from django.db import transaction
 from .models import User, CandidateProfile
+from .skills import canonical_names, intern_profile_skills
+
+logger = logging.getLogger('auth_freedom.registration')
 
 class ExtendedUserRegistrationForm(UserCreationForm):
     # Основные поля пользователя
@@ -97,42 +104,83 @@ class ExtendedUserRegistrationForm(UserCreationForm):
 
     def clean_languages(self):
         languages = self.cleaned_data.get('languages')
-        return [lang.strip() for lang in languages.split(',') if lang.strip()]
+        return canonical_names(languages.split(','), kind='language')
 
     def clean_hard_skills(self):
         hard_skills = self.cleaned_data.get('hard_skills')
-        return [skill.strip() for skill in hard_skills.split(',') if skill.strip()]
+        return canonical_names(hard_skills.split(','))
 
     def clean_soft_skills(self):
         soft_skills = self.cleaned_data.get('soft_skills')
-        return [skill.strip() for skill in soft_skills.split(',') if skill.strip()]
+        return canonical_names(soft_skills.split(','))
+
+    # Готовый хеш пароля: асинхронная регистрация считает его в пуле процессов
+    # и кладёт сюда вместе с timings (queue_ms, hash_ms)
+    password_hash = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = {}
+
+    def build_profile(self, user):
+        # Профиль создаётся из данных формы, сигнал его не создаёт
+        return CandidateProfile(
+            user=user,
+            first_name=self.cleaned_data['first_name'],
+            last_name=self.cleaned_data['last_name'],
+            email=self.cleaned_data['email'],
+            phone=self.cleaned_data['phone'],
+            birth_date=self.cleaned_data['birth_date'],
+            gender=self.cleaned_data['gender'],
+            about_me=self.cleaned_data['about_me'],
+            specialization=self.cleaned_data['specialization'],
+            experience=self.cleaned_data['experience'],
+            country=self.cleaned_data['country'],
+            region=self.cleaned_data['region'],
+            languages=self.cleaned_data['languages'],
+            desired_salary=self.cleaned_data['desired_salary'],
+            search_status=self.cleaned_data['search_status'],
+            relocation_status=self.cleaned_data['relocation_status'],
+            level=self.cleaned_data['level'],
+            hard_skills=self.cleaned_data['hard_skills'],
+            soft_skills=self.cleaned_data['soft_skills']
+        )
+
+    def set_password_and_save(self, user, password_field_name='password1', commit=True):
+        # Вызывается из UserCreationForm.save; готовый хеш заменяет set_password
+        if self.password_hash is None:
+            return super().set_password_and_save(user, password_field_name, commit)
+        user.password = self.password_hash
+        if commit:
+            user.save()
+        return user
 
     def save(self, commit=True):
+        started = time.perf_counter()
         user = super().save(commit=False)
+        if self.password_hash is None:
+            # Хеш посчитал set_password в этом потоке
+            self.timings = {'hash_ms': (time.perf_counter() - started) * 1000}
         user.user_type = 'candidate'
+        # Профиль создаёт build_profile, а не сигнал
+        user._skip_profile_creation = True
         if commit:
-            user.save()
-            CandidateProfile.objects.create(
-                user=user,
-                first_name=self.cleaned_data['first_name'],
-                last_name=self.cleaned_data['last_name'],
-                email=self.cleaned_data['email'],
-                phone=self.cleaned_data['phone'],
-                birth_date=self.cleaned_data['birth_date'],
-                gender=self.cleaned_data['gender'],
-                about_me=self.cleaned_data['about_me'],
-                specialization=self.cleaned_data['specialization'],
-                experience=self.cleaned_data['experience'],
-                country=self.cleaned_data['country'],
-                region=self.cleaned_data['region'],
-                languages=self.cleaned_data['languages'],
-                desired_salary=self.cleaned_data['desired_salary'],
-                search_status=self.cleaned_data['search_status'],
-                relocation_status=self.cleaned_data['relocation_status'],
-                level=self.cleaned_data['level'],
-                hard_skills=self.cleaned_data['hard_skills'],
-                soft_skills=self.cleaned_data['soft_skills']
-            )
+            started = time.perf_counter()
+            profile = self.build_profile(user)
+            # Неизвестные навыки и языки заводятся в словаре до транзакции
+            # регистрации, своими короткими транзакциями; save() профиля
+            # найдёт их в кеше и ничего не создаст
+            intern_profile_skills(profile)
+            # В транзакции — INSERT пользователя и профиля и записи их
+            # сигналов: места только читаются из справочника, фасеты
+            # дописываются в очередь FacetDelta без блокировки счётчиков
+            with transaction.atomic():
+                user.save()
+                profile.user = user
+                profile.save()
+            self.timings['db_ms'] = (time.perf_counter() - started) * 1000
+            logger.info('registration user=%s queue_ms=%.1f hash_ms=%.1f db_ms=%.1f', user.pk,
+                        self.timings.get('queue_ms', 0.0), self.timings.get('hash_ms', 0.0), self.timings['db_ms'])
         return user
 
 class UserLoginForm(forms.Form):
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import caches
+from django.dispatch import receiver
+
+from . import instrumentation
+
+logger = logging.getLogger('auth_freedom.hashing')
+
+
+class HashingBusy(Exception):
+    # Очередь пула заполнена: запрос отклоняется сразу, а не ждёт
+    pass
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+# Функции ниже выполняются в процессах пула: они должны быть на уровне модуля,
+# чтобы их можно было передать через pickle, и не обращаются к БД
+
+def init_worker(settings_module):
+    # При запуске через spawn процесс пула стартует без настроенного Django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def hash_in_worker(password):
+    started = time.perf_counter()
+    encoded = make_password(password)
+    return encoded, (time.perf_counter() - started) * 1000
+
+
+def verify_in_worker(password, encoded):
+    # Возвращает новый хеш, если пароль верен, но хранится в устаревшем
+    # формате (другой алгоритм или меньше итераций): перехеширование идёт
+    # тем же вызовом, без второго прохода через очередь
+    started = time.perf_counter()
+    rehashed = []
+    valid = check_password(password, encoded, setter=lambda raw: rehashed.append(make_password(raw)))
+    return valid, (rehashed[0] if rehashed else None), (time.perf_counter() - started) * 1000
+
+
+class HashingService:
+    # Ограниченный пул процессов: PBKDF2 не занимает ни цикл событий, ни
+    # потоки воркера, а при всплеске входов очередь не растёт без предела
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pending = 0
+
+    @staticmethod
+    def workers():
+        return getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+
+    @staticmethod
+    def max_queue():
+        return getattr(settings, 'PASSWORD_HASH_MAX_QUEUE', 64)
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers(),
+                initializer=init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'freedom_hk.settings'),),
+            )
+        return self.executor
+
+    def _release(self, future):
+        with self.lock:
+            self.pending -= 1
+
+    def submit(self, func, *args):
+        with self.lock:
+            if self.pending >= self.max_queue():
+                raise HashingBusy()
+            self.pending += 1
+            executor = self.get_executor()
+        try:
+            future = executor.submit(func, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, func, *args):
+        # Результат функции пула и общее время с момента постановки в очередь
+        started = time.perf_counter()
+        result = await asyncio.wrap_future(self.submit(func, *args))
+        return result, (time.perf_counter() - started) * 1000
+
+    def call(self, func, *args):
+        # То же для синхронного кода: поток ждёт, а считает процесс пула
+        started = time.perf_counter()
+        result = self.submit(func, *args).result()
+        return result, (time.perf_counter() - started) * 1000
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+
+hashing_service = HashingService()
+
+
+def timings(total_ms, hash_ms):
+    # Ожидание в очереди и само хеширование считаются раздельно
+    result = {'queue_ms': max(0.0, total_ms - hash_ms), 'hash_ms': hash_ms}
+    instrumentation.record('hash', result['hash_ms'])
+    instrumentation.record('hash_queue', result['queue_ms'])
+    return result
+
+
+async def hash_password(password):
+    (encoded, hash_ms), total_ms = await hashing_service.run(hash_in_worker, password)
+    return encoded, timings(total_ms, hash_ms)
+
+
+class TokenBucket:
+    # Ведро токенов в кеше: capacity попыток подряд, затем rate попыток в секунду.
+    # Чтение и запись не атомарны, при гонке возможна лишняя попытка — для
+    # ограничения перебора это допустимо
+    def __init__(self, name, capacity, rate):
+        self.name = name
+        self.capacity = capacity
+        self.rate = rate
+
+    def key(self, value):
+        return f'ratelimit:{self.name}:{value}'
+
+    def _tokens(self, state, now):
+        tokens, updated = state or (self.capacity, now)
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def _take(self, state, now):
+        tokens = self._tokens(state, now)
+        if tokens < 1:
+            return None, (1 - tokens) / self.rate
+        return (tokens - 1, now), 0
+
+    def timeout(self):
+        return int(self.capacity / self.rate) + 1
+
+    @staticmethod
+    def cache():
+        # Общий для всех процессов кеш (см. CACHES), иначе у каждого воркера
+        # было бы своё ведро
+        return caches[getattr(settings, 'RATELIMIT_CACHE_ALIAS', 'default')]
+
+    async def atake(self, value):
+        now = time.time()
+        state, retry_after = self._take(await self.cache().aget(self.key(value)), now)
+        if state is None:
+            raise RateLimited(retry_after)
+        await self.cache().aset(self.key(value), state, timeout=self.timeout())
+
+    def take(self, value):
+        # Списание без отказа: пустое ведро просто остаётся пустым
+        now = time.time()
+        state, _ = self._take(self.cache().get(self.key(value)), now)
+        if state is not None:
+            self.cache().set(self.key(value), state, timeout=self.timeout())
+
+    async def acheck(self, value):
+        # Проверка без списания
+        tokens = self._tokens(await self.cache().aget(self.key(value)), time.time())
+        if tokens < 1:
+            raise RateLimited((1 - tokens) / self.rate)
+
+
+def bucket(name, default):
+    capacity, rate = getattr(settings, 'PASSWORD_RATE_LIMITS', {}).get(name, default)
+    return TokenBucket(name, capacity, rate)
+
+
+def client_ip(request):
+    # X-Forwarded-For не используем: его может подставить сам клиент
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def username_bucket():
+    return bucket('username', (5, 0.1))
+
+
+async def check_rate(request, username=None):
+    # Проверка до хеширования: отклонённая попытка не стоит ни одного PBKDF2.
+    # С адреса списывается каждая попытка, с имени — только неудачные
+    # (charge_failed_login), чтобы владелец мог войти, пока ведро не пусто
+    await bucket('ip', (20, 1.0)).atake(client_ip(request))
+    if username:
+        await username_bucket().acheck(username.lower())
+
+
+@receiver(user_login_failed)
+def charge_failed_login(sender, credentials, **kwargs):
+    # Отправляется django.contrib.auth.authenticate при неверном пароле или
+    # неизвестном имени, в том числе из админки
+    username = credentials.get('username')
+    if username:
+        username_bucket().take(username.lower())
@@ -0,0 +1,206 @@
+import bisect
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger('auth_freedom.requests')
+
+# Замеры текущего запроса; None вне запроса (команды, фоновые задачи).
+# contextvars передаются в потоки sync_to_async, поэтому запросы асинхронного
+# ORM попадают в тот же объект
+current = contextvars.ContextVar('request_timings', default=None)
+
+# Одинаковый SQL (с разными параметрами) не меньше стольких раз за запрос — N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+_in_list = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = defaultdict(float)
+        self.queries = 0
+        # Нормализованный SQL -> число выполнений; параметры не хранятся
+        self.statements = Counter()
+
+    def add(self, name, ms):
+        self.durations[name] += ms
+
+    def add_query(self, sql, ms):
+        self.queries += 1
+        self.durations['db'] += ms
+        # Списки IN разной длины — один и тот же запрос
+        self.statements[_in_list.sub('IN (...)', sql)] += 1
+
+    @property
+    def duplicates(self):
+        # Повторные выполнения уже выполненного SQL; без параметров повтор
+        # с теми же и с другими значениями не различается
+        return self.queries - len(self.statements)
+
+    def repeated(self):
+        return {sql: count for sql, count in self.statements.items() if count >= N_PLUS_ONE_THRESHOLD}
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+def record(name, ms):
+    timings = current.get()
+    if timings is not None:
+        timings.add(name, ms)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    timings = current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, (time.perf_counter() - started) * 1000)
+
+
+@receiver(connection_created)
+def install_query_wrapper(sender, connection, **kwargs):
+    # Обёртка ставится один раз на соединение (с CONN_MAX_AGE оно живёт
+    # дольше запроса); вне запроса она только читает contextvar
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record('template', (time.perf_counter() - started) * 1000)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    # Бэкенд шаблонов Django с замером времени рендеринга; вложенные
+    # {% include %} идут мимо бэкенда и не считаются повторно
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = defaultdict(lambda: [0] * (len(buckets) + 1))
+        self.sums = defaultdict(float)
+
+    def observe(self, label, value):
+        self.counts[label][bisect.bisect_left(self.buckets, value)] += 1
+        self.sums[label] += value
+
+
+class Metrics:
+    # Гистограммы в памяти процесса; при нескольких воркерах у каждого свои
+    SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    QUERIES = (1, 2, 5, 10, 20, 50, 100, 200)
+    HISTOGRAMS = {
+        'request_duration_seconds': ('Время обработки запроса', SECONDS),
+        'db_duration_seconds': ('Время SQL-запросов за запрос', SECONDS),
+        'db_queries': ('Число SQL-запросов за запрос', QUERIES),
+        'template_duration_seconds': ('Время рендеринга шаблонов за запрос', SECONDS),
+        'password_hash_duration_seconds': ('Время хеширования паролей за запрос', SECONDS),
+    }
+    COUNTERS = {
+        'duplicate_queries_total': 'Повторные выполнения одного и того же SQL',
+        'n_plus_one_requests_total': 'Запросы с признаками N+1',
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {name: Histogram(buckets) for name, (_, buckets) in self.HISTOGRAMS.items()}
+        self.counters = {name: defaultdict(int) for name in self.COUNTERS}
+
+    def observe(self, view, timings, total_ms):
+        with self.lock:
+            self.histograms['request_duration_seconds'].observe(view, total_ms / 1000)
+            self.histograms['db_duration_seconds'].observe(view, timings.durations['db'] / 1000)
+            self.histograms['db_queries'].observe(view, timings.queries)
+            self.histograms['template_duration_seconds'].observe(view, timings.durations['template'] / 1000)
+            if 'hash' in timings.durations:
+                self.histograms['password_hash_duration_seconds'].observe(view, timings.durations['hash'] / 1000)
+            if timings.duplicates:
+                self.counters['duplicate_queries_total'][view] += timings.duplicates
+            if timings.repeated():
+                self.counters['n_plus_one_requests_total'][view] += 1
+
+    def render(self):
+        # Текстовый формат Prometheus
+        lines = []
+        with self.lock:
+            for name, (help_text, buckets) in self.HISTOGRAMS.items():
+                histogram = self.histograms[name]
+                lines += [f'# HELP auth_freedom_{name} {help_text}', f'# TYPE auth_freedom_{name} histogram']
+                for view, counts in sorted(histogram.counts.items()):
+                    cumulative = 0
+                    for bound, count in zip((*buckets, '+Inf'), counts):
+                        cumulative += count
+                        lines.append(f'auth_freedom_{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+                    lines.append(f'auth_freedom_{name}_sum{{view="{view}"}} {histogram.sums[view]}')
+                    lines.append(f'auth_freedom_{name}_count{{view="{view}"}} {cumulative}')
+            for name, help_text in self.COUNTERS.items():
+                lines += [f'# HELP auth_freedom_{name} {help_text}', f'# TYPE auth_freedom_{name} counter']
+                for view, value in sorted(self.counters[name].items()):
+                    lines.append(f'auth_freedom_{name}{{view="{view}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def server_timing(timings, total_ms):
+    parts = [f'db;dur={timings.durations["db"]:.1f};desc="{timings.queries} queries"']
+    for name in ('template', 'jwt', 'hash', 'hash_queue'):
+        if name in timings.durations:
+            parts.append(f'{name};dur={timings.durations[name]:.1f}')
+    parts.append(f'total;dur={total_ms:.1f}')
+    return ', '.join(parts)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+def finish(request, response, timings):
+    total_ms = timings.total_ms()
+    view = view_name(request)
+    metrics.observe(view, timings, total_ms)
+    if getattr(settings, 'SERVER_TIMING_HEADER', True):
+        response['Server-Timing'] = server_timing(timings, total_ms)
+    repeated = timings.repeated()
+    # Отдельный повтор SQL бывает и в нормальном запросе; в лог — только N+1
+    if total_ms >= getattr(settings, 'SLOW_REQUEST_MS', 500) or repeated:
+        logger.warning(json.dumps({
+            'event': 'slow_request' if total_ms >= getattr(settings, 'SLOW_REQUEST_MS', 500) else 'query_pattern',
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'durations_ms': {name: round(ms, 1) for name, ms in timings.durations.items()},
+            'queries': timings.queries,
+            'duplicate_queries': timings.duplicates,
+            'n_plus_one': [{'sql': sql[:300], 'count': count} for sql, count in repeated.items()],
+        }, ensure_ascii=False))
+    return response
@@ -0,0 +1,152 @@
+import logging
+import os
+import random
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import CandidateProfile, ResumeJob
+from .resume import ParseError, extract_text
+
+logger = logging.getLogger('auth_freedom.jobs')
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Запас на границы multipart и прочие поля формы сверх размера самого файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def upload_dir():
+    return Path(getattr(settings, 'RESUME_UPLOAD_DIR', settings.BASE_DIR / 'uploads' / 'resumes'))
+
+
+def max_attempts():
+    return getattr(settings, 'RESUME_JOB_MAX_ATTEMPTS', 5)
+
+
+def max_upload_bytes():
+    return getattr(settings, 'RESUME_MAX_BYTES', 10 * 1024 * 1024)
+
+
+def remove_upload(file_name):
+    # В резюме персональные данные: файл не хранится дольше, чем нужен задаче
+    (upload_dir() / file_name).unlink(missing_ok=True)
+
+
+def save_upload(uploaded):
+    # Файл пишется на диск частями; имя — случайное, исходное хранится в задаче
+    extension = os.path.splitext(uploaded.name)[1].lower()
+    directory = upload_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    file_name = f'{uuid.uuid4().hex}{extension}'
+    with open(directory / file_name, 'wb') as f:
+        for chunk in uploaded.chunks(UPLOAD_CHUNK_SIZE):
+            f.write(chunk)
+    return file_name
+
+
+def enqueue(profile, uploaded):
+    file_name = save_upload(uploaded)
+    return ResumeJob.objects.create(
+        profile=profile, file_name=file_name, original_name=uploaded.name[:255], size=uploaded.size,
+    )
+
+
+def expire(stale):
+    # Зависшие задачи, исчерпавшие попытки, больше не запускаются: скорее
+    # всего, воркер роняет сам файл
+    with transaction.atomic():
+        jobs = list(
+            ResumeJob.objects.select_for_update(skip_locked=True)
+            .filter(status='running', locked_at__lt=stale, attempts__gte=max_attempts())
+            .values_list('id', 'file_name')
+        )
+        ResumeJob.objects.filter(id__in=[job_id for job_id, _ in jobs]).update(
+            status='failed', error='Превышено время обработки', finished_at=timezone.now(),
+        )
+    for _, file_name in jobs:
+        remove_upload(file_name)
+    return len(jobs)
+
+
+def claim(limit):
+    # Берём задачи, готовые к запуску, и зависшие (воркер упал посреди
+    # работы). SKIP LOCKED: несколько воркеров не ждут друг друга и не берут
+    # одну задачу дважды
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'RESUME_JOB_TIMEOUT', 600))
+    expire(stale)
+    with transaction.atomic():
+        ids = list(
+            ResumeJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status='pending', run_after__lte=now)
+                | Q(status='running', locked_at__lt=stale, attempts__lt=max_attempts())
+            )
+            .order_by('run_after')
+            .values_list('id', flat=True)[:limit]
+        )
+        ResumeJob.objects.filter(id__in=ids).update(status='running', locked_at=now, attempts=F('attempts') + 1)
+    return ids
+
+
+def backoff(attempts):
+    # Экспоненциальная задержка со случайной добавкой, чтобы повторы не шли пачкой
+    base = getattr(settings, 'RESUME_JOB_BACKOFF_SECONDS', 30)
+    delay = min(base * 2 ** (attempts - 1), 6 * 3600)
+    return timedelta(seconds=delay * random.uniform(1, 1.5))
+
+
+def fail(job, error, permanent=False):
+    if permanent or job.attempts >= max_attempts():
+        ResumeJob.objects.filter(pk=job.pk).update(status='failed', error=error, finished_at=timezone.now())
+        remove_upload(job.file_name)
+        return 'failed'
+    ResumeJob.objects.filter(pk=job.pk).update(
+        status='pending', error=error, locked_at=None, run_after=timezone.now() + backoff(job.attempts),
+    )
+    return 'retry'
+
+
+def process(job_id):
+    # Выполняется в процессе пула воркера
+    close_old_connections()
+    job = ResumeJob.objects.get(pk=job_id)
+    path = upload_dir() / job.file_name
+    try:
+        text = extract_text(path, os.path.splitext(job.file_name)[1])
+    except (ParseError, FileNotFoundError) as e:
+        # Повтор не поможет: формат или файл не изменятся
+        return fail(job, str(e), permanent=True)
+    except Exception as e:
+        logger.exception('resume job %s failed', job_id)
+        return fail(job, repr(e))
+
+    try:
+        with transaction.atomic():
+            profile = CandidateProfile.objects.select_for_update().get(pk=job.profile_id)
+            profile.resume_text = text
+            # save() с update_fields: сигналы обновят поисковый вектор,
+            # кеш профиля и матрицу подбора
+            profile.save(update_fields=['resume_text'])
+            ResumeJob.objects.filter(pk=job.pk).update(status='done', error='', finished_at=timezone.now())
+    except CandidateProfile.DoesNotExist:
+        return fail(job, 'Профиль удалён', permanent=True)
+    except Exception as e:
+        logger.exception('resume job %s failed', job_id)
+        return fail(job, repr(e))
+    # Текст уже в профиле, исходный файл больше не нужен
+    remove_upload(job.file_name)
+    return 'done'
+
+
+@receiver(post_delete, sender=ResumeJob)
+def remove_job_upload(sender, instance, **kwargs):
+    # И при удалении задачи вместе с профилем
+    transaction.on_commit(lambda: remove_upload(instance.file_name))
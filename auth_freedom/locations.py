@@ -0,0 +1,161 @@
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Location, LocationAlias
+from .skills import normalize
+
+# Значения региона, которые означают "вся страна", а не конкретное место
+PLACEHOLDERS = {'все регионы', 'все', 'любой', 'не указан', 'не указано', '-'}
+
+# Параметр поиска -> поле профиля с id и типы мест, которые он принимает
+LOCATION_FILTERS = {
+    'country': ('country_id', ('country',)),
+    'region': ('region_id', ('region', 'city')),
+}
+
+# Ответы (и отрицательные тоже) кешируются в LOCATION_CACHE_ALIAS на
+# LOCATION_CACHE_TIMEOUT секунд. Ключ включает версию справочника: изменение
+# мест меняет версию, и старые записи больше не читаются, а вытесняются сами
+VERSION_KEY = 'location-version'
+
+
+def get_cache():
+    return caches[getattr(settings, 'LOCATION_CACHE_ALIAS', 'default')]
+
+
+def current_version(cache):
+    # Как в profile_cache: версия — момент последнего изменения
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def clear_cache():
+    get_cache().set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def _cached(key, compute):
+    # Значения приходят из запросов пользователей, поэтому в ключе — хеш:
+    # длина и символы ключа не зависят от ввода
+    cache = get_cache()
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+    cache_key = f'location:{current_version(cache)}:{digest}'
+    entry = cache.get(cache_key)
+    if entry is None:
+        # В кортеже, чтобы отличить закешированный None от промаха
+        entry = (compute(),)
+        cache.set(cache_key, entry, timeout=getattr(settings, 'LOCATION_CACHE_TIMEOUT', 300))
+    return entry[0]
+
+
+def _matches(key, kinds):
+    # (id, путь) мест указанных типов с таким написанием
+    return list(
+        LocationAlias.objects.filter(alias=key, location__kind__in=kinds)
+        .values_list('location_id', 'location__path')
+        .distinct()
+    )
+
+
+def _resolve(country_key, region_key):
+    countries = [location_id for location_id, _ in _matches(country_key, ('country',))] if country_key else []
+    country_id = countries[0] if len(countries) == 1 else None
+    region_id = None
+    if region_key:
+        regions = _matches(region_key, ('region', 'city'))
+        if country_id is not None:
+            regions = [(location_id, path) for location_id, path in regions if path[0] == country_id]
+        # Одноимённые места в разных странах без страны не различить
+        if len(regions) == 1:
+            region_id, path = regions[0]
+            country_id = path[0]
+    return country_id, region_id
+
+
+def resolve(country, region):
+    # Строки профиля -> (id страны, id региона или города); None — не найдено.
+    # Страна, если её нет, берётся из найденного региона
+    country_key, region_key = normalize(country or ''), normalize(region or '')
+    if region_key in PLACEHOLDERS:
+        region_key = ''
+    return _cached(('resolve', country_key, region_key), lambda: _resolve(country_key, region_key))
+
+
+def resolve_profile_location(profile, update_fields=None):
+    if update_fields is not None and not {'country', 'region'} & set(update_fields):
+        return set()
+    if 'country' not in profile.__dict__ or 'region' not in profile.__dict__:
+        # Поля не загружены (defer/only) и не менялись
+        return set()
+    profile.country_id, profile.region_id = resolve(profile.country, profile.region)
+    return {'country_id', 'region_id'}
+
+
+def descendant_ids(location_ids):
+    # Сами места и всё, что в них входит
+    return list(Location.objects.filter(path__overlap=list(location_ids)).values_list('id', flat=True))
+
+
+def _filter_ids(param, key):
+    field, kinds = LOCATION_FILTERS[param]
+    matches = [location_id for location_id, _ in _matches(key, kinds)]
+    if not matches:
+        return None
+    return field, sorted(matches) if param == 'country' else descendant_ids(matches)
+
+
+def filter_ids(param, value):
+    # Значение фильтра -> (поле профиля, список id) или None, если места
+    # нет в справочнике. ?region=Карагандинская область включает и Караганду
+    key = normalize(value)
+    return _cached(('filter', param, key), lambda: _filter_ids(param, key))
+
+
+def location_id(param, value):
+    # Одно место по значению фильтра; None, если не найдено или неоднозначно
+    key = normalize(value)
+
+    def compute():
+        matches = {location_id for location_id, _ in _matches(key, LOCATION_FILTERS[param][1])}
+        return matches.pop() if len(matches) == 1 else None
+
+    return _cached(('id', param, key), compute)
+
+
+def resolve_params(params):
+    return {
+        param: filter_ids(param, params[param])
+        for param in LOCATION_FILTERS if params.get(param, '').strip()
+    }
+
+
+aresolve_params = sync_to_async(resolve_params)
+
+
+def location_names(ids):
+    ids = {int(location_id) for location_id in ids}
+    return dict(Location.objects.filter(id__in=ids).values_list('id', 'name')) if ids else {}
+
+
+alocation_names = sync_to_async(location_names)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=LocationAlias)
+@receiver(post_delete, sender=LocationAlias)
+def reset_location_cache(sender, **kwargs):
+    # В кеше есть и отрицательные ответы, поэтому сбрасываем и при создании.
+    # После коммита, чтобы параллельный запрос не закешировал старые данные
+    # под новой версией
+    transaction.on_commit(clear_cache)
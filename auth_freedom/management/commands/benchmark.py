@@ -0,0 +1,214 @@
+import json
+import math
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from auth_freedom.management.commands.generate_candidates import generate, synthetic_count
+from auth_freedom.models import User
+from auth_freedom.synthetic import PASSWORD, USERNAME_PREFIX, registration_data
+from auth_freedom.tokens import stateless_auth_enabled, tokens_for_user
+
+# Сценарий -> ожидаемый код ответа: неудачный вход или регистрация отдают
+# 200 с формой, и без проверки замер мерил бы не тот путь
+SCENARIOS = {
+    'login': 302,
+    'register': 302,
+    'profile': 200,
+    'admin_changelist': 200,
+}
+
+# Пользователи, которые создаёт сам замер; префиксы не совпадают с USERNAME_PREFIX,
+# чтобы не сбить счёт синтетических кандидатов
+REGISTER_PREFIX = 'benchreg_'
+ADMIN_USERNAME = 'benchadmin'
+
+# Настройки на время замера: тестовый хост и лимиты попыток входа,
+# которые иначе остановили бы серию логинов с одного адреса
+BENCHMARK_SETTINGS = {
+    'ALLOWED_HOSTS': ['testserver'],
+    'PASSWORD_RATE_LIMITS': {'ip': (10 ** 9, 10 ** 9), 'username': (10 ** 9, 10 ** 9)},
+}
+
+# Эталон хранится в репозитории и обновляется через --update-baseline
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarize(latencies, queries):
+    # Клиент один и шлёт запросы по очереди, поэтому sequential_rps — это
+    # 1 / среднее время ответа, а не пропускная способность сервера под
+    # параллельной нагрузкой
+    return {
+        'requests': len(latencies),
+        'mean_ms': round(statistics.mean(latencies), 2),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'sequential_rps': round(len(latencies) / (sum(latencies) / 1000), 2),
+        'queries': round(statistics.mean(queries), 2),
+    }
+
+
+def compare(baseline, results, tolerance):
+    # Регрессии и замеры, для которых в эталоне ещё нет значений
+    regressions, missing = [], []
+    for scale, scenarios in results.items():
+        for scenario, current in scenarios.items():
+            expected = baseline.get(scale, {}).get(scenario)
+            if expected is None:
+                missing.append(f'{scale} {scenario}')
+                continue
+            limit = expected['p95_ms'] * (1 + tolerance)
+            if current['p95_ms'] > limit:
+                regressions.append(
+                    f'{scale} {scenario}: p95 {current["p95_ms"]} мс > {limit:.2f} мс (эталон {expected["p95_ms"]})'
+                )
+            # Число запросов детерминировано, любой рост — регрессия
+            if current['queries'] > expected['queries']:
+                regressions.append(
+                    f'{scale} {scenario}: SQL-запросов {current["queries"]} > {expected["queries"]}'
+                )
+    return regressions, missing
+
+
+def login_client(user):
+    client = Client()
+    if stateless_auth_enabled():
+        refresh = tokens_for_user(user)
+        client.cookies['access_token'] = str(refresh.access_token)
+    else:
+        client.force_login(user)
+    return client
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеры login, register, profile и списка кандидатов в админке на синтетических данных: '
+        'перцентили задержки, запросы в секунду одного клиента, число SQL-запросов. '
+        'Результат в JSON; завершается ошибкой при регрессии относительно эталона'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[10000, 100000, 1000000])
+        parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--no-generate', action='store_true', help='Не дополнять базу синтетическими кандидатами')
+        parser.add_argument('--output', default='benchmark-results.json')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='JSON с эталонными результатами для сравнения')
+        parser.add_argument('--no-baseline', action='store_true', help='Не сравнивать с эталоном')
+        parser.add_argument('--update-baseline', action='store_true', help='Записать результаты в --baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Допустимый рост p95 относительно эталона (0.25 = 25%%)')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        results = {}
+        with override_settings(**BENCHMARK_SETTINGS):
+            for scale in sorted(options['scales']):
+                if not options['no_generate']:
+                    generate(scale, options['seed'], stdout=self.stdout)
+                available = synthetic_count()
+                if available < scale:
+                    raise CommandError(f'В базе {available} синтетических кандидатов, нужно {scale}')
+                results[str(scale)] = {}
+                for scenario in options['scenarios']:
+                    summary = self.measure(scenario, scale)
+                    results[str(scale)][scenario] = summary
+                    self.stdout.write(
+                        f'{scale:>8} {scenario:<17} p50 {summary["p50_ms"]:>8} мс  p95 {summary["p95_ms"]:>8} мс  '
+                        f'{summary["sequential_rps"]:>7} req/s (1 клиент)  {summary["queries"]:>5} SQL'
+                    )
+            User.objects.filter(username__startswith=REGISTER_PREFIX).delete()
+
+        report = {
+            'meta': {
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        self.stdout.write(f'Результаты записаны в {options["output"]}')
+
+        baseline = None if options['no_baseline'] else options['baseline']
+        if baseline and options['update_baseline']:
+            with open(baseline, 'w') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'Эталон обновлён: {baseline}'))
+        elif baseline:
+            if not os.path.exists(baseline):
+                raise CommandError(f'Файл эталона не найден: {baseline}')
+            with open(baseline) as f:
+                regressions, missing = compare(json.load(f)['results'], results, options['tolerance'])
+            for name in missing:
+                self.stdout.write(self.style.WARNING(f'Нет эталона для {name}; запишите его через --update-baseline'))
+            if regressions:
+                raise CommandError('Регрессии производительности:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий относительно эталона нет'))
+
+    def measure(self, scenario, scale):
+        # Подготовка клиента (вход и т. п.) не входит в замер; считаются
+        # время ответа и запросы к основной базе
+        request = getattr(self, f'request_{scenario}')
+        for _ in range(self.options['warmup']):
+            request(scale)()
+        latencies, queries = [], []
+        for _ in range(self.options['iterations']):
+            send = request(scale)
+            with CaptureQueriesContext(connection) as captured:
+                begin = time.perf_counter()
+                response = send()
+                latencies.append((time.perf_counter() - begin) * 1000)
+            if response.status_code != SCENARIOS[scenario]:
+                raise CommandError(f'{scenario}: ответ {response.status_code}, ожидался {SCENARIOS[scenario]}')
+            queries.append(len(captured))
+        return summarize(latencies, queries)
+
+    def candidate_user(self, scale):
+        return User.objects.get(username=f'{USERNAME_PREFIX}{self.rng.randrange(scale)}')
+
+    def request_login(self, scale):
+        username = f'{USERNAME_PREFIX}{self.rng.randrange(scale)}'
+        return lambda: Client().post('/login/', {'username': username, 'password': PASSWORD})
+
+    def request_register(self, scale):
+        # Данные реалистичного кандидата, но с именем, которого нет в базе
+        index = self.rng.randrange(10 ** 9)
+        data = registration_data(index, self.options['seed'])
+        data['username'] = f'{REGISTER_PREFIX}{index}'
+        data['email'] = f'{REGISTER_PREFIX}{index}@example.com'
+        return lambda: Client().post('/register/', data)
+
+    def request_profile(self, scale):
+        client = login_client(self.candidate_user(scale))
+        return lambda: client.get('/profile/')
+
+    def request_admin_changelist(self, scale):
+        admin, created = User.objects.get_or_create(
+            username=ADMIN_USERNAME,
+            defaults={'user_type': 'admin', 'is_staff': True, 'is_superuser': True},
+        )
+        if created:
+            admin.set_password(PASSWORD)
+            admin.save()
+        client = Client()
+        client.force_login(admin)
+        return lambda: client.get('/admin/auth_freedom/candidateprofile/')
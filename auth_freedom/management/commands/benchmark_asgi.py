@@ -0,0 +1,83 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+
+# Любой другой ответ — ошибка замера: 4xx отвечает быстрее и исказил бы цифры
+EXPECTED_STATUSES = (200, 302)
+
+
+def summary(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return (
+        f'{name}: {len(latencies) / elapsed:.1f} req/s, '
+        f'p50 {statistics.median(latencies):.1f} мс, p95 {p95:.1f} мс'
+    )
+
+
+class Command(BaseCommand):
+    help = 'Сравнение пропускной способности одного URL через WSGI- и ASGI-обработчик Django'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/login/')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--username', help='Войти под этим пользователем перед замером')
+        parser.add_argument('--password')
+
+    def handle(self, *args, **options):
+        if options['username'] and not options['password']:
+            raise CommandError('Для --username нужен --password')
+        self.options = options
+        # Тестовый клиент ходит на хост testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            self.stdout.write(self.run_wsgi())
+            self.stdout.write(asyncio.run(self.run_asgi()))
+
+    def login(self, client):
+        if self.options['username']:
+            client.login(username=self.options['username'], password=self.options['password'])
+        return client.cookies
+
+    def run_wsgi(self):
+        # WSGI: поток на запрос, как у gunicorn с потоковыми воркерами
+        cookies = self.login(Client())
+
+        def request(_):
+            client = Client()
+            client.cookies = cookies
+            started = time.perf_counter()
+            response = client.get(self.options['path'])
+            if response.status_code not in EXPECTED_STATUSES:
+                raise CommandError(f'WSGI: ответ {response.status_code}')
+            return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.options['concurrency']) as pool:
+            latencies = list(pool.map(request, range(self.options['requests'])))
+        return summary('WSGI', latencies, time.perf_counter() - started)
+
+    async def run_asgi(self):
+        # ASGI: все запросы в одном цикле событий, параллельность ограничена семафором
+        cookies = await sync_to_async(self.login)(Client())
+        semaphore = asyncio.Semaphore(self.options['concurrency'])
+
+        async def request():
+            async with semaphore:
+                client = AsyncClient()
+                client.cookies = cookies
+                started = time.perf_counter()
+                response = await client.get(self.options['path'])
+                if response.status_code not in EXPECTED_STATUSES:
+                    raise CommandError(f'ASGI: ответ {response.status_code}')
+                return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(request() for _ in range(self.options['requests'])))
+        return summary('ASGI', latencies, time.perf_counter() - started)
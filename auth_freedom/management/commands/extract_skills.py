@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from auth_freedom.extraction import extract_chunk
+from auth_freedom.hashing import init_worker
+from auth_freedom.models import CandidateProfile
+
+
+class Command(BaseCommand):
+    help = 'Дописывает в hard_skills навыки словаря, найденные в resume_text и about_me'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, что было бы дописано')
+
+    def chunks(self, chunk_size):
+        # Границы диапазонов id по chunk_size профилей; сами профили читают процессы пула
+        first_id = last_id = None
+        count = 0
+        for profile_id in CandidateProfile.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=10000):
+            if first_id is None:
+                first_id = profile_id
+            last_id = profile_id
+            count += 1
+            if count == chunk_size:
+                yield first_id, last_id
+                first_id, count = None, 0
+        if first_id is not None:
+            yield first_id, last_id
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        processed = changed = added = 0
+        # spawn: дочерние процессы не наследуют соединения с БД родителя;
+        # автомат каждый процесс строит один раз и переиспользует между пачками
+        with ProcessPoolExecutor(
+            max_workers=options['processes'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'freedom_hk.settings'),),
+        ) as pool:
+            futures = [
+                pool.submit(extract_chunk, first_id, last_id, dry_run)
+                for first_id, last_id in self.chunks(options['chunk_size'])
+            ]
+            for future in as_completed(futures):
+                chunk_processed, chunk_changed, chunk_added = future.result()
+                processed += chunk_processed
+                changed += chunk_changed
+                added += chunk_added
+                self.stdout.write(f'Обработано профилей: {processed}, изменено: {changed}')
+        prefix = 'Было бы дописано' if dry_run else 'Дописано'
+        self.stdout.write(self.style.SUCCESS(f'{prefix} навыков: {added} в {changed} профилях из {processed}'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auth_freedom.dedupe import find_duplicates, pending_profiles, refresh_signatures
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает подписи изменённых кандидатов и ищет среди них возможные дубли'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--full', action='store_true', help='Проверить все активные профили, а не только изменённые')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        full = options['full']
+        queryset = pending_profiles(full)
+        last_id = 0
+        processed = refreshed = found = 0
+        while True:
+            profiles = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not profiles:
+                break
+            with transaction.atomic():
+                signatures, changed = refresh_signatures(profiles)
+                # С --full пары ищутся для всех профилей: у неизменённых они
+                # могли не найтись раньше (порог, параметры LSH, сбой)
+                found += find_duplicates(signatures if full else changed)
+            last_id = profiles[-1].id
+            processed += len(profiles)
+            refreshed += len(changed)
+            self.stdout.write(f'Обработано профилей: {processed}, подписей обновлено: {refreshed}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: профилей {processed}, подписей обновлено {refreshed}, новых пар {found}'
+        ))
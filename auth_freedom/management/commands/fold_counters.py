@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from auth_freedom.counters import FOLD_BATCH_SIZE, fold
+
+
+class Command(BaseCommand):
+    help = 'Переносит накопленные приращения счётчиков в поля профилей (запускать периодически)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=FOLD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        folded = fold(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Готово, перенесено приращений: {folded}'))
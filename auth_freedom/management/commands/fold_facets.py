@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from auth_freedom.facets import FOLD_BATCH_SIZE, fold
+
+
+class Command(BaseCommand):
+    help = 'Переносит очередь изменений фасетов в счётчики (запускать часто, например раз в несколько секунд)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=FOLD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        folded = fold(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Готово, перенесено изменений: {folded}'))
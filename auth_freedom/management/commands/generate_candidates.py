@@ -0,0 +1,53 @@
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auth_freedom.facets import reconcile
+from auth_freedom.locations import resolve_profile_location
+from auth_freedom.models import CandidateProfile, User
+from auth_freedom.skills import intern_profile_skills
+from auth_freedom.synthetic import PASSWORD, USERNAME_PREFIX, candidate
+
+
+def synthetic_count():
+    return User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+
+
+def generate(count, seed=0, chunk_size=2000, stdout=None):
+    # Дополняет базу синтетическими кандидатами до count; возвращает число добавленных
+    start = synthetic_count()
+    # Один хеш на всех: иначе генерация миллиона профилей упёрлась бы в PBKDF2
+    password = make_password(PASSWORD)
+    for offset in range(start, count, chunk_size):
+        rows = [candidate(index, seed) for index in range(offset, min(offset + chunk_size, count))]
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(user_type='candidate', password=password, **user_data) for user_data, _ in rows
+            ])
+            profiles = []
+            for user, (_, profile_data) in zip(users, rows):
+                profile = CandidateProfile(user_id=user.id, **profile_data)
+                # bulk_create не вызывает save(): навыки и места заполняются здесь
+                intern_profile_skills(profile)
+                resolve_profile_location(profile)
+                profiles.append(profile)
+            CandidateProfile.objects.bulk_create(profiles)
+        if stdout:
+            stdout.write(f'Кандидатов: {offset + len(rows)}')
+    if count > start:
+        # bulk_create обходит сигналы, поэтому фасеты пересчитываются целиком
+        reconcile()
+    return max(0, count - start)
+
+
+class Command(BaseCommand):
+    help = 'Дополняет базу детерминированными синтетическими кандидатами до заданного числа'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        added = generate(options['count'], options['seed'], options['chunk_size'], self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Готово, добавлено кандидатов: {added}'))
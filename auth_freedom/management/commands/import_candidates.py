@@ -0,0 +1,231 @@
+import csv
+import json
+import os
+from itertools import islice
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.postgres.fields import ArrayField
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.db.models.functions import Lower
+
+from auth_freedom.facets import reconcile
+from auth_freedom.locations import resolve_profile_location
+from auth_freedom.models import CandidateProfile, User
+from auth_freedom.skills import intern_profile_skills
+
+USER_FIELDS = ('username', 'email', 'first_name', 'last_name', 'phone')
+
+# Поля, которые заполняются не из файла
+SKIPPED_PROFILE_FIELDS = {
+    'id', 'user', 'search_vector', 'change_xid',
+    'hard_skill_ids', 'soft_skill_ids', 'tech_stack_ids', 'language_ids',
+    'country_id', 'region_id',
+}
+
+PROFILE_FIELDS = {
+    field.name: field for field in CandidateProfile._meta.concrete_fields
+    if field.name not in SKIPPED_PROFILE_FIELDS
+}
+
+# Написания булевых значений в CSV, которые понимает и PostgreSQL
+BOOLEAN_VALUES = {'true': True, 't': True, 'yes': True, '1': True, 'false': False, 'f': False, 'no': False, '0': False}
+
+# Имена, копируемые из пользователя в профиль, если в файле нет своих
+MIRRORED_FIELDS = ('first_name', 'last_name', 'email', 'phone')
+
+
+def read_rows(path, file_format):
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def profile_value(field, value):
+    if isinstance(field, ArrayField) and isinstance(value, str):
+        value = [item.strip() for item in value.split(',') if item.strip()]
+    elif isinstance(field, models.JSONField) and isinstance(value, str):
+        value = json.loads(value)
+    elif isinstance(field, models.BooleanField) and isinstance(value, str):
+        value = BOOLEAN_VALUES.get(value.strip().lower(), value)
+    # Ошибку типа ловим здесь: в bulk_create она откатила бы всю пачку
+    return field.to_python(value)
+
+
+class Command(BaseCommand):
+    help = 'Потоковый импорт кандидатов из CSV или JSONL (по строке на кандидата) с обновлением по email'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'])
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--checkpoint', help='Файл с числом уже импортированных строк (по умолчанию <path>.checkpoint)')
+        parser.add_argument('--restart', action='store_true', help='Игнорировать сохранённый checkpoint')
+        parser.add_argument('--no-update', action='store_true', help='Пропускать кандидатов с уже существующим email')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл не найден: {path}')
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+
+        done = 0
+        if os.path.exists(checkpoint) and not options['restart']:
+            with open(checkpoint) as f:
+                done = int(f.read().strip() or 0)
+            self.stdout.write(f'Продолжаем с строки {done}')
+
+        rows = islice(read_rows(path, file_format), done, None)
+        created = updated = skipped = 0
+        for chunk in chunked(rows, options['chunk_size']):
+            # Каждая пачка — отдельная транзакция; checkpoint пишется после коммита
+            with transaction.atomic():
+                c, u, s = self.import_chunk(chunk, update=not options['no_update'])
+            created, updated, skipped = created + c, updated + u, skipped + s
+            done += len(chunk)
+            self.write_checkpoint(checkpoint, done)
+            self.stdout.write(f'Строк: {done}, создано: {created}, обновлено: {updated}, пропущено: {skipped}')
+
+        # bulk-операции обходят сигналы, поэтому фасеты пересчитываются целиком
+        reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Создано: {created}, обновлено: {updated}, пропущено: {skipped}'
+        ))
+
+    @staticmethod
+    def write_checkpoint(checkpoint, done):
+        tmp = f'{checkpoint}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(str(done))
+        os.replace(tmp, checkpoint)
+
+    def parse_row(self, row):
+        email = (row.get('email') or '').strip().lower()
+        if not email:
+            return None
+        user_data = {name: (row.get(name) or '').strip() for name in USER_FIELDS}
+        user_data['email'] = email
+        user_data['username'] = user_data['username'] or email
+
+        profile_data = {}
+        for name, field in PROFILE_FIELDS.items():
+            value = row.get(name)
+            if value in (None, ''):
+                continue
+            try:
+                profile_data[name] = profile_value(field, value)
+            except (ValueError, ValidationError):
+                # Битая строка пропускается, остальные строки пачки импортируются
+                return None
+        for name in MIRRORED_FIELDS:
+            profile_data.setdefault(name, user_data[name])
+
+        # Готовый хеш из исходной системы или непригодный пароль: хешировать
+        # миллионы паролей при импорте не нужно
+        password = row.get('password') or ''
+        try:
+            identify_hasher(password)
+        except ValueError:
+            password = make_password(None)
+        return user_data, profile_data, password
+
+    def import_chunk(self, chunk, update=True):
+        parsed = {}
+        skipped = 0
+        for row in chunk:
+            item = self.parse_row(row)
+            if item is None:
+                skipped += 1
+                continue
+            # При повторах email в одной пачке побеждает последняя строка
+            parsed[item[0]['email']] = item
+
+        existing = {
+            email: (user_id, user_type)
+            for email, user_id, user_type in User.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=parsed.keys())
+            .values_list('email_lower', 'id', 'user_type')
+        }
+        taken_usernames = set(
+            User.objects.filter(username__in=[user_data['username'] for user_data, _, _ in parsed.values()])
+            .values_list('username', flat=True)
+        )
+
+        new_users, new_profiles, updates = [], [], []
+        for email, (user_data, profile_data, password) in parsed.items():
+            if email in existing:
+                user_id, user_type = existing[email]
+                # Рекрутеров и администраторов импорт не трогает
+                if update and user_type == 'candidate':
+                    updates.append((user_id, user_data, profile_data))
+                else:
+                    skipped += 1
+                continue
+            if user_data['username'] in taken_usernames:
+                skipped += 1
+                continue
+            taken_usernames.add(user_data['username'])
+            new_users.append(User(user_type='candidate', password=password, **user_data))
+            new_profiles.append(profile_data)
+
+        # bulk_create не вызывает save() и сигналы post_save
+        User.objects.bulk_create(new_users)
+        profiles = []
+        for user, profile_data in zip(new_users, new_profiles):
+            profile = CandidateProfile(user_id=user.id, **profile_data)
+            # bulk_create не вызывает save(): навыки и места заполняются здесь
+            intern_profile_skills(profile)
+            resolve_profile_location(profile)
+            profiles.append(profile)
+        CandidateProfile.objects.bulk_create(profiles)
+
+        if updates:
+            self.update_existing(updates)
+        return len(new_users), len(updates), skipped
+
+    def update_existing(self, updates):
+        user_ids = [user_id for user_id, _, _ in updates]
+        users = User.objects.in_bulk(user_ids)
+        profiles = {profile.user_id: profile for profile in CandidateProfile.objects.filter(user_id__in=user_ids)}
+
+        user_fields, profile_fields = set(), set()
+        changed_users, changed_profiles, missing_profiles = [], [], []
+        for user_id, user_data, profile_data in updates:
+            user = users[user_id]
+            for name, value in user_data.items():
+                if name != 'username' and value:
+                    setattr(user, name, value)
+                    user_fields.add(name)
+            changed_users.append(user)
+
+            profile = profiles.get(user_id)
+            if profile is None:
+                profile = CandidateProfile(user_id=user_id, **profile_data)
+                intern_profile_skills(profile)
+                resolve_profile_location(profile)
+                missing_profiles.append(profile)
+                continue
+            for name, value in profile_data.items():
+                setattr(profile, name, value)
+                profile_fields.add(name)
+            profile_fields |= intern_profile_skills(profile, profile_data.keys())
+            profile_fields |= resolve_profile_location(profile, profile_data.keys())
+            changed_profiles.append(profile)
+
+        if user_fields:
+            User.objects.bulk_update(changed_users, sorted(user_fields))
+        if profile_fields:
+            CandidateProfile.objects.bulk_update(changed_profiles, sorted(profile_fields))
+        CandidateProfile.objects.bulk_create(missing_profiles)
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auth_freedom.facets import reconcile
+from auth_freedom.models import CandidateProfile
+from auth_freedom.skills import PROFILE_FIELDS, intern
+
+
+class Command(BaseCommand):
+    help = 'Приводит навыки и языки кандидатов к словарю и заполняет поля *_ids'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        text_fields = [text_field for text_field, _, _ in PROFILE_FIELDS]
+        update_fields = text_fields + [ids_field for _, ids_field, _ in PROFILE_FIELDS]
+        last_id = 0
+        total = 0
+        while True:
+            profiles = list(
+                CandidateProfile.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .only('id', *update_fields)[:chunk_size]
+            )
+            if not profiles:
+                break
+            for profile in profiles:
+                for text_field, ids_field, kind in PROFILE_FIELDS:
+                    names, ids = intern(getattr(profile, text_field) or [], kind)
+                    setattr(profile, text_field, names)
+                    setattr(profile, ids_field, ids)
+            # bulk_update не вызывает save() и сигналы профиля
+            with transaction.atomic():
+                CandidateProfile.objects.bulk_update(profiles, update_fields)
+            last_id = profiles[-1].id
+            total += len(profiles)
+            self.stdout.write(f'Обработано профилей: {total}')
+        # bulk-операции обходят сигналы, поэтому фасеты пересчитываются целиком
+        reconcile()
+        self.stdout.write(self.style.SUCCESS(f'Готово, профилей: {total}'))
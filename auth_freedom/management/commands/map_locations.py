@@ -0,0 +1,56 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auth_freedom.facets import reconcile
+from auth_freedom.locations import PLACEHOLDERS, resolve
+from auth_freedom.models import CandidateProfile, RecruiterProfile
+from auth_freedom.skills import normalize
+
+
+class Command(BaseCommand):
+    help = 'Сопоставляет строки country/region профилей со справочником мест и заполняет country_id/region_id'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--unmapped', type=int, default=20, help='Сколько самых частых несопоставленных строк показать')
+
+    def map_model(self, model, chunk_size, unmapped):
+        fields = ['country', 'region', 'country_id', 'region_id']
+        last_id = 0
+        total = changed = 0
+        while True:
+            profiles = list(model.objects.filter(id__gt=last_id).order_by('id').only('id', *fields)[:chunk_size])
+            if not profiles:
+                break
+            updated = []
+            for profile in profiles:
+                country_id, region_id = resolve(profile.country, profile.region)
+                if country_id is None and profile.country.strip():
+                    unmapped['country', profile.country.strip()] += 1
+                if region_id is None and normalize(profile.region) not in PLACEHOLDERS | {''}:
+                    unmapped['region', f'{profile.country.strip()} / {profile.region.strip()}'] += 1
+                if (country_id, region_id) != (profile.country_id, profile.region_id):
+                    profile.country_id, profile.region_id = country_id, region_id
+                    updated.append(profile)
+            # bulk_update не вызывает save() и сигналы профиля
+            with transaction.atomic():
+                model.objects.bulk_update(updated, ['country_id', 'region_id'])
+            last_id = profiles[-1].id
+            total += len(profiles)
+            changed += len(updated)
+        return total, changed
+
+    def handle(self, *args, **options):
+        unmapped = Counter()
+        for model in (CandidateProfile, RecruiterProfile):
+            total, changed = self.map_model(model, options['chunk_size'], unmapped)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: обработано {total}, изменено {changed}')
+        # Счётчики фасетов по местам ведутся по id, пересчитываем их целиком
+        reconcile()
+        if unmapped:
+            self.stdout.write('Не найдены в справочнике (добавьте место или синоним в админке):')
+            for (kind, value), count in unmapped.most_common(options['unmapped']):
+                self.stdout.write(f'  {kind}: {value} — {count}')
+        self.stdout.write(self.style.SUCCESS('Готово'))
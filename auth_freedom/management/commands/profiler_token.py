@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from auth_freedom.profiler import make_token
+
+
+class Command(BaseCommand):
+    help = 'Печатает значение заголовка X-Profile-Request для профилирования отдельного запроса'
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_token())
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from auth_freedom.facets import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики фасетов по профилям кандидатов (запускать периодически, например из cron)'
+
+    def handle(self, *args, **options):
+        fixed = reconcile()
+        self.stdout.write(self.style.SUCCESS(f'Готово, исправлено счётчиков: {fixed}'))
@@ -0,0 +1,65 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+
+from auth_freedom.hashing import init_worker
+from auth_freedom.jobs import claim, process
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь загруженных резюме в пуле процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Пауза, когда очередь пуста (секунды)')
+        parser.add_argument('--once', action='store_true', help='Выйти, когда очередь опустеет')
+
+    def make_pool(self, processes):
+        # spawn: дочерние процессы не наследуют соединения с БД родителя
+        return ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'freedom_hk.settings'),),
+        )
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        pool = self.make_pool(processes)
+        running = {}
+        try:
+            while True:
+                # Берём задач не больше, чем свободных процессов: остальные
+                # остаются в очереди доступными другим воркерам
+                free = processes - len(running)
+                if free:
+                    for job_id in claim(free):
+                        running[pool.submit(process, job_id)] = job_id
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        self.stdout.write(f'Задача {job_id}: {future.result()}')
+                    except BrokenProcessPool:
+                        # Задача останется в статусе running и будет взята
+                        # повторно после RESUME_JOB_TIMEOUT
+                        self.stderr.write(f'Задача {job_id}: процесс пула упал, пул пересоздаётся')
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        pool = self.make_pool(processes)
+                        running.clear()
+                        break
+                    except Exception as e:
+                        self.stderr.write(f'Задача {job_id}: {e!r}')
+        except KeyboardInterrupt:
+            self.stdout.write('Остановка, дожидаемся текущих задач')
+        finally:
+            pool.shutdown(wait=True)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from auth_freedom.similar import pending_ids, rebuild, update
+
+
+class Command(BaseCommand):
+    help = 'Обновляет векторы и списки похожих кандидатов для изменённых профилей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument('--full', action='store_true', help='Перестроить индекс целиком, с пересчётом частот слов')
+
+    def handle(self, *args, **options):
+        if options['full']:
+            total = rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Индекс перестроен, профилей: {total}'))
+            return
+        ids = pending_ids()
+        chunk_size = options['chunk_size']
+        updated = removed = recomputed = 0
+        for start in range(0, len(ids), chunk_size):
+            chunk_updated, chunk_removed, chunk_recomputed = update(ids[start:start + chunk_size])
+            updated += chunk_updated
+            removed += chunk_removed
+            recomputed += chunk_recomputed
+            self.stdout.write(f'Обработано профилей: {min(start + chunk_size, len(ids))} из {len(ids)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: векторов обновлено {updated}, удалено {removed}, списков соседей пересчитано {recomputed}'
+        ))
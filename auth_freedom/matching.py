@@ -0,0 +1,282 @@
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import CandidateProfile
+from .skills import lookup, normalize
+
+LEVEL_INDEX = {code: i for i, (code, _) in enumerate(CandidateProfile.LEVEL_CHOICES)}
+RELOCATION_INDEX = {code: i for i, (code, _) in enumerate(CandidateProfile.RELOCATION_CHOICES)}
+
+DEFAULT_WEIGHTS = {
+    'nice_skills': 0.4,
+    'languages': 0.3,
+    'experience': 0.2,
+    'salary': 0.1,
+}
+
+# Опыт сверх этого значения не добавляет баллов
+EXPERIENCE_CAP = 10
+
+LOAD_FIELDS = (
+    'id', 'hard_skill_ids', 'tech_stack_ids', 'language_ids', 'level',
+    'experience', 'desired_salary', 'relocation_status', 'is_active',
+)
+
+
+def skill_ids(values, kind='skill'):
+    # Названия из спецификации -> идентификаторы словаря; неизвестные
+    # получают отрицательный id, которого нет ни у одного кандидата
+    known = lookup(values, kind)
+    missing = len({normalize(value) for value in values} - {''}) - len(known)
+    return {skill_id for skill_id, _ in known.values()} | {-i for i in range(1, missing + 1)}
+
+
+@dataclass
+class RequirementSpec:
+    required_skills: list = field(default_factory=list)
+    nice_skills: list = field(default_factory=list)
+    languages: list = field(default_factory=list)
+    level_min: str = None
+    level_max: str = None
+    salary_max: float = None
+    # Допустимые значения relocation_status; None — любые
+    relocation: tuple = None
+    weights: dict = None
+
+
+class Postings:
+    # Разреженные столбцы: для каждого навыка или языка (id словаря) массив номеров
+    # строк матрицы, у которых оно есть
+
+    def __init__(self):
+        self.rows = {}
+
+    def build(self, lists):
+        # Массовая загрузка: списки собираются целиком и превращаются в массивы
+        # один раз, без копирования массива на каждую строку
+        self.rows = {value: np.array(rows, dtype=np.int32) for value, rows in lists.items()}
+
+    def update(self, added, removed):
+        # Изменения пачки строк: {значение: [строки]}; каждый затронутый
+        # массив пересобирается один раз за пачку, а не на каждую строку
+        for value in added.keys() | removed.keys():
+            arr = self.rows.get(value, np.empty(0, dtype=np.int32))
+            if value in removed:
+                arr = arr[~np.isin(arr, removed[value])]
+            if value in added:
+                arr = np.concatenate([arr, np.array(added[value], dtype=np.int32)])
+            if len(arr):
+                self.rows[value] = arr
+            else:
+                self.rows.pop(value, None)
+
+    def count(self, values, size):
+        # Сколько из values есть у каждой строки — один проход на значение
+        counts = np.zeros(size, dtype=np.int16)
+        for value in values:
+            arr = self.rows.get(value)
+            if arr is not None:
+                counts[arr] += 1
+        return counts
+
+
+def snapshot_xmin():
+    # Транзакции с номером меньше xmin текущего снимка уже завершены. Строки
+    # профиля помечает номером пишущей транзакции триггер (миграция 0019),
+    # поэтому всё, что изменится или станет видно после этого чтения, будет
+    # иметь change_xid >= xmin — и при записи через save(), и при bulk_update,
+    # update() и импорте, в любом процессе
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def profile_rows(**filters):
+    # Матрица читает только основную базу: снимок и строки должны быть из
+    # одной базы
+    return CandidateProfile.objects.using(DEFAULT_DB_ALIAS).filter(**filters).values_list(*LOAD_FIELDS)
+
+
+class CandidateMatrix:
+    def __init__(self, capacity=1024):
+        self.lock = threading.RLock()
+        self.deleted = set()
+        self.xmin = None
+        self.loaded = False
+        self._reset(capacity)
+
+    def _reset(self, capacity):
+        self.size = 0
+        self.row_of = {}
+        self.row_values = {}
+        self.skills = Postings()
+        self.languages = Postings()
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.level = np.zeros(capacity, dtype=np.int8)
+        self.relocation = np.zeros(capacity, dtype=np.int8)
+        self.experience = np.zeros(capacity, dtype=np.int32)
+        self.salary = np.zeros(capacity, dtype=np.float64)
+
+    def _grow(self, needed):
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ('ids', 'active', 'level', 'relocation', 'experience', 'salary'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _row_for(self, profile_id):
+        row = self.row_of.get(profile_id)
+        if row is None:
+            row = self.size
+            self._grow(row + 1)
+            self.size += 1
+            self.row_of[profile_id] = row
+            self.ids[row] = profile_id
+        return row
+
+    def _set_scalars(self, values):
+        profile_id, hard_skills, tech_stack, languages, level, experience, salary, relocation, is_active = values
+        row = self._row_for(profile_id)
+        self.active[row] = is_active
+        self.level[row] = LEVEL_INDEX.get(level, 0)
+        self.relocation[row] = RELOCATION_INDEX.get(relocation, 0)
+        self.experience[row] = experience or 0
+        self.salary[row] = float(salary or 0)
+
+        skills = frozenset((hard_skills or []) + (tech_stack or []))
+        langs = frozenset(languages or [])
+        return row, skills, langs
+
+    def _set_rows(self, rows):
+        added = ({}, {})
+        removed = ({}, {})
+        for values in rows:
+            row, skills, langs = self._set_scalars(values)
+            old = self.row_values.get(row, (frozenset(), frozenset()))
+            for i, (new_values, old_values) in enumerate(zip((skills, langs), old)):
+                for value in old_values - new_values:
+                    removed[i].setdefault(value, []).append(row)
+                for value in new_values - old_values:
+                    added[i].setdefault(value, []).append(row)
+            self.row_values[row] = (skills, langs)
+        self.skills.update(added[0], removed[0])
+        self.languages.update(added[1], removed[1])
+
+    def _deactivate(self, profile_id):
+        row = self.row_of.get(profile_id)
+        if row is not None:
+            self.active[row] = False
+
+    def load(self):
+        with self.lock:
+            self.deleted = set()
+            self.xmin = snapshot_xmin()
+            self._reset(max(1024, CandidateProfile.objects.using(DEFAULT_DB_ALIAS).count()))
+            skill_rows, language_rows = {}, {}
+            for values in profile_rows().order_by('id').iterator(chunk_size=5000):
+                row, skills, langs = self._set_scalars(values)
+                self.row_values[row] = (skills, langs)
+                for value in skills:
+                    skill_rows.setdefault(value, []).append(row)
+                for value in langs:
+                    language_rows.setdefault(value, []).append(row)
+            self.skills.build(skill_rows)
+            self.languages.build(language_rows)
+            self.loaded = True
+
+    def mark_deleted(self, profile_ids):
+        # Удалённых строк в БД нет, и по change_xid их не найти: этот процесс
+        # узнаёт о них из сигнала, остальные — когда match_candidates не найдёт профиль
+        with self.lock:
+            self.deleted.update(profile_ids)
+
+    def refresh(self):
+        # Перечитываем только профили, изменённые транзакциями с номером не
+        # меньше xmin прошлого чтения; часть из них уже прочитана, но это
+        # лишь несколько строк, а пропусков нет
+        with self.lock:
+            if not self.loaded:
+                self.load()
+                return
+            xmin = snapshot_xmin()
+            self._set_rows(profile_rows(change_xid__gte=self.xmin).iterator(chunk_size=5000))
+            self.xmin = xmin
+            deleted, self.deleted = self.deleted, set()
+            for profile_id in deleted:
+                self._deactivate(profile_id)
+
+    def score(self, spec, k=20):
+        self.refresh()
+        with self.lock:
+            n = self.size
+            weights = {**DEFAULT_WEIGHTS, **(spec.weights or {})}
+            mask = self.active[:n].copy()
+
+            if spec.level_min:
+                mask &= self.level[:n] >= LEVEL_INDEX[spec.level_min]
+            if spec.level_max:
+                mask &= self.level[:n] <= LEVEL_INDEX[spec.level_max]
+            if spec.salary_max is not None:
+                mask &= self.salary[:n] <= float(spec.salary_max)
+            if spec.relocation:
+                allowed = [RELOCATION_INDEX[code] for code in spec.relocation]
+                mask &= np.isin(self.relocation[:n], allowed)
+
+            required = skill_ids(spec.required_skills)
+            if required:
+                mask &= self.skills.count(required, n) == len(required)
+
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+
+            score = np.zeros(len(candidates), dtype=np.float64)
+            nice = skill_ids(spec.nice_skills) - required
+            if nice:
+                score += weights['nice_skills'] * self.skills.count(nice, n)[candidates] / len(nice)
+            langs = skill_ids(spec.languages, kind='language')
+            if langs:
+                score += weights['languages'] * self.languages.count(langs, n)[candidates] / len(langs)
+            experience = np.minimum(self.experience[candidates], EXPERIENCE_CAP)
+            score += weights['experience'] * experience / EXPERIENCE_CAP
+            if spec.salary_max:
+                # Чем ниже желаемая зарплата относительно потолка, тем лучше
+                score += weights['salary'] * (1 - self.salary[candidates] / float(spec.salary_max))
+
+            if len(candidates) > k:
+                top = np.argpartition(-score, k - 1)[:k]
+            else:
+                top = np.arange(len(candidates))
+            top = top[np.lexsort((self.ids[candidates[top]], -score[top]))]
+            return [(int(self.ids[candidates[i]]), float(score[i])) for i in top]
+
+
+matrix = CandidateMatrix()
+
+
+def match_candidates(spec, k=20):
+    ranked = matrix.score(spec, k)
+    profiles = CandidateProfile.objects.in_bulk([profile_id for profile_id, _ in ranked])
+    missing = {profile_id for profile_id, _ in ranked} - profiles.keys()
+    if missing:
+        matrix.mark_deleted(missing)
+    return [(profiles[profile_id], score) for profile_id, score in ranked if profile_id in profiles]
+
+
+@receiver(post_delete, sender=CandidateProfile)
+def mark_candidate_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: matrix.mark_deleted({instance.id}))
@@ -1,24 +1,327 @@
 from django.http import JsonResponse
 from rest_framework_simplejwt.tokens import AccessToken
 from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.utils.functional import SimpleLazyObject
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.exceptions import MiddlewareNotUsed
+from collections import OrderedDict
+import hashlib
+import threading
+import time
 import jwt
 
+from . import instrumentation, profiler
+from .revocation import ais_revoked, is_revoked
+from .routers import use_primary, wrote
+from .tokens import ClaimsUser, stateless_auth_enabled
+
+
+class VerifiedTokenCache:
+    # LRU уже проверенных токенов: sha256(токен) -> (claims, срок годности записи).
+    # Запись живёт не дольше exp самого токена
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self.key(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                claims, expires_at = entry
+                if expires_at > time.time():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, token, claims):
+        expires_at = claims.get('exp')
+        if expires_at is None:
+            # Без exp токен не кешируем, чтобы не продлевать ему жизнь
+            return
+        key = self.key(token)
+        with self.lock:
+            self.entries[key] = (claims, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
+
+
+token_cache = VerifiedTokenCache(getattr(settings, 'JWT_TOKEN_CACHE_SIZE', 10000))
+
+
+def decode_token(access_token):
+    claims = token_cache.get(access_token)
+    if claims is None:
+        claims = jwt.decode(access_token, settings.SIMPLE_JWT['SIGNING_KEY'], algorithms=['HS256'])
+        token_cache.set(access_token, claims)
+    return claims
+
+
+def get_user_from_claims(claims):
+    # Отключённый пользователь — аноним, как и при обновлении токена
+    user_id = claims.get(settings.SIMPLE_JWT['USER_ID_CLAIM'])
+    try:
+        return get_user_model().objects.get(**{settings.SIMPLE_JWT['USER_ID_FIELD']: user_id}, is_active=True)
+    except get_user_model().DoesNotExist:
+        return AnonymousUser()
+
+
+async def aget_user_from_claims(claims):
+    user_id = claims.get(settings.SIMPLE_JWT['USER_ID_CLAIM'])
+    try:
+        return await get_user_model().objects.aget(**{settings.SIMPLE_JWT['USER_ID_FIELD']: user_id}, is_active=True)
+    except get_user_model().DoesNotExist:
+        return AnonymousUser()
+
+
 class JWTAuthenticationMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        paths = tuple(getattr(settings, 'JWT_EXEMPT_PATHS', ('/admin/', '/login/')))
+        # Корень сравнивается целиком: как префикс он совпал бы с любым путём
+        self.exempt_root = '/' in paths
+        self.exempt_paths = tuple(path for path in paths if path != '/')
+        # Под ASGI работаем как корутина, без переключения в поток
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def is_exempt(self, path):
+        return (self.exempt_root and path == '/') or path.startswith(self.exempt_paths)
+
+    def verify(self, request):
+        started = time.perf_counter()
+        try:
+            return self._verify(request)
+        finally:
+            instrumentation.record('jwt', (time.perf_counter() - started) * 1000)
+
+    def _verify(self, request):
+        # Проверка подписи и срока без обращений к БД: (claims, ответ с ошибкой)
+        access_token = request.COOKIES.get('access_token')
+        if not access_token:
+            return None, JsonResponse({'error': 'No access token'}, status=401)
+
+        try:
+            claims = decode_token(access_token)
+        except jwt.ExpiredSignatureError:
+            return None, JsonResponse({'error': 'Token expired'}, status=401)
+        except jwt.InvalidTokenError:
+            return None, JsonResponse({'error': 'Invalid token'}, status=401)
+        if claims.get('token_type', 'access') != 'access':
+            return None, JsonResponse({'error': 'Invalid token'}, status=401)
+        return claims, None
+
+    def attach_user(self, request, claims):
+        request.jwt_claims = claims
+        if stateless_auth_enabled():
+            # Пользователь целиком из claims: ни сессии, ни запроса к БД
+            user = ClaimsUser(claims)
+            request.user = user
+
+            async def auser():
+                return user
+        else:
+            # Пользователь загружается только при первом обращении
+            request.user = SimpleLazyObject(lambda: get_user_from_claims(claims))
+            loaded = []
+
+            async def auser():
+                if not loaded:
+                    loaded.append(await aget_user_from_claims(claims))
+                return loaded[0]
+        request.auser = auser
 
     def __call__(self, request):
-        if not request.path.startswith('/admin/') and not request.path.startswith('/login/'):
-            access_token = request.COOKIES.get('access_token')
-            if not access_token:
-                return JsonResponse({'error': 'No access token'}, status=401)
-            
-            try:
-                jwt.decode(access_token, settings.SIMPLE_JWT['SIGNING_KEY'], algorithms=['HS256'])
-            except jwt.ExpiredSignatureError:
-                return JsonResponse({'error': 'Token expired'}, status=401)
-            except jwt.InvalidTokenError:
-                return JsonResponse({'error': 'Invalid token'}, status=401)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.is_exempt(request.path):
+            claims, error = self.verify(request)
+            if error is not None:
+                return error
+            if is_revoked(claims):
+                return JsonResponse({'error': 'Token revoked'}, status=401)
+            self.attach_user(request, claims)
 
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
+
+    async def __acall__(self, request):
+        if not self.is_exempt(request.path):
+            claims, error = self.verify(request)
+            if error is not None:
+                return error
+            if await ais_revoked(claims):
+                return JsonResponse({'error': 'Token revoked'}, status=401)
+            self.attach_user(request, claims)
+
+        response = await self.get_response(request)
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    # Чтение своих записей: после запроса с записью клиент ещё
+    # REPLICA_STICKY_SECONDS читает профили с основной базы, пока реплика
+    # не догонит. Срок хранится в cookie, без обращений к кешу или БД
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'primary_until'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.window = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def pinned(self, request):
+        try:
+            return float(request.COOKIES.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def remember(self, response):
+        if wrote.get():
+            response.set_cookie(
+                self.cookie_name, str(time.time() + self.window),
+                max_age=self.window, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Переменные сбрасываются после запроса: поток WSGI обслуживает следующие
+        primary_token, wrote_token = use_primary.set(self.pinned(request)), wrote.set(False)
+        try:
+            return self.remember(self.get_response(request))
+        finally:
+            use_primary.reset(primary_token)
+            wrote.reset(wrote_token)
+
+    async def __acall__(self, request):
+        primary_token, wrote_token = use_primary.set(self.pinned(request)), wrote.set(False)
+        try:
+            return self.remember(await self.get_response(request))
+        finally:
+            use_primary.reset(primary_token)
+            wrote.reset(wrote_token)
+
+
+class RequestTimingMiddleware:
+    # SQL (число и время), шаблоны, JWT и хеширование паролей за запрос:
+    # заголовок Server-Timing, строка лога для медленных запросов и
+    # гистограммы для /metrics/. Стоимость — несколько perf_counter на запрос
+    # и на SQL-запрос
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = instrumentation.RequestTimings()
+        token = instrumentation.current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.current.reset(token)
+        return instrumentation.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = instrumentation.RequestTimings()
+        token = instrumentation.current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.current.reset(token)
+        return instrumentation.finish(request, response, timings)
+
+
+class ProfilerMiddleware:
+    # cProfile для доли запросов (PROFILER_SAMPLE_RATE), запросов с подписанным
+    # заголовком X-Profile-Request и путей из правил в админке. При
+    # PROFILER_ENABLED = False Django исключает middleware из цепочки.
+    # В асинхронном запросе профилируется поток цикла событий: код ORM
+    # в потоках sync_to_async в профиль не попадает, а корутины других
+    # запросов, выполнявшиеся в это время, попадают (в админке такие
+    # профили отмечены)
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not profiler.enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def reason(self, request):
+        # Сначала профилировщик, потом причина: иначе правило из админки
+        # расходовалось бы и на запросы, которые профилировать некому.
+        # С причиной профилировщик остаётся занятым до stop()
+        if not profiler.claim():
+            return None
+        try:
+            reason = profiler.reason_for(request)
+        except BaseException:
+            profiler.release()
+            raise
+        if reason is None:
+            profiler.release()
+        return reason
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        reason = self.reason(request)
+        if reason is None:
+            return self.get_response(request)
+        running = profiler.start(reason)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop(running)
+        profiler.store(request, response, running)
+        return response
+
+    async def __acall__(self, request):
+        reason = await sync_to_async(self.reason)(request)
+        if reason is None:
+            return await self.get_response(request)
+        # cProfile включается в потоке цикла событий, а не в потоке sync_to_async
+        running = profiler.start(reason, event_loop=True)
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.stop(running)
+        await sync_to_async(profiler.store)(request, response, running)
+        return response
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:14
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0004_remove_recruiterprofile_active_vacancies_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['hard_skills'], name='candidate_hard_skills_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tech_stack'], name='candidate_tech_stack_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['languages'], name='candidate_languages_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['certifications'], name='candidate_certs_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=models.Index(fields=['is_active', 'level', 'search_status', '-id'], name='candidate_level_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=models.Index(fields=['is_active', 'country', 'region', '-id'], name='candidate_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=models.Index(fields=['is_active', 'relocation_status', '-id'], name='candidate_relocation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=models.Index(fields=['is_active', 'experience'], name='candidate_experience_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=models.Index(fields=['is_active', 'desired_salary'], name='candidate_salary_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:14
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# resume_text весит больше, чем about_me; каждое поле индексируется
+# и русским, и английским словарём, чтобы работал стемминг для обоих языков
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('russian', coalesce({prefix}resume_text, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce({prefix}resume_text, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce({prefix}about_me, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce({prefix}about_me, '')), 'B')
+"""
+
+# Django пишет search_vector при каждом save() значением из памяти, поэтому
+# триггер срабатывает на любой UPDATE: при неизменном тексте возвращает
+# старый вектор, а пересчитывает только если текст действительно изменился
+CREATE_TRIGGER = f"""
+CREATE FUNCTION auth_freedom_candidate_search_vector() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+        AND NEW.resume_text IS NOT DISTINCT FROM OLD.resume_text
+        AND NEW.about_me IS NOT DISTINCT FROM OLD.about_me
+        AND OLD.search_vector IS NOT NULL THEN
+        NEW.search_vector := OLD.search_vector;
+    ELSE
+        NEW.search_vector := {SEARCH_VECTOR_SQL.format(prefix='NEW.')};
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER auth_freedom_candidate_search_vector_update
+    BEFORE INSERT OR UPDATE
+    ON auth_freedom_candidateprofile
+    FOR EACH ROW EXECUTE FUNCTION auth_freedom_candidate_search_vector();
+
+UPDATE auth_freedom_candidateprofile SET search_vector = {SEARCH_VECTOR_SQL.format(prefix='')};
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS auth_freedom_candidate_search_vector_update ON auth_freedom_candidateprofile;
+DROP FUNCTION IF EXISTS auth_freedom_candidate_search_vector();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0005_candidateprofile_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidateprofile',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='candidate_search_vector_gin'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:18
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0006_candidateprofile_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Skill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('kind', models.CharField(choices=[('skill', 'Навык'), ('language', 'Язык')], default='skill', max_length=20, verbose_name='Тип')),
+            ],
+            options={
+                'verbose_name': 'Навык',
+                'verbose_name_plural': 'Навыки',
+            },
+        ),
+        migrations.CreateModel(
+            name='SkillAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('skill', 'Навык'), ('language', 'Язык')], default='skill', max_length=20, verbose_name='Тип')),
+                ('alias', models.CharField(max_length=100, verbose_name='Написание')),
+            ],
+            options={
+                'verbose_name': 'Синоним навыка',
+                'verbose_name_plural': 'Синонимы навыков',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='candidateprofile',
+            name='candidate_hard_skills_gin',
+        ),
+        migrations.RemoveIndex(
+            model_name='candidateprofile',
+            name='candidate_tech_stack_gin',
+        ),
+        migrations.RemoveIndex(
+            model_name='candidateprofile',
+            name='candidate_languages_gin',
+        ),
+        migrations.AddField(
+            model_name='candidateprofile',
+            name='hard_skill_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='candidateprofile',
+            name='language_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='candidateprofile',
+            name='soft_skill_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='candidateprofile',
+            name='tech_stack_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['hard_skill_ids'], name='candidate_hard_skill_ids_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tech_stack_ids'], name='candidate_tech_stack_ids_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['language_ids'], name='candidate_language_ids_gin'),
+        ),
+        migrations.AddConstraint(
+            model_name='skill',
+            constraint=models.UniqueConstraint(fields=('kind', 'name'), name='unique_skill_kind_name'),
+        ),
+        migrations.AddField(
+            model_name='skillalias',
+            name='skill',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='auth_freedom.skill', verbose_name='Навык'),
+        ),
+        migrations.AddConstraint(
+            model_name='skillalias',
+            constraint=models.UniqueConstraint(fields=('kind', 'alias'), name='unique_skill_alias'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+# Канонические названия и распространённые варианты написания
+SKILLS = {
+    'skill': {
+        'Python': ['python', 'питон', 'пайтон', 'python3'],
+        'JavaScript': ['javascript', 'js', 'джаваскрипт'],
+        'TypeScript': ['typescript', 'ts'],
+        'Java': ['java', 'джава'],
+        'Go': ['go', 'golang'],
+        'C#': ['c#', 'csharp', 'c sharp'],
+        'C++': ['c++', 'cpp'],
+        'PHP': ['php'],
+        'SQL': ['sql'],
+        'PostgreSQL': ['postgresql', 'postgres', 'постгрес'],
+        'MySQL': ['mysql'],
+        'Django': ['django', 'джанго'],
+        'FastAPI': ['fastapi'],
+        'Flask': ['flask'],
+        'React': ['react', 'react.js', 'reactjs'],
+        'Vue.js': ['vue.js', 'vue', 'vuejs'],
+        'Docker': ['docker', 'докер'],
+        'Kubernetes': ['kubernetes', 'k8s'],
+        'Git': ['git', 'гит'],
+        'Linux': ['linux', 'линукс'],
+    },
+    'language': {
+        'Русский': ['русский', 'russian', 'рус'],
+        'Английский': ['английский', 'english', 'англ'],
+        'Казахский': ['казахский', 'kazakh', 'қазақ', 'қазақша'],
+        'Немецкий': ['немецкий', 'german', 'deutsch'],
+        'Китайский': ['китайский', 'chinese'],
+        'Турецкий': ['турецкий', 'turkish'],
+    },
+}
+
+
+def seed_skills(apps, schema_editor):
+    Skill = apps.get_model('auth_freedom', 'Skill')
+    SkillAlias = apps.get_model('auth_freedom', 'SkillAlias')
+    for kind, skills in SKILLS.items():
+        for name, aliases in skills.items():
+            skill, _ = Skill.objects.get_or_create(kind=kind, name=name)
+            for alias in aliases:
+                SkillAlias.objects.get_or_create(kind=kind, alias=alias, defaults={'skill': skill})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0007_skill_vocabulary'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_skills, migrations.RunPython.noop),
+    ]
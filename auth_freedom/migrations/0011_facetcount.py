@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0010_user_email_lower_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('context_dimension', models.CharField(blank=True, default='', max_length=50)),
+                ('context_value', models.CharField(blank=True, default='', max_length=255)),
+                ('dimension', models.CharField(max_length=50)),
+                ('value', models.CharField(max_length=255)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Счётчик фасета',
+                'verbose_name_plural': 'Счётчики фасетов',
+                'constraints': [models.UniqueConstraint(fields=('context_dimension', 'context_value', 'dimension', 'value'), name='unique_facet_count')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0011_facetcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counter', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('shard', models.SmallIntegerField()),
+                ('delta', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Приращение счётчика',
+                'verbose_name_plural': 'Приращения счётчиков',
+                'constraints': [models.UniqueConstraint(fields=('counter', 'object_id', 'shard'), name='unique_counter_shard')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:41
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0014_resumejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateSignature',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='auth_freedom.candidateprofile')),
+                ('email_key', models.CharField(blank=True, db_index=True, default='', max_length=254)),
+                ('phone_key', models.CharField(blank=True, db_index=True, default='', max_length=20)),
+                ('minhash', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None)),
+                ('bands', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, size=None)),
+                ('source_hash', models.CharField(max_length=32)),
+                ('stale', models.BooleanField(db_index=True, default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Подпись кандидата',
+                'verbose_name_plural': 'Подписи кандидатов',
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['bands'], name='candidate_signature_bands_gin')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DuplicateCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('email', 'Совпадает email'), ('phone', 'Совпадает телефон'), ('similar', 'Похожие профили')], max_length=20, verbose_name='Причина')),
+                ('similarity', models.FloatField(verbose_name='Сходство')),
+                ('status', models.CharField(choices=[('pending', 'На проверке'), ('merged', 'Объединены'), ('dismissed', 'Не дубли')], db_index=True, default='pending', max_length=20, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Найдено')),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True, verbose_name='Проверено')),
+                ('profile_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='auth_freedom.candidateprofile', verbose_name='Основной профиль')),
+                ('profile_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='auth_freedom.candidateprofile', verbose_name='Дубль')),
+            ],
+            options={
+                'verbose_name': 'Возможный дубль',
+                'verbose_name_plural': 'Возможные дубли',
+                'constraints': [models.UniqueConstraint(fields=('profile_a', 'profile_b'), name='unique_duplicate_pair')],
+            },
+        ),
+    ]
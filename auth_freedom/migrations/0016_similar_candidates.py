@@ -0,0 +1,46 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:44
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0015_candidate_dedupe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermFrequency',
+            fields=[
+                ('term', models.IntegerField(primary_key=True, serialize=False)),
+                ('documents', models.IntegerField()),
+            ],
+            options={
+                'verbose_name': 'Частота термина',
+                'verbose_name_plural': 'Частоты терминов',
+            },
+        ),
+        migrations.CreateModel(
+            name='CandidateVector',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='vector', serialize=False, to='auth_freedom.candidateprofile')),
+                ('terms', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None)),
+                ('weights', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), default=list, size=None)),
+                ('level', models.CharField(blank=True, default='', max_length=20)),
+                ('location', models.CharField(blank=True, default='', max_length=201)),
+                ('neighbours', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, size=None)),
+                ('scores', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), default=list, size=None)),
+                ('stale', models.BooleanField(db_index=True, default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Вектор кандидата',
+                'verbose_name_plural': 'Векторы кандидатов',
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['terms'], name='candidate_vector_terms_gin'), django.contrib.postgres.indexes.GinIndex(fields=['neighbours'], name='candidate_vector_nbrs_gin')],
+            },
+        ),
+    ]
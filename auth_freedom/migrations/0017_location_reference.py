@@ -0,0 +1,102 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:47
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0016_similar_candidates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('kind', models.CharField(choices=[('country', 'Страна'), ('region', 'Регион'), ('city', 'Город')], max_length=20, verbose_name='Тип')),
+                ('path', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None)),
+            ],
+            options={
+                'verbose_name': 'Местоположение',
+                'verbose_name_plural': 'Местоположения',
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=100, verbose_name='Написание')),
+            ],
+            options={
+                'verbose_name': 'Синоним места',
+                'verbose_name_plural': 'Синонимы мест',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='candidateprofile',
+            name='candidate_location_idx',
+        ),
+        migrations.AddField(
+            model_name='candidateprofile',
+            name='country_id',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='candidateprofile',
+            name='region_id',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='recruiterprofile',
+            name='country_id',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='recruiterprofile',
+            name='region_id',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=models.Index(fields=['is_active', 'country_id', 'region_id', '-id'], name='candidate_location_ids_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=models.Index(fields=['is_active', 'region_id', '-id'], name='candidate_region_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='auth_freedom.location', verbose_name='Входит в'),
+        ),
+        migrations.AddField(
+            model_name='locationalias',
+            name='location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='auth_freedom.location', verbose_name='Место'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['path'], name='location_path_gin'),
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(fields=('parent', 'name'), name='unique_location_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(condition=models.Q(('parent__isnull', True)), fields=('name',), name='unique_root_location_name'),
+        ),
+        migrations.AddIndex(
+            model_name='locationalias',
+            index=models.Index(fields=['alias'], name='location_alias_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='locationalias',
+            constraint=models.UniqueConstraint(fields=('location', 'alias'), name='unique_location_alias'),
+        ),
+    ]
@@ -0,0 +1,106 @@
+from django.db import migrations
+
+# (название, тип, написания, вложенные места). Название само по себе тоже
+# написание и добавляется автоматически
+LOCATIONS = [
+    ('Казахстан', 'country', ['kazakhstan', 'kz', 'қазақстан', 'республика казахстан', 'рк'], [
+        ('Астана', 'city', ['astana', 'нур-султан', 'нурсултан', 'nur-sultan', 'целиноград'], []),
+        ('Алматы', 'city', ['almaty', 'алма-ата', 'алмата', 'alma-ata'], []),
+        ('Шымкент', 'city', ['shymkent', 'чимкент'], []),
+        ('Абайская область', 'region', ['абайская', 'область абай', 'abai region'], [
+            ('Семей', 'city', ['semey', 'семипалатинск'], []),
+        ]),
+        ('Акмолинская область', 'region', ['акмолинская', 'akmola region'], [
+            ('Кокшетау', 'city', ['kokshetau', 'кокчетав'], []),
+        ]),
+        ('Актюбинская область', 'region', ['актюбинская', 'aktobe region'], [
+            ('Актобе', 'city', ['aktobe', 'актюбинск'], []),
+        ]),
+        ('Алматинская область', 'region', ['алматинская', 'almaty region'], [
+            ('Конаев', 'city', ['konaev', 'капчагай', 'қонаев'], []),
+        ]),
+        ('Атырауская область', 'region', ['атырауская', 'atyrau region'], [
+            ('Атырау', 'city', ['atyrau', 'гурьев'], []),
+        ]),
+        ('Восточно-Казахстанская область', 'region', ['вко', 'восточно-казахстанская', 'east kazakhstan region'], [
+            ('Усть-Каменогорск', 'city', ['ust-kamenogorsk', 'оскемен', 'өскемен', 'oskemen'], []),
+        ]),
+        ('Жамбылская область', 'region', ['жамбылская', 'jambyl region', 'zhambyl region'], [
+            ('Тараз', 'city', ['taraz', 'джамбул'], []),
+        ]),
+        ('Жетысуская область', 'region', ['жетысуская', 'область жетысу', 'zhetysu region'], [
+            ('Талдыкорган', 'city', ['taldykorgan'], []),
+        ]),
+        ('Западно-Казахстанская область', 'region', ['зко', 'западно-казахстанская', 'west kazakhstan region'], [
+            ('Уральск', 'city', ['uralsk', 'орал', 'oral'], []),
+        ]),
+        ('Карагандинская область', 'region', ['карагандинская', 'karaganda region'], [
+            ('Караганда', 'city', ['karaganda', 'qaragandy', 'қарағанды'], []),
+        ]),
+        ('Костанайская область', 'region', ['костанайская', 'kostanay region'], [
+            ('Костанай', 'city', ['kostanay', 'кустанай', 'qostanay'], []),
+        ]),
+        ('Кызылординская область', 'region', ['кызылординская', 'kyzylorda region'], [
+            ('Кызылорда', 'city', ['kyzylorda'], []),
+        ]),
+        ('Мангистауская область', 'region', ['мангистауская', 'mangystau region'], [
+            ('Актау', 'city', ['aktau', 'шевченко'], []),
+        ]),
+        ('Павлодарская область', 'region', ['павлодарская', 'pavlodar region'], [
+            ('Павлодар', 'city', ['pavlodar'], []),
+        ]),
+        ('Северо-Казахстанская область', 'region', ['ско', 'северо-казахстанская', 'north kazakhstan region'], [
+            ('Петропавловск', 'city', ['petropavl', 'petropavlovsk', 'петропавл'], []),
+        ]),
+        ('Туркестанская область', 'region', ['туркестанская', 'turkistan region'], [
+            ('Туркестан', 'city', ['turkistan', 'turkestan'], []),
+        ]),
+        ('Улытауская область', 'region', ['улытауская', 'ulytau region'], [
+            ('Жезказган', 'city', ['zhezkazgan', 'джезказган'], []),
+        ]),
+    ]),
+    ('Россия', 'country', ['russia', 'рф', 'российская федерация', 'ru'], [
+        ('Москва', 'city', ['moscow', 'мск'], []),
+        ('Санкт-Петербург', 'city', ['saint petersburg', 'st. petersburg', 'спб', 'питер'], []),
+        ('Новосибирск', 'city', ['novosibirsk'], []),
+    ]),
+    ('Узбекистан', 'country', ['uzbekistan', 'uz', 'ўзбекистон'], [
+        ('Ташкент', 'city', ['tashkent', 'toshkent'], []),
+        ('Самарканд', 'city', ['samarkand', 'samarqand'], []),
+    ]),
+    ('Кыргызстан', 'country', ['kyrgyzstan', 'киргизия', 'kg', 'кыргызская республика'], [
+        ('Бишкек', 'city', ['bishkek', 'фрунзе'], []),
+    ]),
+]
+
+
+def normalize(value):
+    return ' '.join(value.split()).casefold()
+
+
+def seed_locations(apps, schema_editor):
+    Location = apps.get_model('auth_freedom', 'Location')
+    LocationAlias = apps.get_model('auth_freedom', 'LocationAlias')
+
+    def create(items, parent):
+        for name, kind, aliases, children in items:
+            location, _ = Location.objects.get_or_create(parent=parent, name=name, defaults={'kind': kind})
+            # Историческая модель не вызывает Location.save(), путь пишем сами
+            location.path = (list(parent.path) if parent else []) + [location.id]
+            location.save(update_fields=['path'])
+            for alias in {normalize(name), *map(normalize, aliases)}:
+                LocationAlias.objects.get_or_create(location=location, alias=alias)
+            create(children, location)
+
+    create(LOCATIONS, None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0017_location_reference'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_locations, migrations.RunPython.noop),
+    ]
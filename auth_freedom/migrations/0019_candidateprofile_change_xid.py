@@ -0,0 +1,44 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:57
+
+from django.db import migrations, models
+
+# Номер пишущей транзакции на любой INSERT и UPDATE строки профиля, в том
+# числе из bulk_create, bulk_update и update(), которые не вызывают сигналов
+CREATE_TRIGGER = """
+CREATE FUNCTION auth_freedom_candidate_change_xid() RETURNS trigger AS $$
+BEGIN
+    NEW.change_xid := txid_current();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER auth_freedom_candidate_change_xid_update
+    BEFORE INSERT OR UPDATE
+    ON auth_freedom_candidateprofile
+    FOR EACH ROW EXECUTE FUNCTION auth_freedom_candidate_change_xid();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS auth_freedom_candidate_change_xid_update ON auth_freedom_candidateprofile;
+DROP FUNCTION IF EXISTS auth_freedom_candidate_change_xid();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0018_seed_locations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidateprofile',
+            name='change_xid',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='candidateprofile',
+            index=models.Index(fields=['change_xid'], name='candidate_change_xid_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
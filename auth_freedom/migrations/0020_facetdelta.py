@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0019_candidateprofile_change_xid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('context_dimension', models.CharField(blank=True, default='', max_length=50)),
+                ('context_value', models.CharField(blank=True, default='', max_length=255)),
+                ('dimension', models.CharField(max_length=50)),
+                ('value', models.CharField(max_length=255)),
+                ('delta', models.IntegerField()),
+            ],
+            options={
+                'verbose_name': 'Изменение фасета',
+                'verbose_name_plural': 'Изменения фасетов',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0020_facetdelta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestprofile',
+            name='event_loop',
+            field=models.BooleanField(default=False, help_text='Асинхронный запрос: в дампе весь поток цикла событий, включая корутины других запросов, но без кода в потоках sync_to_async', verbose_name='Цикл событий'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:31
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+seed = import_module('auth_freedom.migrations.0008_seed_skill_vocabulary')
+
+
+def mark_uncurated(apps, schema_editor):
+    # Проверенными остаются написания из словаря 0008; остальные могли
+    # появиться из ввода пользователей и ждут проверки в админке
+    SkillAlias = apps.get_model('auth_freedom', 'SkillAlias')
+    seeded = {
+        (kind, alias) for kind, skills in seed.SKILLS.items()
+        for aliases in skills.values() for alias in aliases
+    }
+    uncurated = [
+        alias_id for alias_id, kind, alias in SkillAlias.objects.values_list('id', 'kind', 'alias')
+        if (kind, alias) not in seeded
+    ]
+    SkillAlias.objects.filter(id__in=uncurated).update(curated=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_freedom', '0021_requestprofile_event_loop'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skillalias',
+            name='curated',
+            field=models.BooleanField(default=True, verbose_name='Проверено'),
+        ),
+        migrations.RunPython(mark_uncurated, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,63 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Lower
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
+import copy
+
+class TrackedFieldsMixin(models.Model):
+    # Запоминает значения полей при загрузке из БД; save() без update_fields
+    # пишет только изменившиеся столбцы, а без изменений не делает запроса
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def _tracked_fields(self):
+        return [field for field in self._meta.concrete_fields if not field.primary_key]
+
+    def _snapshot(self, field_names=None):
+        if not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+        for field in self._tracked_fields():
+            if field_names is not None and field.name not in field_names:
+                continue
+            # Отложенные (defer/only) поля не запоминаем, пока их не загрузят
+            if field.attname in self.__dict__:
+                self._loaded_values[field.name] = copy.deepcopy(self.__dict__[field.attname])
+
+    def get_dirty_fields(self):
+        loaded = getattr(self, '_loaded_values', {})
+        dirty = set()
+        for field in self._tracked_fields():
+            if field.attname not in self.__dict__:
+                continue
+            if field.name not in loaded or loaded[field.name] != self.__dict__[field.attname]:
+                dirty.add(field.name)
+        return dirty
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._snapshot(kwargs.get('fields'))
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and hasattr(self, '_loaded_values'):
+            # Пустой update_fields — Django пропускает сохранение целиком
+            kwargs['update_fields'] = self.get_dirty_fields()
+        super().save(*args, **kwargs)
+        self._snapshot(kwargs.get('update_fields'))
 
 # Create your models here.
-class User(AbstractUser):
+class User(TrackedFieldsMixin, AbstractUser):
     USER_TYPE_CHOICES = [
         ('recruiter', 'Рекрутер'),
         ('candidate', 'Кандидат'),
@@ -19,8 +71,130 @@ class User(AbstractUser):
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
+        indexes = [
+            # Поиск по email без учёта регистра (импорт с обновлением по email)
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+        ]
+
+class Skill(models.Model):
+    KIND_CHOICES = [
+        ('skill', 'Навык'),
+        ('language', 'Язык'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="Название")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Тип", default='skill')
+
+    class Meta:
+        verbose_name = "Навык"
+        verbose_name_plural = "Навыки"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'name'], name='unique_skill_kind_name'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class SkillAlias(models.Model):
+    # Нормализованное написание (без регистра и лишних пробелов) -> навык
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='aliases', verbose_name="Навык")
+    kind = models.CharField(max_length=20, choices=Skill.KIND_CHOICES, verbose_name="Тип", default='skill')
+    alias = models.CharField(max_length=100, verbose_name="Написание")
+    # Проверенные написания (словарь и добавленные в админке) ищутся в текстах
+    # резюме; созданные из ввода пользователей — нет, пока их не проверят
+    curated = models.BooleanField(default=True, verbose_name="Проверено")
+
+    class Meta:
+        verbose_name = "Синоним навыка"
+        verbose_name_plural = "Синонимы навыков"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'alias'], name='unique_skill_alias'),
+        ]
+
+    def __str__(self):
+        return self.alias
+
+    def save(self, *args, **kwargs):
+        self.kind = self.skill.kind
+        self.alias = ' '.join(self.alias.split()).casefold()
+        super().save(*args, **kwargs)
+
+class Location(models.Model):
+    # Справочник мест: страна -> регион -> город. path — id предков и самой
+    # записи (материализованный путь): всё внутри места — path @> [id]
+    KIND_CHOICES = [
+        ('country', 'Страна'),
+        ('region', 'Регион'),
+        ('city', 'Город'),
+    ]
 
-class RecruiterProfile(models.Model):
+    name = models.CharField(max_length=100, verbose_name="Название")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Тип")
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children', verbose_name="Входит в")
+    path = ArrayField(models.IntegerField(), default=list, blank=True, editable=False)
+
+    class Meta:
+        verbose_name = "Местоположение"
+        verbose_name_plural = "Местоположения"
+        constraints = [
+            models.UniqueConstraint(fields=['parent', 'name'], name='unique_location_name'),
+            models.UniqueConstraint(fields=['name'], condition=models.Q(parent__isnull=True), name='unique_root_location_name'),
+        ]
+        indexes = [
+            GinIndex(fields=['path'], name='location_path_gin'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        parent_path = list(Location.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or [])
+        path = parent_path + [self.id]
+        if path != self.path:
+            old_path, self.path = self.path, path
+            Location.objects.filter(pk=self.pk).update(path=path)
+            # Перенос в другого родителя меняет пути всех вложенных мест
+            if old_path:
+                for child_id, child_path in Location.objects.filter(path__contains=[self.id]).exclude(pk=self.pk).values_list('id', 'path'):
+                    Location.objects.filter(pk=child_id).update(path=path + child_path[len(old_path):])
+
+class LocationAlias(models.Model):
+    # Нормализованное написание (без регистра и лишних пробелов) -> место
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='aliases', verbose_name="Место")
+    alias = models.CharField(max_length=100, verbose_name="Написание")
+
+    class Meta:
+        verbose_name = "Синоним места"
+        verbose_name_plural = "Синонимы мест"
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'alias'], name='unique_location_alias'),
+        ]
+        indexes = [
+            models.Index(fields=['alias'], name='location_alias_idx'),
+        ]
+
+    def __str__(self):
+        return self.alias
+
+    def save(self, *args, **kwargs):
+        self.alias = ' '.join(self.alias.split()).casefold()
+        super().save(*args, **kwargs)
+
+class RevokedToken(models.Model):
+    # Отозванные JWT (access и refresh) по jti; строки удаляются после exp
+    jti = models.CharField(max_length=255, unique=True, verbose_name="JTI")
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Истекает")
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Отозван")
+
+    class Meta:
+        verbose_name = "Отозванный токен"
+        verbose_name_plural = "Отозванные токены"
+
+    def __str__(self):
+        return self.jti
+
+class RecruiterProfile(TrackedFieldsMixin, models.Model):
     GENDER_CHOICES = [
         ('male', 'Мужской'),
         ('female', 'Женский'),
@@ -40,12 +214,111 @@ class RecruiterProfile(models.Model):
     processed_applications = models.IntegerField(default=0, verbose_name="Обработано заявок")
     successful_applications = models.IntegerField(default=0, verbose_name="Успешно обработанные заявки")
     social_networks = models.JSONField(verbose_name="Социальные сети", default=dict, blank=True)
+    # Location для country и region, заполняются в save()
+    country_id = models.IntegerField(null=True, blank=True, editable=False)
+    region_id = models.IntegerField(null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = "Профиль рекрутера"
         verbose_name_plural = "Профили рекрутеров"
 
-class CandidateProfile(models.Model):
+    def save(self, *args, **kwargs):
+        from .locations import resolve_profile_location
+        changed = resolve_profile_location(self, kwargs.get('update_fields'))
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | changed
+        super().save(*args, **kwargs)
+
+class FacetCount(models.Model):
+    # Число активных кандидатов со значением value в измерении dimension
+    # среди тех, у кого context_dimension = context_value. Пустой контекст —
+    # счётчики по всем кандидатам. Поддерживается переносом очереди FacetDelta
+    # и полным пересчётом из auth_freedom.facets
+    context_dimension = models.CharField(max_length=50, blank=True, default='')
+    context_value = models.CharField(max_length=255, blank=True, default='')
+    dimension = models.CharField(max_length=50)
+    value = models.CharField(max_length=255)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Счётчик фасета"
+        verbose_name_plural = "Счётчики фасетов"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['context_dimension', 'context_value', 'dimension', 'value'],
+                name='unique_facet_count',
+            ),
+        ]
+
+class FacetDelta(models.Model):
+    # Ещё не перенесённые в FacetCount изменения счётчиков. Сохранение профиля
+    # только дописывает сюда строки, не блокируя общие счётчики; переносит их
+    # manage.py fold_facets. См. auth_freedom.facets
+    context_dimension = models.CharField(max_length=50, blank=True, default='')
+    context_value = models.CharField(max_length=255, blank=True, default='')
+    dimension = models.CharField(max_length=50)
+    value = models.CharField(max_length=255)
+    delta = models.IntegerField()
+
+    class Meta:
+        verbose_name = "Изменение фасета"
+        verbose_name_plural = "Изменения фасетов"
+
+class CounterShard(models.Model):
+    # Ещё не перенесённые в профиль приращения счётчика. Приращения одного
+    # объекта раскладываются по нескольким строкам (shard), чтобы параллельные
+    # запросы не ждали блокировку одной строки. См. auth_freedom.counters
+    counter = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    shard = models.SmallIntegerField()
+    delta = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Приращение счётчика"
+        verbose_name_plural = "Приращения счётчиков"
+        constraints = [
+            models.UniqueConstraint(fields=['counter', 'object_id', 'shard'], name='unique_counter_shard'),
+        ]
+
+class ProfilingRule(models.Model):
+    # Включённое из админки профилирование: следующие remaining запросов
+    # с путём, начинающимся на path_prefix, до expires_at
+    path_prefix = models.CharField(max_length=255, verbose_name="Начало пути")
+    remaining = models.PositiveIntegerField(default=10, verbose_name="Осталось запросов")
+    expires_at = models.DateTimeField(verbose_name="Действует до")
+
+    class Meta:
+        verbose_name = "Правило профилирования"
+        verbose_name_plural = "Правила профилирования"
+
+    def __str__(self):
+        return self.path_prefix
+
+class RequestProfile(models.Model):
+    # Сохранённый профиль запроса; сам дамп cProfile лежит в PROFILER_DIR
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Создан")
+    method = models.CharField(max_length=10, verbose_name="Метод")
+    path = models.CharField(max_length=2000, verbose_name="Путь")
+    view = models.CharField(max_length=255, blank=True, verbose_name="Представление")
+    status = models.PositiveSmallIntegerField(verbose_name="Код ответа")
+    duration_ms = models.FloatField(db_index=True, verbose_name="Длительность, мс")
+    reason = models.CharField(max_length=20, verbose_name="Причина")
+    event_loop = models.BooleanField(
+        default=False, verbose_name="Цикл событий",
+        help_text="Асинхронный запрос: в дампе весь поток цикла событий, включая корутины других запросов, "
+                  "но без кода в потоках sync_to_async",
+    )
+    file_name = models.CharField(max_length=255, verbose_name="Файл")
+    size = models.PositiveIntegerField(verbose_name="Размер, байт")
+
+    class Meta:
+        verbose_name = "Профиль запроса"
+        verbose_name_plural = "Профили запросов"
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
+
+class CandidateProfile(TrackedFieldsMixin, models.Model):
     LEVEL_CHOICES = [
         ('no_experience', 'Без опыта'),
         ('intern', 'Intern'),
@@ -102,14 +375,192 @@ class CandidateProfile(models.Model):
     level = models.CharField(max_length=20, choices=LEVEL_CHOICES, verbose_name="Уровень", default='no_experience')
     resume_text = models.TextField(verbose_name="Текст резюме", blank=True, default='')
     is_active = models.BooleanField(default=True, verbose_name="Активен")
+    # Идентификаторы Skill для полей-массивов выше, заполняются в save()
+    hard_skill_ids = ArrayField(models.IntegerField(), default=list, blank=True, editable=False)
+    soft_skill_ids = ArrayField(models.IntegerField(), default=list, blank=True, editable=False)
+    tech_stack_ids = ArrayField(models.IntegerField(), default=list, blank=True, editable=False)
+    language_ids = ArrayField(models.IntegerField(), default=list, blank=True, editable=False)
+    # Location для country и region (region_id — самое точное место, регион
+    # или город), заполняются в save()
+    country_id = models.IntegerField(null=True, blank=True, editable=False)
+    region_id = models.IntegerField(null=True, blank=True, editable=False)
+    # Заполняется триггером в БД из resume_text и about_me (русский + английский)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Номер последней пишущей транзакции, ставится триггером в БД при любой
+    # записи строки; по нему матрица подбора находит изменённые профили
+    change_xid = models.BigIntegerField(null=True, editable=False)
 
     class Meta:
         verbose_name = "Профиль кандидата"
         verbose_name_plural = "Профили кандидатов"
+        indexes = [
+            # GIN-индексы для @> (содержит все) и && (пересечение) по массивам
+            GinIndex(fields=['hard_skill_ids'], name='candidate_hard_skill_ids_gin'),
+            GinIndex(fields=['tech_stack_ids'], name='candidate_tech_stack_ids_gin'),
+            GinIndex(fields=['language_ids'], name='candidate_language_ids_gin'),
+            GinIndex(fields=['certifications'], name='candidate_certs_gin'),
+            GinIndex(fields=['search_vector'], name='candidate_search_vector_gin'),
+            # Составные B-tree индексы под фильтры поиска; id в конце позволяет
+            # отдавать страницы по курсору без сортировки
+            models.Index(fields=['is_active', 'level', 'search_status', '-id'], name='candidate_level_status_idx'),
+            models.Index(fields=['is_active', 'country_id', 'region_id', '-id'], name='candidate_location_ids_idx'),
+            models.Index(fields=['is_active', 'region_id', '-id'], name='candidate_region_id_idx'),
+            models.Index(fields=['is_active', 'relocation_status', '-id'], name='candidate_relocation_idx'),
+            models.Index(fields=['is_active', 'experience'], name='candidate_experience_idx'),
+            models.Index(fields=['is_active', 'desired_salary'], name='candidate_salary_idx'),
+            models.Index(fields=['change_xid'], name='candidate_change_xid_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        from .extraction import extract_profile_skills
+        from .locations import resolve_profile_location
+        from .skills import intern_profile_skills
+        extracted = extract_profile_skills(self, kwargs.get('update_fields'))
+        if extracted and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | extracted
+        changed = intern_profile_skills(self, kwargs.get('update_fields'))
+        changed |= resolve_profile_location(self, kwargs.get('update_fields'))
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | changed
+        super().save(*args, **kwargs)
+
+class ResumeJob(models.Model):
+    # Загруженное резюме в очереди на разбор; выбирается воркером
+    # manage.py resume_worker через SELECT ... FOR UPDATE SKIP LOCKED
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('running', 'Обрабатывается'),
+        ('done', 'Готово'),
+        ('failed', 'Ошибка'),
+    ]
+
+    profile = models.ForeignKey(CandidateProfile, on_delete=models.CASCADE, related_name='resume_jobs', verbose_name="Кандидат")
+    file_name = models.CharField(max_length=255, verbose_name="Файл")
+    original_name = models.CharField(max_length=255, verbose_name="Исходное имя")
+    size = models.PositiveIntegerField(verbose_name="Размер, байт")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Не раньше")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взято в работу")
+    error = models.TextField(blank=True, default='', verbose_name="Ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершено")
+
+    class Meta:
+        verbose_name = "Разбор резюме"
+        verbose_name_plural = "Разбор резюме"
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='resume_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return self.original_name
+
+class CandidateSignature(models.Model):
+    # Признаки профиля для поиска дублей (auth_freedom.dedupe): ключи точного
+    # совпадения и MinHash-подпись по тексту резюме, имени и навыкам. Полосы
+    # LSH (bands) — хеши участков подписи; пересечение по GIN-индексу даёт
+    # кандидатов в дубли без сравнения всех пар. stale — профиль изменился
+    profile = models.OneToOneField(CandidateProfile, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    email_key = models.CharField(max_length=254, blank=True, default='', db_index=True)
+    phone_key = models.CharField(max_length=20, blank=True, default='', db_index=True)
+    minhash = ArrayField(models.IntegerField(), default=list)
+    bands = ArrayField(models.BigIntegerField(), default=list)
+    source_hash = models.CharField(max_length=32)
+    stale = models.BooleanField(default=False, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Подпись кандидата"
+        verbose_name_plural = "Подписи кандидатов"
+        indexes = [
+            GinIndex(fields=['bands'], name='candidate_signature_bands_gin'),
+        ]
+
+class DuplicateCandidate(models.Model):
+    # Пара профилей, похожих на одного человека; разбирается в админке.
+    # profile_a — профиль с меньшим id, он остаётся после объединения
+    REASON_CHOICES = [
+        ('email', 'Совпадает email'),
+        ('phone', 'Совпадает телефон'),
+        ('similar', 'Похожие профили'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'На проверке'),
+        ('merged', 'Объединены'),
+        ('dismissed', 'Не дубли'),
+    ]
+
+    profile_a = models.ForeignKey(CandidateProfile, on_delete=models.CASCADE, related_name='+', verbose_name="Основной профиль")
+    profile_b = models.ForeignKey(CandidateProfile, on_delete=models.CASCADE, related_name='+', verbose_name="Дубль")
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, verbose_name="Причина")
+    similarity = models.FloatField(verbose_name="Сходство")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name="Статус")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Найдено")
+    reviewed_at = models.DateTimeField(null=True, blank=True, verbose_name="Проверено")
+
+    class Meta:
+        verbose_name = "Возможный дубль"
+        verbose_name_plural = "Возможные дубли"
+        constraints = [
+            models.UniqueConstraint(fields=['profile_a', 'profile_b'], name='unique_duplicate_pair'),
+        ]
+
+    def __str__(self):
+        return f'{self.profile_a_id} ~ {self.profile_b_id}'
+
+class TermFrequency(models.Model):
+    # Число профилей с термином (хеш слова или навыка) — для IDF и отсечения
+    # частых признаков в auth_freedom.similar; пересчитывается при полной
+    # перестройке индекса
+    term = models.IntegerField(primary_key=True)
+    documents = models.IntegerField()
+
+    class Meta:
+        verbose_name = "Частота термина"
+        verbose_name_plural = "Частоты терминов"
+
+class CandidateVector(models.Model):
+    # Разреженный вектор профиля (TF-IDF текста и навыки: terms — хеши
+    # признаков, weights — веса) и заранее посчитанный список ближайших
+    # профилей. Список похожих кандидатов — одно чтение по первичному ключу
+    profile = models.OneToOneField(CandidateProfile, on_delete=models.CASCADE, primary_key=True, related_name='vector')
+    terms = ArrayField(models.IntegerField(), default=list)
+    weights = ArrayField(models.FloatField(), default=list)
+    level = models.CharField(max_length=20, blank=True, default='')
+    location = models.CharField(max_length=201, blank=True, default='')
+    neighbours = ArrayField(models.BigIntegerField(), default=list)
+    scores = ArrayField(models.FloatField(), default=list)
+    stale = models.BooleanField(default=False, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Вектор кандидата"
+        verbose_name_plural = "Векторы кандидатов"
+        indexes = [
+            # terms — профили с общими признаками, neighbours — чьи списки
+            # затрагивает изменение профиля
+            GinIndex(fields=['terms'], name='candidate_vector_terms_gin'),
+            GinIndex(fields=['neighbours'], name='candidate_vector_nbrs_gin'),
+        ]
+
+def recruiter_profile_defaults(user):
+    is_admin = user.user_type == 'admin' or user.is_superuser
+    return {
+        'first_name': getattr(user, 'first_name', ''),
+        'last_name': getattr(user, 'last_name', ''),
+        'email': getattr(user, 'email', ''),
+        'department': 'HR' if is_admin else '',
+        'country': 'Казахстан' if is_admin else '',
+        'region': 'Все регионы' if is_admin else '',
+        'processed_applications': 0,
+        'successful_applications': 0,
+        'social_networks': {},
+    }
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
-    if created:
+    if created and not getattr(instance, '_skip_profile_creation', False):
         if instance.user_type == 'candidate':
             CandidateProfile.objects.create(
                 user=instance,
@@ -124,8 +575,6 @@ def create_user_profile(sender, instance, created, **kwargs):
                 certifications=[],
                 languages=['Русский'],
                 desired_salary=0,
-                location='',
-                skills=[],
                 resume_text='',
                 hard_skills=[],
                 soft_skills=[],
@@ -137,23 +586,31 @@ def create_user_profile(sender, instance, created, **kwargs):
                 relocation_status='not_ready'
             )
         elif instance.user_type in ['recruiter', 'admin'] or instance.is_superuser:
-            RecruiterProfile.objects.create(
-                user=instance,
-                first_name=instance.first_name,
-                last_name=instance.last_name,
-                email=instance.email,
-                department='HR' if instance.user_type == 'admin' or instance.is_superuser else '',
-                country='Казахстан' if instance.user_type == 'admin' or instance.is_superuser else '',
-                region='Все регионы' if instance.user_type == 'admin' or instance.is_superuser else '',
-                processed_applications=0,
-                successful_applications=0,
-                social_networks={}
-            )
+            RecruiterProfile.objects.create(user=instance, **recruiter_profile_defaults(instance))
+
+# Поля пользователя, которые копируются в профиль
+PROFILE_MIRRORED_FIELDS = ('first_name', 'last_name', 'email')
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    if instance.user_type == 'recruiter' and hasattr(instance, 'recruiter_profile'):
-        instance.recruiter_profile.save()
-    elif instance.user_type == 'candidate' and hasattr(instance, 'candidate_profile'):
-        instance.candidate_profile.save()
+def save_user_profile(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if instance.user_type == 'recruiter':
+        descriptor = User.recruiter_profile
+    elif instance.user_type == 'candidate':
+        descriptor = User.candidate_profile
+    else:
+        return
 
+    mirrored = [name for name in PROFILE_MIRRORED_FIELDS if update_fields is None or name in update_fields]
+    if not mirrored and not descriptor.is_cached(instance):
+        # Например, обновление last_login при входе: профиль не трогаем
+        return
+    try:
+        profile = getattr(instance, descriptor.related.get_accessor_name())
+    except descriptor.RelatedObjectDoesNotExist:
+        return
+    for name in mirrored:
+        setattr(profile, name, getattr(instance, name))
+    # Профиль сам определит изменившиеся поля; без изменений запроса не будет
+    profile.save()
@@ -0,0 +1,123 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import CandidateProfile, RecruiterProfile, User, recruiter_profile_defaults
+
+# Увеличивается при изменении шаблонов тела профиля
+TEMPLATE_VERSION = 1
+
+# Поля пользователя, которые выводятся в теле профиля
+USER_FIELDS = ('username', 'first_name', 'last_name', 'email')
+
+BODY_TEMPLATES = {
+    'candidate': 'auth_freedom/includes/candidate_profile_body.html',
+    'recruiter': 'auth_freedom/includes/recruiter_profile_body.html',
+}
+
+
+def get_cache():
+    return caches[getattr(settings, 'PROFILE_CACHE_ALIAS', 'default')]
+
+
+def version_key(kind, user_id):
+    return f'profile-version:{kind}:{user_id}'
+
+
+def body_key(kind, user_id, version):
+    return f'profile-body:{TEMPLATE_VERSION}:{kind}:{user_id}:{version}'
+
+
+def current_version(cache, kind, user_id):
+    # Версия — момент последнего изменения; если её вытеснили из кеша,
+    # новая не совпадёт ни с одним старым телом
+    version = cache.get(version_key(kind, user_id))
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(version_key(kind, user_id), version, timeout=None):
+            version = cache.get(version_key(kind, user_id), version)
+    return version
+
+
+async def acurrent_version(cache, kind, user_id):
+    version = await cache.aget(version_key(kind, user_id))
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(version_key(kind, user_id), version, timeout=None):
+            version = await cache.aget(version_key(kind, user_id), version)
+    return version
+
+
+def load_profile(kind, user):
+    if kind == 'candidate':
+        return CandidateProfile.objects.select_related('user').get(user_id=user.id)
+    profile, _ = RecruiterProfile.objects.select_related('user').get_or_create(
+        user_id=user.id, defaults=recruiter_profile_defaults(user),
+    )
+    return profile
+
+
+async def aload_profile(kind, user):
+    if kind == 'candidate':
+        return await CandidateProfile.objects.select_related('user').aget(user_id=user.id)
+    profile, _ = await RecruiterProfile.objects.select_related('user').aget_or_create(
+        user_id=user.id, defaults=recruiter_profile_defaults(user),
+    )
+    return profile
+
+
+def render_body(kind, profile):
+    return render_to_string(BODY_TEMPLATES[kind], {'profile': profile})
+
+
+def profile_body(kind, user):
+    # Отрендеренное тело профиля из кеша; при промахе — один запрос к профилю
+    cache = get_cache()
+    key = body_key(kind, user.id, current_version(cache, kind, user.id))
+    body = cache.get(key)
+    if body is None:
+        body = render_body(kind, load_profile(kind, user))
+        cache.set(key, body, timeout=getattr(settings, 'PROFILE_CACHE_TIMEOUT', 3600))
+    return mark_safe(body)
+
+
+async def aprofile_body(kind, user):
+    cache = get_cache()
+    key = body_key(kind, user.id, await acurrent_version(cache, kind, user.id))
+    body = await cache.aget(key)
+    if body is None:
+        body = render_body(kind, await aload_profile(kind, user))
+        await cache.aset(key, body, timeout=getattr(settings, 'PROFILE_CACHE_TIMEOUT', 3600))
+    return mark_safe(body)
+
+
+def invalidate(kind, user_id):
+    get_cache().set(version_key(kind, user_id), time.time_ns(), timeout=None)
+
+
+@receiver(post_save, sender=CandidateProfile)
+@receiver(post_delete, sender=CandidateProfile)
+def invalidate_candidate_profile(sender, instance, **kwargs):
+    # После коммита, чтобы параллельный запрос не закешировал старые данные
+    transaction.on_commit(lambda: invalidate('candidate', instance.user_id))
+
+
+@receiver(post_save, sender=RecruiterProfile)
+@receiver(post_delete, sender=RecruiterProfile)
+def invalidate_recruiter_profile(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate('recruiter', instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_profile(sender, instance, created, update_fields=None, **kwargs):
+    # Имя и логин берутся из пользователя; вход (last_login) тело не меняет
+    if created or (update_fields is not None and not set(update_fields) & set(USER_FIELDS)):
+        return
+    kind = 'candidate' if instance.user_type == 'candidate' else 'recruiter'
+    transaction.on_commit(lambda: invalidate(kind, instance.id))
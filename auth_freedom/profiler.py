@@ -0,0 +1,167 @@
+import cProfile
+import os
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ProfilingRule, RequestProfile
+
+HEADER = 'HTTP_X_PROFILE_REQUEST'
+SIGNING_SALT = 'auth_freedom.profiler'
+
+# Профилировщик в процессе один: параллельные cProfile мешают друг другу,
+# поэтому пока один запрос профилируется, остальные идут без профиля
+_active = threading.Lock()
+
+
+def enabled():
+    return getattr(settings, 'PROFILER_ENABLED', False)
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILER_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def make_token():
+    # Значение заголовка X-Profile-Request (см. manage.py profiler_token)
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign('profile')
+
+
+def valid_token(value):
+    try:
+        signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            value, max_age=getattr(settings, 'PROFILER_TOKEN_MAX_AGE', 3600),
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+class Rules:
+    # Активные правила из админки; перечитываются не чаще раза в RELOAD секунд,
+    # чтобы обычный запрос не ходил в БД
+    RELOAD = 5
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rules = []
+        self.loaded_at = None
+
+    def active(self):
+        now = time.monotonic()
+        with self.lock:
+            if self.loaded_at is not None and now - self.loaded_at < self.RELOAD:
+                return self.rules
+            self.loaded_at = now
+        rules = list(
+            ProfilingRule.objects.filter(remaining__gt=0, expires_at__gt=timezone.now())
+            .values_list('id', 'path_prefix')
+        )
+        with self.lock:
+            self.rules = rules
+        return rules
+
+    def take(self, path):
+        for rule_id, prefix in self.active():
+            # Условное уменьшение: правило не израсходуется больше remaining раз
+            if path.startswith(prefix) and ProfilingRule.objects.filter(
+                pk=rule_id, remaining__gt=0,
+            ).update(remaining=F('remaining') - 1):
+                return True
+        return False
+
+
+rules = Rules()
+
+
+def reason_for(request):
+    # Почему запрос профилируется, или None. Вызывается только под _active:
+    # правило из админки расходуется лишь на запрос, который будет профилирован
+    token = request.META.get(HEADER)
+    if token and valid_token(token):
+        return 'header'
+    if random.random() < getattr(settings, 'PROFILER_SAMPLE_RATE', 0.0):
+        return 'sample'
+    if rules.take(request.path):
+        return 'admin'
+    return None
+
+
+def claim():
+    # Занимает профилировщик процесса; False, если другой запрос уже профилируется
+    return _active.acquire(blocking=False)
+
+
+def release():
+    _active.release()
+
+
+def start(reason, event_loop=False):
+    # Запускает профилировщик в текущем потоке; профилировщик уже занят через
+    # claim(). event_loop — профилируется поток цикла событий (ASGI)
+    profiler = cProfile.Profile()
+    profiler.reason = reason
+    profiler.event_loop = event_loop
+    profiler.started = time.perf_counter()
+    profiler.enable()
+    return profiler
+
+
+def stop(profiler):
+    profiler.disable()
+    profiler.duration_ms = (time.perf_counter() - profiler.started) * 1000
+    release()
+
+
+def store(request, response, profiler):
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    file_name = f'{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.prof'
+    path = directory / file_name
+    profiler.dump_stats(path)
+    size = path.stat().st_size
+    if size > getattr(settings, 'PROFILER_MAX_FILE_BYTES', 5 * 1024 * 1024):
+        path.unlink()
+        return None
+    match = getattr(request, 'resolver_match', None)
+    profile = RequestProfile.objects.create(
+        method=request.method,
+        path=request.path[:2000],
+        view=match.view_name if match else '',
+        status=response.status_code,
+        duration_ms=profiler.duration_ms,
+        reason=profiler.reason,
+        event_loop=profiler.event_loop,
+        file_name=file_name,
+        size=size,
+    )
+    rotate()
+    return profile
+
+
+def rotate():
+    # Старые профили удаляются сверх лимита числа файлов и общего размера
+    max_files = getattr(settings, 'PROFILER_MAX_FILES', 200)
+    max_bytes = getattr(settings, 'PROFILER_MAX_BYTES', 200 * 1024 * 1024)
+    total = 0
+    expired = []
+    for index, (profile_id, file_name, size) in enumerate(
+        RequestProfile.objects.order_by('-created_at', '-id').values_list('id', 'file_name', 'size')
+    ):
+        total += size
+        if index >= max_files or total > max_bytes:
+            expired.append((profile_id, file_name))
+    for _, file_name in expired:
+        try:
+            os.remove(profile_dir() / file_name)
+        except FileNotFoundError:
+            pass
+    if expired:
+        RequestProfile.objects.filter(id__in=[profile_id for profile_id, _ in expired]).delete()
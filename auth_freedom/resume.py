@@ -0,0 +1,128 @@
+import re
+import zipfile
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+
+# Разбор загруженных резюме в обычный текст. PDF — только если установлен
+# pypdf; остальные форматы разбираются стандартной библиотекой
+
+
+class ParseError(Exception):
+    pass
+
+
+class HTMLText(HTMLParser):
+    SKIPPED = {'script', 'style', 'head'}
+    BLOCKS = {'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'section', 'article'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED:
+            self.skipping += 1
+        elif tag in self.BLOCKS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED and self.skipping:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+
+def decode(data):
+    for encoding in ('utf-8-sig', 'cp1251'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='replace')
+
+
+def parse_text(path):
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
+def parse_markdown(path):
+    # Разметку убираем, текст оставляем: заголовки, выделение, ссылки
+    text = parse_text(path)
+    text = re.sub(r'!?\[([^\]]*)\]\([^)]*\)', r'\1', text)
+    text = re.sub(r'^\s{0,3}(#{1,6}|>|[-*+]|\d+\.)\s+', '', text, flags=re.MULTILINE)
+    return re.sub(r'(\*\*|__|\*|_|`)', '', text)
+
+
+def parse_html(path):
+    parser = HTMLText()
+    parser.feed(parse_text(path))
+    parser.close()
+    return ''.join(parser.parts)
+
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def parse_docx(path):
+    # DOCX — zip с word/document.xml; абзацы — элементы w:p, текст — w:t
+    try:
+        with zipfile.ZipFile(path) as archive:
+            root = ElementTree.fromstring(archive.read('word/document.xml'))
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+        raise ParseError(f'Некорректный DOCX: {e}')
+    paragraphs = (
+        ''.join(node.text or '' for node in paragraph.iter(f'{WORD_NS}t'))
+        for paragraph in root.iter(f'{WORD_NS}p')
+    )
+    return '\n'.join(paragraphs)
+
+
+def parse_pdf(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ParseError('Разбор PDF недоступен: не установлен pypdf')
+    try:
+        return '\n'.join(page.extract_text() or '' for page in PdfReader(path).pages)
+    except Exception as e:
+        raise ParseError(f'Некорректный PDF: {e}')
+
+
+def pdf_available():
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+PARSERS = {
+    '.txt': parse_text,
+    '.md': parse_markdown,
+    '.markdown': parse_markdown,
+    '.html': parse_html,
+    '.htm': parse_html,
+    '.docx': parse_docx,
+    '.pdf': parse_pdf,
+}
+
+
+def supported_extensions():
+    return {ext for ext in PARSERS if ext != '.pdf' or pdf_available()}
+
+
+def normalize_text(text):
+    # Схлопываем пробелы внутри строк и пустые строки подряд
+    lines = [' '.join(line.split()) for line in text.splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def extract_text(path, extension):
+    parser = PARSERS.get(extension.lower())
+    if parser is None:
+        raise ParseError(f'Неподдерживаемый формат: {extension}')
+    return normalize_text(parser(path))
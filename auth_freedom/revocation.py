@@ -0,0 +1,161 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import RevokedToken
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        if value in self:
+            return
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+# Запас при дочитывании: транзакции других процессов могут закоммититься
+# позже, чем наступило их revoked_at
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class RevocationList:
+    # Первый уровень — фильтр Блума в памяти процесса: для почти всех токенов
+    # ответ "не отозван" без обращения к БД. Совпадение в фильтре проверяется
+    # запросом к RevokedToken, чтобы исключить ложные срабатывания
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.synced_at = None
+        self.next_sync = 0
+        self.next_rebuild = 0
+
+    @staticmethod
+    def sync_interval():
+        return getattr(settings, 'JWT_REVOCATION_SYNC_SECONDS', 5)
+
+    @staticmethod
+    def rebuild_interval():
+        return getattr(settings, 'JWT_REVOCATION_REBUILD_SECONDS', 3600)
+
+    def rebuild(self):
+        # Полная пересборка из БД; заодно удаляем записи об истёкших токенах,
+        # которые уже не пройдут проверку exp
+        with self.lock:
+            now = datetime.now(timezone.utc)
+            RevokedToken.objects.filter(expires_at__lte=now).delete()
+            rows = list(RevokedToken.objects.values_list('jti', 'revoked_at'))
+            bloom = BloomFilter(max(10000, len(rows) * 2))
+            for jti, _ in rows:
+                bloom.add(jti)
+            self.bloom = bloom
+            self.synced_at = max((revoked_at for _, revoked_at in rows), default=now)
+            self.next_sync = time.monotonic() + self.sync_interval()
+            self.next_rebuild = time.monotonic() + self.rebuild_interval()
+
+    def sync(self):
+        # Дочитываем отзывы, сделанные другими процессами
+        with self.lock:
+            rows = list(
+                RevokedToken.objects.filter(revoked_at__gte=self.synced_at - SYNC_OVERLAP)
+                .values_list('jti', 'revoked_at')
+            )
+            for jti, revoked_at in rows:
+                self.bloom.add(jti)
+                self.synced_at = max(self.synced_at, revoked_at)
+            self.next_sync = time.monotonic() + self.sync_interval()
+            overfilled = self.bloom.count > self.bloom.capacity
+        if overfilled:
+            self.rebuild()
+
+    def _maintenance_due(self):
+        now = time.monotonic()
+        return self.bloom is None or now >= self.next_sync or now >= self.next_rebuild
+
+    def _maintain(self):
+        now = time.monotonic()
+        if self.bloom is None or now >= self.next_rebuild:
+            self.rebuild()
+        elif now >= self.next_sync:
+            self.sync()
+
+    def is_revoked(self, jti):
+        if not jti:
+            return False
+        self._maintain()
+        if jti not in self.bloom:
+            return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    async def ais_revoked(self, jti):
+        if not jti:
+            return False
+        # Пересборка и дочитывание редкие, их можно выполнить в потоке
+        if self._maintenance_due():
+            await sync_to_async(self._maintain)()
+        if jti not in self.bloom:
+            return False
+        return await RevokedToken.objects.filter(jti=jti).aexists()
+
+    def _add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def revoke(self, jti, exp):
+        # True, если отозвал именно этот вызов: при гонке двух запросов
+        # уникальный jti пропустит только один INSERT
+        expires_at = datetime.fromtimestamp(exp, tz=timezone.utc)
+        _, created = RevokedToken.objects.get_or_create(jti=jti, defaults={'expires_at': expires_at})
+        self._add(jti)
+        return created
+
+    async def arevoke(self, jti, exp):
+        expires_at = datetime.fromtimestamp(exp, tz=timezone.utc)
+        _, created = await RevokedToken.objects.aget_or_create(jti=jti, defaults={'expires_at': expires_at})
+        self._add(jti)
+        return created
+
+
+revocation_list = RevocationList()
+
+
+def revoke_token(claims):
+    if claims.get('jti') and claims.get('exp'):
+        return revocation_list.revoke(claims['jti'], claims['exp'])
+    return False
+
+
+async def arevoke_token(claims):
+    if claims.get('jti') and claims.get('exp'):
+        return await revocation_list.arevoke(claims['jti'], claims['exp'])
+    return False
+
+
+def is_revoked(claims):
+    return revocation_list.is_revoked(claims.get('jti'))
+
+
+async def ais_revoked(claims):
+    return await revocation_list.ais_revoked(claims.get('jti'))
@@ -0,0 +1,104 @@
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Модели, чтения которых можно отдавать репликам
+REPLICA_MODELS = {'auth_freedom.candidateprofile', 'auth_freedom.recruiterprofile'}
+
+# Читать только с основной базы: запрос уже что-то записал или его клиент
+# писал недавно (см. ReplicaStickinessMiddleware)
+use_primary = contextvars.ContextVar('use_primary', default=False)
+# Запрос выполнил запись — middleware продлит окно чтения с основной базы.
+# None — код выполняется вне запроса (команды, воркеры): там переменные не
+# меняются, иначе остались бы установленными до конца процесса
+wrote = contextvars.ContextVar('wrote', default=None)
+
+
+class ReplicaHealth:
+    # Состояние реплик проверяется не чаще раза в REPLICA_HEALTH_CHECK_SECONDS:
+    # доступность и отставание репликации. Недоступная или отстающая реплика
+    # исключается до следующей проверки
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.healthy = {}
+        self.next_check = {}
+
+    @staticmethod
+    def check_interval():
+        return getattr(settings, 'REPLICA_HEALTH_CHECK_SECONDS', 5)
+
+    @staticmethod
+    def max_lag():
+        return getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 10)
+
+    def probe(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                # На основной базе (или второй базе при локальной проверке)
+                # pg_last_xact_replay_timestamp() — NULL, отставание 0
+                cursor.execute(
+                    'SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)'
+                )
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            # Закрываем соединение, чтобы следующая проверка открыла новое
+            connections[alias].close()
+            return False
+        return lag <= self.max_lag()
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self.lock:
+            due = now >= self.next_check.get(alias, 0)
+            if due:
+                # Остальные потоки до конца проверки видят прежнее состояние
+                self.next_check[alias] = now + self.check_interval()
+        if due:
+            self.healthy[alias] = self.probe(alias)
+        return self.healthy.get(alias, False)
+
+
+replica_health = ReplicaHealth()
+
+
+def replica_aliases():
+    return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if alias in settings.DATABASES]
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in REPLICA_MODELS or use_primary.get():
+            return None
+        # Внутри транзакции читаем из той же базы, где идёт запись
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        replicas = replica_aliases()
+        random.shuffle(replicas)
+        for alias in replicas:
+            if replica_health.is_healthy(alias):
+                return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Всё, что записано в этом запросе, дальше читается с основной базы
+        if wrote.get() is not None:
+            use_primary.set(True)
+            wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему реплик создаёт репликация, а не migrate
+        if db in replica_aliases():
+            return False
+        return None
@@ -0,0 +1,290 @@
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import DecimalField, F, Q
+from django.db.models.functions import Cast
+
+from .locations import aresolve_params, resolve_params
+from .models import CandidateProfile
+from .skills import alookup, lookup, normalize
+
+# Поля-массивы, по которым можно искать: ?hard_skills=a,b (содержит все)
+# и ?hard_skills_any=a,b (пересечение). Навыки и языки ищутся по
+# идентификаторам словаря, сертификаты — по тексту
+ARRAY_FILTERS = {
+    'hard_skills': ('hard_skill_ids', 'skill'),
+    'tech_stack': ('tech_stack_ids', 'skill'),
+    'languages': ('language_ids', 'language'),
+    'certifications': ('certifications', None),
+}
+
+# Поля с выбором из списка: ?level=junior,middle
+CHOICE_FILTERS = {
+    'level': dict(CandidateProfile.LEVEL_CHOICES),
+    'search_status': dict(CandidateProfile.SEARCH_STATUS_CHOICES),
+    'relocation_status': dict(CandidateProfile.RELOCATION_CHOICES),
+}
+
+# Загружаем только то, что отдаём в ответе, без resume_text и JSON-полей
+RESULT_FIELDS = (
+    'id', 'first_name', 'last_name', 'specialization', 'level', 'experience',
+    'country', 'region', 'desired_salary', 'search_status', 'relocation_status',
+    'hard_skills', 'tech_stack', 'languages', 'certifications',
+)
+
+# Параметры подсветки фрагментов в полнотекстовом поиске
+HEADLINE_OPTIONS = {
+    'start_sel': '<mark>',
+    'stop_sel': '</mark>',
+    'max_fragments': 3,
+    'max_words': 20,
+    'min_words': 5,
+}
+
+# Словари, которыми разбирается search_vector (миграция 0006); подсветка
+# строится каждым, в ответ идёт фрагмент с большим числом совпадений
+TEXT_CONFIGS = ('russian', 'english')
+
+# ts_rank — float4, и значение из курсора не совпало бы с ним точно при
+# сравнении; ранг приводится к numeric с фиксированным числом знаков и в
+# сортировке, и в условии курсора
+RANK_FIELD = DecimalField(max_digits=12, decimal_places=8)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class SearchError(ValueError):
+    pass
+
+
+def split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def parse_int(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise SearchError(f'Некорректное значение {name}')
+
+
+def parse_decimal(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise SearchError(f'Некорректное значение {name}')
+
+
+def skill_params(params):
+    # Названия навыков и языков из запроса, сгруппированные по типу словаря
+    values = {}
+    for param, (_, kind) in ARRAY_FILTERS.items():
+        if kind:
+            for name in (param, f'{param}_any'):
+                values.setdefault(kind, []).extend(split_list(params.get(name, '')))
+    return values
+
+
+def resolve_skills(params):
+    # Словари навыков и языков, а под ключом 'location' — id мест из фильтров
+    known = {kind: lookup(values, kind) for kind, values in skill_params(params).items()}
+    known['location'] = resolve_params(params)
+    return known
+
+
+async def aresolve_skills(params):
+    known = {kind: await alookup(values, kind) for kind, values in skill_params(params).items()}
+    known['location'] = await aresolve_params(params)
+    return known
+
+
+def build_filters(params, known=None):
+    # known — результат resolve_skills/aresolve_skills; без него словарь
+    # читается синхронно
+    if known is None:
+        known = resolve_skills(params)
+    q = Q(is_active=True)
+
+    for param, (field, kind) in ARRAY_FILTERS.items():
+        values = split_list(params.get(param, ''))
+        if values:
+            if kind:
+                keys = {normalize(value) for value in values}
+                if keys - known[kind].keys():
+                    # Навыка нет в словаре — значит, его нет ни у кого
+                    return Q(pk__in=[])
+                values = sorted({known[kind][key][0] for key in keys})
+            # @> использует GIN-индекс по массиву
+            q &= Q(**{f'{field}__contains': values})
+        values = split_list(params.get(f'{param}_any', ''))
+        if values:
+            if kind:
+                keys = {normalize(value) for value in values}
+                values = sorted({known[kind][key][0] for key in keys if key in known[kind]})
+                if not values:
+                    return Q(pk__in=[])
+            # && тоже обслуживается GIN-индексом
+            q &= Q(**{f'{field}__overlap': values})
+
+    for field, choices in CHOICE_FILTERS.items():
+        values = split_list(params.get(field, ''))
+        if not values:
+            continue
+        unknown = [value for value in values if value not in choices]
+        if unknown:
+            raise SearchError(f'Некорректное значение {field}: {", ".join(unknown)}')
+        q &= Q(**{f'{field}__in': values})
+
+    # Места сравниваются по id справочника (B-tree индексы по country_id,
+    # region_id); регион включает вложенные города
+    for field, resolved in known['location'].items():
+        if resolved is None:
+            # Места нет в справочнике — сравниваем строку как есть
+            q &= Q(**{field: params[field].strip()})
+        else:
+            id_field, ids = resolved
+            q &= Q(**{f'{id_field}__in': ids})
+
+    experience_min = parse_int(params, 'experience_min')
+    if experience_min is not None:
+        q &= Q(experience__gte=experience_min)
+    experience_max = parse_int(params, 'experience_max')
+    if experience_max is not None:
+        q &= Q(experience__lte=experience_max)
+
+    salary_min = parse_decimal(params, 'salary_min')
+    if salary_min is not None:
+        q &= Q(desired_salary__gte=salary_min)
+    salary_max = parse_decimal(params, 'salary_max')
+    if salary_max is not None:
+        q &= Q(desired_salary__lte=salary_max)
+
+    return q
+
+
+def encode_cursor(data):
+    # Decimal — строкой, чтобы при разборе значение не прошло через float
+    data = [str(value) if isinstance(value, Decimal) else value for value in data]
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError):
+        raise SearchError('Некорректный курсор')
+
+
+def cursor_value(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            value = Decimal(value)
+        except InvalidOperation:
+            raise SearchError('Некорректный курсор')
+        if value.is_finite():
+            return value
+    raise SearchError('Некорректный курсор')
+
+
+def keyset_queryset(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE, keys=('id',)):
+    # Постраничный вывод по ключу (все ключи по убыванию): вместо OFFSET
+    # фильтруем строки после последней выданной, поэтому стоимость страницы
+    # не зависит от её номера. Берём на одну строку больше, чтобы понять,
+    # есть ли следующая страница
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    queryset = queryset.order_by(*[f'-{key}' for key in keys])
+    if cursor:
+        values = decode_cursor(cursor)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise SearchError('Некорректный курсор')
+        values = [cursor_value(value) for value in values]
+        after = Q()
+        for i, key in enumerate(keys):
+            condition = Q(**{f'{key}__lt': values[i]})
+            for prev_key, prev_value in zip(keys[:i], values[:i]):
+                condition &= Q(**{prev_key: prev_value})
+            after |= condition
+        queryset = queryset.filter(after)
+    return queryset[:limit + 1], limit
+
+
+def keyset_result(items, limit, keys=('id',)):
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([getattr(items[-1], key) for key in keys])
+    return items, next_cursor
+
+
+def keyset_page(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE, keys=('id',)):
+    queryset, limit = keyset_queryset(queryset, cursor, limit, keys)
+    return keyset_result(list(queryset), limit, keys)
+
+
+def text_query(text):
+    # Запрос разбирается обоими словарями, чтобы совпадали формы слов
+    # и в русском, и в английском тексте
+    return (SearchQuery(text, config='russian', search_type='websearch')
+            | SearchQuery(text, config='english', search_type='websearch'))
+
+
+def candidate_queryset(params, known=None):
+    # Возвращает срез для текущей страницы, её размер и ключи сортировки
+    queryset = CandidateProfile.objects.filter(build_filters(params, known)).only(*RESULT_FIELDS)
+    limit = parse_int(params, 'limit') or DEFAULT_PAGE_SIZE
+    keys = ('id',)
+    text = params.get('q', '').strip()
+    if text:
+        query = text_query(text)
+        queryset = queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), RANK_FIELD),
+            **{
+                f'{field}_headline_{config}': SearchHeadline(field, query, config=config, **HEADLINE_OPTIONS)
+                for field in ('resume_text', 'about_me') for config in TEXT_CONFIGS
+            },
+        )
+        keys = ('rank', 'id')
+    queryset, limit = keyset_queryset(queryset, params.get('cursor'), limit, keys)
+    return queryset, limit, keys
+
+
+def search_candidates(params):
+    queryset, limit, keys = candidate_queryset(params)
+    return keyset_result(list(queryset), limit, keys)
+
+
+async def asearch_candidates(params):
+    queryset, limit, keys = candidate_queryset(params, await aresolve_skills(params))
+    return keyset_result([profile async for profile in queryset], limit, keys)
+
+
+def best_headline(profile, field):
+    # Фрагмент того словаря, который подсветил больше слов
+    headlines = [getattr(profile, f'{field}_headline_{config}') for config in TEXT_CONFIGS]
+    return max(headlines, key=lambda headline: (headline or '').count(HEADLINE_OPTIONS['start_sel']))
+
+
+def serialize_candidate(profile):
+    data = {field: getattr(profile, field) for field in RESULT_FIELDS}
+    data['desired_salary'] = str(profile.desired_salary)
+    if hasattr(profile, 'rank'):
+        data['rank'] = float(profile.rank)
+        data['highlights'] = {
+            'resume_text': best_headline(profile, 'resume_text'),
+            'about_me': best_headline(profile, 'about_me'),
+        }
+    return data
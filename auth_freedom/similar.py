@@ -0,0 +1,323 @@
+import hashlib
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import CandidateProfile, CandidateVector, TermFrequency
+from .skills import normalize
+
+# Похожие кандидаты. Сходство двух профилей — скалярное произведение
+# разреженных векторов (TF-IDF слов резюме и «о себе» плюс навыки) и бонусы
+# за совпадение уровня и местоположения:
+#   text·cos(тексты) + skills·cos(навыки) + level·[уровни равны] + location·[места равны]
+# Списки ближайших хранятся в CandidateVector и при изменении профиля
+# пересчитываются только для него и затронутых им соседей
+
+DEFAULT_WEIGHTS = {
+    'text': 0.6,
+    'skills': 0.25,
+    'level': 0.1,
+    'location': 0.05,
+}
+
+TEXT_FIELDS = ('resume_text', 'about_me')
+# Поля, от которых зависит вектор; их изменение помечает его устаревшим
+PROFILE_FIELDS = (*TEXT_FIELDS, 'hard_skill_ids', 'tech_stack_ids', 'level', 'country', 'region', 'is_active')
+LOAD_FIELDS = ('id', *PROFILE_FIELDS, 'country_id', 'region_id')
+
+MIN_WORD_LENGTH = 3
+
+_words = re.compile(r'\w+')
+
+
+def weights():
+    return {**DEFAULT_WEIGHTS, **getattr(settings, 'SIMILAR_WEIGHTS', {})}
+
+
+def top_k():
+    return getattr(settings, 'SIMILAR_TOP_K', 20)
+
+
+def feature_id(name):
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=4).digest(), 'little', signed=True)
+
+
+def term_counts(profile):
+    text = normalize(' '.join(getattr(profile, name) or '' for name in TEXT_FIELDS))
+    return Counter(
+        feature_id(f't:{word}') for word in _words.findall(text)
+        if len(word) >= MIN_WORD_LENGTH and not word.isdigit()
+    )
+
+
+def skill_terms(profile):
+    return {feature_id(f's:{skill_id}') for skill_id in {*profile.hard_skill_ids, *profile.tech_stack_ids}}
+
+
+def document_terms(profile, counts=None):
+    # Признаки профиля для частот: слова и навыки
+    return (term_counts(profile) if counts is None else counts).keys() | skill_terms(profile)
+
+
+def location_key(profile):
+    # По id справочника мест, чтобы варианты написания совпадали
+    if profile.country_id is not None:
+        return f'{profile.country_id}/{profile.region_id or ""}'
+    return f'{profile.country}/{profile.region}' if profile.region else profile.country
+
+
+class Vocabulary:
+    def __init__(self, documents, total):
+        self.documents = documents
+        self.total = total
+        self.max_ratio = getattr(settings, 'SIMILAR_MAX_DF', 0.3)
+
+    def idf(self, term):
+        return math.log((1 + self.total) / (1 + self.documents.get(term, 0))) + 1
+
+    def common(self, term):
+        # Слова и навыки из большой доли профилей почти не различают их, а
+        # в индексе дали бы самые длинные списки: соседями по такому навыку
+        # оказались бы почти все
+        return self.total >= 100 and self.documents.get(term, 0) > self.max_ratio * self.total
+
+
+def load_vocabulary(terms):
+    # Частоты с последней полной перестройки; новые слова считаются редкими
+    documents = dict(TermFrequency.objects.filter(term__in=terms).values_list('term', 'documents'))
+    return Vocabulary(documents, CandidateVector.objects.count())
+
+
+def scaled(values, norm):
+    length = math.sqrt(sum(value * value for value in values.values()))
+    if not length:
+        return {}
+    return {term: value / length * norm for term, value in values.items()}
+
+
+def build_vector(profile, vocabulary, counts=None):
+    # Вектор без списка соседей; веса такие, что произведение векторов
+    # равно text·cos(тексты) + skills·cos(навыки)
+    current = weights()
+    counts = term_counts(profile) if counts is None else counts
+    text = {
+        term: (1 + math.log(count)) * vocabulary.idf(term)
+        for term, count in counts.items() if not vocabulary.common(term)
+    }
+    max_terms = getattr(settings, 'SIMILAR_MAX_TERMS', 200)
+    if len(text) > max_terms:
+        text = dict(sorted(text.items(), key=lambda item: -item[1])[:max_terms])
+    features = scaled(text, math.sqrt(current['text']))
+    skills = {term: 1.0 for term in skill_terms(profile) if not vocabulary.common(term)}
+    features.update(scaled(skills, math.sqrt(current['skills'])))
+    terms = sorted(features)
+    return CandidateVector(
+        profile_id=profile.id,
+        terms=terms,
+        weights=[features[term] for term in terms],
+        level=profile.level,
+        location=location_key(profile),
+        stale=False,
+    )
+
+
+def similarity(vector, other, features=None):
+    current = weights()
+    features = features if features is not None else dict(zip(vector.terms, vector.weights))
+    score = sum(features.get(term, 0.0) * weight for term, weight in zip(other.terms, other.weights))
+    if score <= 0:
+        return 0.0
+    if vector.level and vector.level == other.level:
+        score += current['level']
+    if vector.location and vector.location == other.location:
+        score += current['location']
+    return score
+
+
+def best(scored, k):
+    # scored — [(profile_id, score)]; сначала больший балл, при равенстве меньший id
+    ranked = sorted((item for item in scored if item[1] > 0), key=lambda item: (-item[1], item[0]))[:k]
+    return [profile_id for profile_id, _ in ranked], [round(score, 6) for _, score in ranked]
+
+
+class Index:
+    # Инвертированный индекс в памяти для полной перестройки: для каждого
+    # признака — номера строк и веса; баллы строки против всех считаются
+    # сложением списков её признаков
+    def __init__(self, vectors):
+        self.ids = np.array([vector.profile_id for vector in vectors], dtype=np.int64)
+        _, self.levels = np.unique([vector.level for vector in vectors], return_inverse=True)
+        _, self.locations = np.unique([vector.location for vector in vectors], return_inverse=True)
+        postings = defaultdict(lambda: ([], []))
+        for row, vector in enumerate(vectors):
+            for term, weight in zip(vector.terms, vector.weights):
+                rows, values = postings[term]
+                rows.append(row)
+                values.append(weight)
+        self.postings = {
+            term: (np.array(rows, dtype=np.int64), np.array(values, dtype=np.float64))
+            for term, (rows, values) in postings.items()
+        }
+        self.vectors = vectors
+
+    def neighbours(self, row, k):
+        current = weights()
+        vector = self.vectors[row]
+        scores = np.zeros(len(self.ids))
+        for term, weight in zip(vector.terms, vector.weights):
+            rows, values = self.postings[term]
+            scores[rows] += weight * values
+        scores[row] = 0
+        shared = scores > 0
+        if vector.level:
+            scores[shared & (self.levels == self.levels[row])] += current['level']
+        if vector.location:
+            scores[shared & (self.locations == self.locations[row])] += current['location']
+        candidates = np.flatnonzero(shared)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        return best(((int(self.ids[i]), float(scores[i])) for i in candidates), k)
+
+
+def active_profiles():
+    return CandidateProfile.objects.filter(is_active=True).only(*LOAD_FIELDS).order_by('id')
+
+
+def rebuild(chunk_size=2000):
+    # Полная перестройка: частоты слов, все векторы и все списки соседей.
+    # Профили читаются дважды, чтобы не держать тексты в памяти
+    documents = Counter()
+    total = 0
+    for profile in active_profiles().iterator(chunk_size=chunk_size):
+        documents.update(document_terms(profile))
+        total += 1
+    vocabulary = Vocabulary(documents, total)
+    vectors = [build_vector(profile, vocabulary) for profile in active_profiles().iterator(chunk_size=chunk_size)]
+    index = Index(vectors)
+    k = top_k()
+    for row, vector in enumerate(vectors):
+        vector.neighbours, vector.scores = index.neighbours(row, k)
+    with transaction.atomic():
+        TermFrequency.objects.all().delete()
+        TermFrequency.objects.bulk_create(
+            (TermFrequency(term=term, documents=count) for term, count in documents.items()), batch_size=5000,
+        )
+        CandidateVector.objects.all().delete()
+        CandidateVector.objects.bulk_create(vectors, batch_size=1000)
+    return len(vectors)
+
+
+def pending_ids():
+    # Активные профили без вектора или с устаревшим и векторы неактивных профилей
+    changed = CandidateProfile.objects.filter(is_active=True).filter(
+        Q(vector__isnull=True) | Q(vector__stale=True),
+    ).values_list('id', flat=True)
+    inactive = CandidateVector.objects.filter(profile__is_active=False).values_list('profile_id', flat=True)
+    return sorted({*changed, *inactive})
+
+
+def neighbours_of(vector, k):
+    # Кандидаты — профили хотя бы с одним общим признаком из самых весомых
+    # (GIN-индекс по terms). Читается не больше SIMILAR_MAX_CANDIDATES
+    # профилей, у которых таких признаков больше всего: по признаку со
+    # средней частотой иначе пришлось бы загрузить заметную долю базы
+    if not vector.terms:
+        return []
+    features = dict(zip(vector.terms, vector.weights))
+    query = sorted(features, key=lambda term: -features[term])[:getattr(settings, 'SIMILAR_QUERY_TERMS', 32)]
+    shared = RawSQL('cardinality(ARRAY(SELECT unnest(terms) INTERSECT SELECT unnest(%s::integer[])))', (query,))
+    candidates = (
+        CandidateVector.objects.filter(terms__overlap=query).exclude(pk=vector.profile_id)
+        .annotate(shared=shared).order_by('-shared', 'pk')[:getattr(settings, 'SIMILAR_MAX_CANDIDATES', 2000)]
+    )
+    return [(other, similarity(vector, other, features)) for other in candidates]
+
+
+def save_neighbours(profile_id, neighbours, scores):
+    CandidateVector.objects.filter(pk=profile_id).update(neighbours=neighbours, scores=scores)
+
+
+def update(profile_ids):
+    # Инкрементальное обновление: векторы изменённых профилей, их списки
+    # соседей и списки тех профилей, в которые они входят или должны войти
+    k = top_k()
+    profiles = active_profiles().in_bulk(profile_ids)
+    removed = set(profile_ids) - profiles.keys()
+    counts = {profile_id: term_counts(profile) for profile_id, profile in profiles.items()}
+    vocabulary = load_vocabulary({
+        term for profile_id, profile in profiles.items() for term in document_terms(profile, counts[profile_id])
+    })
+    vectors = [build_vector(profile, vocabulary, counts[profile_id]) for profile_id, profile in profiles.items()]
+    recompute = set()
+    with transaction.atomic():
+        CandidateVector.objects.filter(profile_id__in=removed).delete()
+        CandidateVector.objects.bulk_create(
+            vectors,
+            update_conflicts=True,
+            unique_fields=['profile'],
+            update_fields=['terms', 'weights', 'level', 'location', 'stale', 'updated_at'],
+        )
+        for vector in vectors:
+            scored = neighbours_of(vector, k)
+            save_neighbours(vector.profile_id, *best(((other.profile_id, score) for other, score in scored), k))
+            present = set()
+            for other, score in scored:
+                if score <= 0:
+                    continue
+                present.add(other.profile_id)
+                entries = dict(zip(other.neighbours, other.scores))
+                full = len(entries) >= k
+                if vector.profile_id in entries and full and score < min(entries.values()):
+                    # Профиль выпадает из списка — его место займёт кто-то,
+                    # кого в сохранённом списке нет
+                    recompute.add(other.profile_id)
+                    continue
+                if vector.profile_id not in entries and full and score <= min(entries.values()):
+                    continue
+                entries[vector.profile_id] = score
+                save_neighbours(other.profile_id, *best(entries.items(), k))
+            # Списки, где профиль был, но общих признаков больше нет
+            recompute.update(
+                CandidateVector.objects.filter(neighbours__contains=[vector.profile_id])
+                .exclude(profile_id__in=present).values_list('profile_id', flat=True)
+            )
+        if removed:
+            recompute.update(
+                CandidateVector.objects.filter(neighbours__overlap=list(removed)).values_list('profile_id', flat=True)
+            )
+        recompute -= {vector.profile_id for vector in vectors} | removed
+        for vector in CandidateVector.objects.filter(profile_id__in=recompute):
+            scored = neighbours_of(vector, k)
+            save_neighbours(vector.profile_id, *best(((other.profile_id, score) for other, score in scored), k))
+    return len(vectors), len(removed), len(recompute)
+
+
+def similar_ids(profile_id, limit=None):
+    # Готовый список: одно чтение по первичному ключу
+    row = CandidateVector.objects.filter(pk=profile_id).values_list('neighbours', 'scores').first()
+    if row is None:
+        return []
+    return list(zip(*row))[:limit or top_k()]
+
+
+async def asimilar_ids(profile_id, limit=None):
+    row = await CandidateVector.objects.filter(pk=profile_id).values_list('neighbours', 'scores').afirst()
+    if row is None:
+        return []
+    return list(zip(*row))[:limit or top_k()]
+
+
+@receiver(post_save, sender=CandidateProfile)
+def mark_vector_stale(sender, instance, created, update_fields=None, **kwargs):
+    # Только пометка: векторы пересчитывает manage.py update_similar
+    if created or (update_fields is not None and not set(update_fields) & set(PROFILE_FIELDS)):
+        return
+    CandidateVector.objects.filter(profile_id=instance.id, stale=False).update(stale=True)
@@ -0,0 +1,186 @@
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Skill, SkillAlias
+
+# Текстовое поле профиля -> поле с идентификаторами и тип словаря
+PROFILE_FIELDS = (
+    ('hard_skills', 'hard_skill_ids', 'skill'),
+    ('soft_skills', 'soft_skill_ids', 'skill'),
+    ('tech_stack', 'tech_stack_ids', 'skill'),
+    ('languages', 'language_ids', 'language'),
+)
+
+_spaces = re.compile(r'\s+')
+
+# Написание -> (id, название) кешируется в SKILL_CACHE_ALIAS на
+# SKILL_CACHE_TIMEOUT секунд; ключ включает версию словаря, и изменение или
+# удаление навыков и написаний меняет версию, как в locations
+VERSION_KEY = 'skill-version'
+
+
+def normalize(value):
+    return _spaces.sub(' ', value).strip().casefold()
+
+
+def get_cache():
+    return caches[getattr(settings, 'SKILL_CACHE_ALIAS', 'default')]
+
+
+def timeout():
+    return getattr(settings, 'SKILL_CACHE_TIMEOUT', 3600)
+
+
+def current_version(cache):
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+async def acurrent_version(cache):
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(VERSION_KEY, version, timeout=None):
+            version = await cache.aget(VERSION_KEY, version)
+    return version
+
+
+def clear_cache():
+    get_cache().set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def cache_key(version, kind, key):
+    # Написание приходит от пользователя, поэтому в ключе — хеш
+    digest = hashlib.blake2b(f'{kind}:{key}'.encode(), digest_size=16).hexdigest()
+    return f'skill:{version}:{digest}'
+
+
+def cache_keys(values, kind, version):
+    # Ключ кеша -> нормализованное написание
+    keys = {normalize(value) for value in values} - {''}
+    return {cache_key(version, kind, key): key for key in keys}
+
+
+def _split(names, found):
+    result = {names[cache_key]: tuple(value) for cache_key, value in found.items()}
+    return result, set(names.values()) - result.keys()
+
+
+def _remember(rows, names, result):
+    keys = {key: cache_key for cache_key, key in names.items()}
+    entries = {}
+    for alias, skill_id, name in rows:
+        result[alias] = entries[keys[alias]] = (skill_id, name)
+    return entries
+
+
+def lookup(values, kind='skill'):
+    # Нормализованное написание -> (id, каноническое название) для известных значений
+    cache = get_cache()
+    names = cache_keys(values, kind, current_version(cache))
+    result, missing = _split(names, cache.get_many(names) if names else {})
+    if missing:
+        aliases = SkillAlias.objects.filter(kind=kind, alias__in=missing).values_list('alias', 'skill_id', 'skill__name')
+        cache.set_many(_remember(aliases, names, result), timeout=timeout())
+    return result
+
+
+async def alookup(values, kind='skill'):
+    cache = get_cache()
+    names = cache_keys(values, kind, await acurrent_version(cache))
+    result, missing = _split(names, await cache.aget_many(names) if names else {})
+    if missing:
+        aliases = SkillAlias.objects.filter(kind=kind, alias__in=missing).values_list('alias', 'skill_id', 'skill__name')
+        await cache.aset_many(_remember([row async for row in aliases], names, result), timeout=timeout())
+    return result
+
+
+def _create(value, kind):
+    name = _spaces.sub(' ', value).strip()
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                skill, _ = Skill.objects.get_or_create(kind=kind, name=name)
+                SkillAlias.objects.get_or_create(
+                    kind=kind, alias=normalize(value), defaults={'skill': skill, 'curated': False},
+                )
+            break
+        except IntegrityError:
+            # Параллельный запрос создал тот же навык, повторяем чтение
+            if attempt:
+                raise
+    return lookup([value], kind)[normalize(value)]
+
+
+def canonical_names(values, kind='skill'):
+    # Приводит введённые значения к каноническим названиям без записи в БД
+    known = lookup(values, kind)
+    names, seen = [], set()
+    for value in values:
+        key = normalize(value)
+        if not key:
+            continue
+        name = known[key][1] if key in known else _spaces.sub(' ', value).strip()
+        if name.casefold() not in seen:
+            seen.add(name.casefold())
+            names.append(name)
+    return names
+
+
+def intern(values, kind='skill'):
+    # Возвращает канонические названия и их идентификаторы, создавая
+    # неизвестные навыки; дубликаты вроде "python" и "Python " схлопываются
+    known = lookup(values, kind)
+    names, ids = [], []
+    for value in values:
+        key = normalize(value)
+        if not key:
+            continue
+        skill_id, name = known[key] if key in known else _create(value, kind)
+        known[key] = (skill_id, name)
+        if skill_id not in ids:
+            ids.append(skill_id)
+            names.append(name)
+    return names, ids
+
+
+def intern_profile_skills(profile, update_fields=None):
+    changed = set()
+    for text_field, ids_field, kind in PROFILE_FIELDS:
+        if update_fields is not None and text_field not in update_fields:
+            continue
+        if text_field not in profile.__dict__:
+            # Поле не загружено (defer/only) и не менялось
+            continue
+        names, ids = intern(getattr(profile, text_field) or [], kind)
+        setattr(profile, text_field, names)
+        setattr(profile, ids_field, ids)
+        changed.add(ids_field)
+    return changed
+
+
+def skill_overlap(ids_a, ids_b):
+    # Пересечение множеств: размер не зависит от величины id в словаре
+    return len(set(ids_a).intersection(ids_b))
+
+
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+@receiver(post_save, sender=SkillAlias)
+@receiver(post_delete, sender=SkillAlias)
+def reset_skill_cache(sender, created=False, **kwargs):
+    # Новые записи кеш не портят, сбрасываем только при изменении и удалении;
+    # после коммита, чтобы параллельный запрос не закешировал старое под новой версией
+    if not created:
+        transaction.on_commit(clear_cache)
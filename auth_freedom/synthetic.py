@@ -0,0 +1,127 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+# Детерминированные синтетические кандидаты для нагрузочных замеров.
+# Строка i зависит только от seed и i, поэтому базу можно дополнять
+# до нужного размера, получая те же данные, что и при генерации с нуля
+
+USERNAME_PREFIX = 'bench_'
+PASSWORD = 'bench-password-2024'
+
+FIRST_NAMES = ['Айдар', 'Алия', 'Арман', 'Дана', 'Ерлан', 'Жанна', 'Иван', 'Мария', 'Нурлан', 'Ольга', 'Санжар', 'Тимур']
+LAST_NAMES = ['Ахметов', 'Беков', 'Иванов', 'Касымов', 'Ким', 'Нурланов', 'Петров', 'Сеитов', 'Смагулов', 'Цой']
+
+SPECIALIZATIONS = [
+    ('Backend-разработчик', ['Python', 'Django', 'PostgreSQL', 'Go', 'Java', 'Docker', 'Redis', 'Kafka']),
+    ('Frontend-разработчик', ['JavaScript', 'TypeScript', 'React', 'Vue', 'HTML', 'CSS', 'Webpack']),
+    ('Data Scientist', ['Python', 'Pandas', 'NumPy', 'SQL', 'PyTorch', 'Scikit-learn', 'Spark']),
+    ('DevOps-инженер', ['Linux', 'Docker', 'Kubernetes', 'Terraform', 'Ansible', 'AWS', 'Prometheus']),
+    ('QA-инженер', ['Selenium', 'Pytest', 'Postman', 'SQL', 'Jira', 'Python']),
+    ('Аналитик', ['SQL', 'Excel', 'Power BI', 'Tableau', 'Python']),
+]
+SPECIALIZATION_WEIGHTS = [30, 22, 12, 12, 12, 12]
+
+COMMON_SKILLS = ['Git', 'SQL', 'Linux', 'Docker', 'REST', 'Agile']
+SOFT_SKILLS = ['Коммуникабельность', 'Работа в команде', 'Ответственность', 'Обучаемость', 'Лидерство']
+
+# (страна, регионы с весами) — большинство кандидатов из крупных городов
+LOCATIONS = [
+    ('Казахстан', [('Алматы', 40), ('Астана', 30), ('Шымкент', 8), ('Караганда', 6), ('Актобе', 4),
+                   ('Павлодар', 4), ('Атырау', 4), ('Костанай', 4)], 85),
+    ('Россия', [('Москва', 60), ('Санкт-Петербург', 25), ('Новосибирск', 15)], 8),
+    ('Узбекистан', [('Ташкент', 80), ('Самарканд', 20)], 5),
+    ('Кыргызстан', [('Бишкек', 100)], 2),
+]
+
+# Вероятность владения языком
+LANGUAGES = [('Русский', 0.95), ('Казахский', 0.6), ('Английский', 0.5), ('Немецкий', 0.05), ('Китайский', 0.03)]
+
+LEVELS = [
+    # (уровень, вес, опыт в годах, медиана зарплаты)
+    ('no_experience', 8, (0, 0), 200000),
+    ('intern', 7, (0, 1), 250000),
+    ('junior', 25, (1, 3), 400000),
+    ('middle', 32, (2, 6), 800000),
+    ('senior', 20, (4, 12), 1400000),
+    ('lead', 8, (7, 20), 2000000),
+]
+
+SEARCH_STATUSES = (['active', 'passive', 'employed'], [45, 35, 20])
+RELOCATION_STATUSES = (['ready', 'not_ready', 'remote_only'], [25, 50, 25])
+
+
+def rng_for(seed, index):
+    return random.Random(f'{seed}:{index}')
+
+
+def weighted(rng, items, weights):
+    return rng.choices(items, weights=weights)[0]
+
+
+def candidate(index, seed=0):
+    # Возвращает (данные пользователя, данные профиля) для строки index
+    rng = rng_for(seed, index)
+    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    username = f'{USERNAME_PREFIX}{index}'
+    email = f'{username}@example.com'
+    phone = f'+77{rng.randrange(10 ** 8, 10 ** 9)}'
+
+    level, _, (exp_min, exp_max), median_salary = weighted(rng, LEVELS, [item[1] for item in LEVELS])
+    specialization, stack = weighted(rng, SPECIALIZATIONS, SPECIALIZATION_WEIGHTS)
+    # Навыки: ядро специализации плюс общие, чем старше уровень — тем больше
+    skills = rng.sample(stack, min(len(stack), rng.randint(2, 4 + exp_max // 3)))
+    skills += rng.sample(COMMON_SKILLS, rng.randint(0, 3))
+    country, regions, _ = weighted(rng, LOCATIONS, [item[2] for item in LOCATIONS])
+    region = weighted(rng, [name for name, _ in regions], [weight for _, weight in regions])
+    languages = [name for name, probability in LANGUAGES if rng.random() < probability] or ['Русский']
+    # Логнормальное распределение вокруг медианы уровня, шаг 10 000
+    salary = round(median_salary * rng.lognormvariate(0, 0.35), -4)
+
+    user = {
+        'username': username, 'email': email, 'first_name': first_name,
+        'last_name': last_name, 'phone': phone,
+    }
+    profile = {
+        'first_name': first_name, 'last_name': last_name, 'email': email, 'phone': phone,
+        'gender': rng.choice(['male', 'female']),
+        'birth_date': date(1970, 1, 1) + timedelta(days=rng.randrange(365 * 35)),
+        'about_me': f'{specialization}, {country}, {region}. ' + ', '.join(skills),
+        'specialization': specialization,
+        'experience': rng.randint(exp_min, exp_max),
+        'level': level,
+        'country': country,
+        'region': region,
+        'languages': languages,
+        'hard_skills': list(dict.fromkeys(skills)),
+        'soft_skills': rng.sample(SOFT_SKILLS, rng.randint(1, 3)),
+        'desired_salary': Decimal(max(salary, 50000)),
+        'search_status': weighted(rng, *SEARCH_STATUSES),
+        'relocation_status': weighted(rng, *RELOCATION_STATUSES),
+        'resume_text': f'Опыт {specialization.lower()}: ' + '; '.join(skills),
+    }
+    return user, profile
+
+
+def registration_data(index, seed=0):
+    # POST-данные формы регистрации для кандидата, которого ещё нет в базе
+    user, profile = candidate(index, seed)
+    return {
+        **{name: user[name] for name in ('username', 'first_name', 'last_name', 'email', 'phone')},
+        'password1': PASSWORD,
+        'password2': PASSWORD,
+        'birth_date': profile['birth_date'].isoformat(),
+        'gender': profile['gender'],
+        'about_me': profile['about_me'],
+        'specialization': profile['specialization'],
+        'experience': profile['experience'],
+        'country': profile['country'],
+        'region': profile['region'],
+        'languages': ', '.join(profile['languages']),
+        'hard_skills': ', '.join(profile['hard_skills']),
+        'soft_skills': ', '.join(profile['soft_skills']),
+        'desired_salary': str(profile['desired_salary']),
+        'search_status': profile['search_status'],
+        'relocation_status': profile['relocation_status'],
+        'level': profile['level'],
+    }
@@ -1,3 +1,927 @@
-from django.test import TestCase
+import asyncio
+import json
+import tempfile
+import time
+from io import StringIO
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, router
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import profiler
+from .backends import aauthenticate
+from .counters import counter_value, fold as fold_counters, increment
+from .dedupe import band_hashes, minhash, similarity
+from .extraction import Automaton, clear_automaton, extract, extract_chunk
+from .facets import facet_counts, fold, reconcile
+from .forms import ExtendedUserRegistrationForm
+from .hashing import HashingBusy, RateLimited, check_rate
+from .instrumentation import N_PLUS_ONE_THRESHOLD, RequestTimings
+from .jobs import claim, enqueue, fail, process
+from .locations import filter_ids, resolve
+from .management.commands.benchmark import DEFAULT_BASELINE, compare
+from .matching import CandidateMatrix, RequirementSpec
+from .middleware import (
+    JWTAuthenticationMiddleware, ProfilerMiddleware, ReplicaStickinessMiddleware, VerifiedTokenCache, aget_user_from_claims,
+    get_user_from_claims,
+)
+from .models import (
+    CandidateProfile, CandidateVector, CounterShard, DuplicateCandidate, FacetCount, FacetDelta, Location, LocationAlias,
+    ProfilingRule, RecruiterProfile, ResumeJob, Skill, SkillAlias, User,
+)
+from .profile_cache import profile_body
+from .revocation import is_revoked
+from .routers import replica_health, use_primary, wrote
+from .search import SearchError, encode_cursor, search_candidates, serialize_candidate
+from .similar import Vocabulary, build_vector, feature_id, neighbours_of, pending_ids, rebuild, update
+from .skills import canonical_names, intern, intern_profile_skills, lookup, skill_overlap
+from .tokens import set_token_cookies, tokens_for_user
+
+
+def make_candidate(username, **fields):
+    # Профиль создаётся сигналом при создании пользователя
+    user = User.objects.create_user(username=username, password='x', user_type='candidate')
+    profile = user.candidate_profile
+    for name, value in fields.items():
+        setattr(profile, name, value)
+    if fields:
+        profile.save()
+    return profile
+
+
+def collect_pages(params):
+    # Все страницы поиска по курсору; id в порядке выдачи
+    ids = []
+    cursor = None
+    while True:
+        page, cursor = search_candidates({**params, **({'cursor': cursor} if cursor else {})})
+        ids.extend(profile.id for profile in page)
+        if cursor is None:
+            return ids
+
+
+class KeysetPaginationTests(TestCase):
+    def test_pages_by_id_cover_every_profile_once(self):
+        profiles = [make_candidate(f'user{i}') for i in range(7)]
+        ids = collect_pages({'limit': '3'})
+        self.assertEqual(ids, sorted((profile.id for profile in profiles), reverse=True))
+
+    def test_pages_by_rank_are_stable_with_equal_ranks(self):
+        # Одинаковый текст — одинаковый ранг; порядок задаёт id, и ни одна
+        # строка не теряется и не повторяется на границе страниц
+        profiles = [make_candidate(f'dev{i}', resume_text='Python developer, Django и PostgreSQL') for i in range(5)]
+        profiles += [make_candidate(f'ml{i}', resume_text='Python Python Python для машинного обучения') for i in range(3)]
+        ids = collect_pages({'q': 'python', 'limit': '2'})
+        self.assertEqual(sorted(ids), sorted(profile.id for profile in profiles))
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_rank_cursor_is_exact(self):
+        make_candidate('a', resume_text='Опыт разработки на Python')
+        make_candidate('b', resume_text='Опыт разработки на Python')
+        page, cursor = search_candidates({'q': 'python', 'limit': '1'})
+        second, _ = search_candidates({'q': 'python', 'limit': '1', 'cursor': cursor})
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(page[0].id, second[0].id)
+
+    def test_invalid_cursor(self):
+        for cursor in ('###', encode_cursor([1.5]), encode_cursor(['abc', 1]), encode_cursor([1, 2])):
+            with self.assertRaises(SearchError):
+                search_candidates({'cursor': cursor})
+
+    def test_headline_marks_english_stems(self):
+        make_candidate('c', resume_text='Managed deployments and deploying services')
+        page, _ = search_candidates({'q': 'deploy'})
+        self.assertIn('<mark>', serialize_candidate(page[0])['highlights']['resume_text'])
+
+
+class CandidateMatrixTests(TestCase):
+    def setUp(self):
+        self.matrix = CandidateMatrix()
+
+    def test_bulk_update_is_visible_without_signals(self):
+        profile = make_candidate('m1', level='junior')
+        self.matrix.load()
+        spec = RequirementSpec(level_min='senior')
+        self.assertEqual(self.matrix.score(spec), [])
+        # update() не отправляет post_save; строку находит change_xid
+        CandidateProfile.objects.filter(pk=profile.pk).update(level='senior')
+        self.assertEqual([profile_id for profile_id, _ in self.matrix.score(spec)], [profile.id])
+
+    def test_deleted_profile_is_dropped(self):
+        profile = make_candidate('m2')
+        self.matrix.load()
+        self.matrix.mark_deleted({profile.id})
+        self.assertEqual(self.matrix.score(RequirementSpec()), [])
+
+
+class TokenRefreshTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='t1', password='x', user_type='candidate')
+        self.refresh = tokens_for_user(self.user)
+
+    def post_refresh(self, token):
+        return self.client.post('/token/refresh/', {'refresh': str(token)})
+
+    def test_refresh_returns_new_pair(self):
+        response = self.post_refresh(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.json())
+
+    def test_rotated_refresh_cannot_be_replayed(self):
+        self.assertEqual(self.post_refresh(self.refresh).status_code, 200)
+        self.assertEqual(self.post_refresh(self.refresh).status_code, 401)
+
+    def test_logout_revokes_both_tokens(self):
+        access = self.refresh.access_token
+        self.client.cookies['access_token'] = str(access)
+        self.client.cookies['refresh_token'] = str(self.refresh)
+        self.client.force_login(self.user)
+        response = self.client.get('/logout/')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(is_revoked(self.refresh.payload))
+        self.assertTrue(is_revoked(access.payload))
+        self.assertEqual(self.post_refresh(self.refresh).status_code, 401)
+
+    def test_refresh_cookie_reaches_logout(self):
+        response = set_token_cookies(HttpResponse(), self.refresh.access_token, self.refresh)
+        self.assertEqual(response.cookies['refresh_token']['path'], '/')
+
+    def test_inactive_user(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.post_refresh(self.refresh).status_code, 401)
+
+    def test_deleted_user(self):
+        self.user.delete()
+        self.assertEqual(self.post_refresh(self.refresh).status_code, 401)
+
+    def test_root_is_exempt_only_as_exact_path(self):
+        middleware = JWTAuthenticationMiddleware(lambda request: HttpResponse('ok'))
+        factory = RequestFactory()
+        self.assertEqual(middleware(factory.get('/')).status_code, 200)
+        self.assertEqual(middleware(factory.get('/profile/')).status_code, 401)
+
+
+REGISTRATION_DATA = {
+    'username': 'newcomer', 'first_name': 'Айгерим', 'last_name': 'Сапарова', 'email': 'a@example.com',
+    'phone': '+77010000000', 'password1': 'Very-secret-42', 'password2': 'Very-secret-42',
+    'birth_date': '1995-05-05', 'gender': 'female', 'specialization': 'Backend', 'experience': 3,
+    'country': 'Казахстан', 'region': 'Алматы', 'languages': 'Русский, Английский',
+    'hard_skills': 'Python, Django', 'desired_salary': '500000', 'search_status': 'active',
+    'relocation_status': 'ready', 'level': 'middle',
+}
+
+
+class AsyncViewTests(TestCase):
+    def test_registration_with_pool_hash_goes_through_form_save(self):
+        form = ExtendedUserRegistrationForm(REGISTRATION_DATA)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.password_hash = make_password(REGISTRATION_DATA['password1'])
+        form.timings = {'queue_ms': 0.0, 'hash_ms': 0.0}
+        user = form.save()
+        self.assertEqual(user.password, form.password_hash)
+        self.assertTrue(user.check_password(REGISTRATION_DATA['password1']))
+        self.assertEqual(user.candidate_profile.hard_skills, ['Python', 'Django'])
+
+    def test_ready_hash_without_timings_saves(self):
+        form = ExtendedUserRegistrationForm(REGISTRATION_DATA)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.password_hash = make_password(REGISTRATION_DATA['password1'])
+        user = form.save()
+        self.assertTrue(user.check_password(REGISTRATION_DATA['password1']))
+        self.assertIn('db_ms', form.timings)
+
+    def test_export_streams_sync_iterator_under_wsgi(self):
+        recruiter = User.objects.create_user(username='hr', password='x', user_type='recruiter')
+        make_candidate('e1')
+        self.client.force_login(recruiter)
+        response = self.client.get('/candidates/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 2)
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        caches['ratelimit'].clear()
+        self.request = RequestFactory().post('/login/')
+
+    @override_settings(PASSWORD_RATE_LIMITS={'ip': (100, 1.0), 'username': (2, 0.001)})
+    def test_only_failed_logins_charge_username(self):
+        # Успешные входы ведро имени не расходуют
+        for _ in range(5):
+            async_to_sync(check_rate)(self.request, 'Alice')
+        for _ in range(2):
+            user_login_failed.send(sender=__name__, credentials={'username': 'alice', 'password': '***'})
+        with self.assertRaises(RateLimited):
+            async_to_sync(check_rate)(self.request, 'ALICE')
+        async_to_sync(check_rate)(self.request, 'bob')
+
+
+class FacetTests(TestCase):
+    def stored_counts(self):
+        return set(
+            FacetCount.objects.filter(count__gt=0)
+            .values_list('context_dimension', 'context_value', 'dimension', 'value', 'count')
+        )
+
+    def test_folded_deltas_match_reconcile(self):
+        first = make_candidate('f1', level='senior', hard_skills=['Python', 'Django'])
+        second = make_candidate('f2', level='junior', hard_skills=['Python'])
+        first.level = 'lead'
+        first.save()
+        second.is_active = False
+        second.save()
+        self.assertTrue(FacetDelta.objects.exists())
+        fold()
+        self.assertFalse(FacetDelta.objects.exists())
+        folded = self.stored_counts()
+        self.assertEqual(reconcile(), 0)
+        self.assertEqual(self.stored_counts(), folded)
+        self.assertEqual(facet_counts({})['level'], [{'value': 'lead', 'count': 1}])
+
+    def test_reconcile_counts_queue_as_applied(self):
+        make_candidate('f3', level='middle')
+        self.assertEqual(reconcile(), 0)
+        self.assertFalse(FacetDelta.objects.exists())
+        self.assertEqual(facet_counts({})['level'], [{'value': 'middle', 'count': 1}])
+
+    def test_reconcile_fixes_bulk_update(self):
+        profile = make_candidate('f4', level='junior')
+        fold()
+        CandidateProfile.objects.filter(pk=profile.pk).update(level='senior')
+        self.assertGreater(reconcile(), 0)
+        self.assertEqual(facet_counts({})['level'], [{'value': 'senior', 'count': 1}])
+
+    def test_reconcile_keeps_table_constraints(self):
+        make_candidate('f5', level='lead')
+        reconcile()
+        reconcile()
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, FacetCount._meta.db_table)
+        self.assertIn('unique_facet_count', constraints)
+        with self.assertRaises(IntegrityError):
+            FacetCount.objects.create(dimension='level', value='lead', count=1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TransactionTestCase):
+    # TransactionTestCase: внутри транзакции TestCase роутер всегда читает
+    # с основной базы
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        replica_health.healthy.clear()
+        replica_health.next_check.clear()
+
+    def read_alias(self):
+        return CandidateProfile.objects.all().db
+
+    def test_profile_reads_go_to_replica(self):
+        self.assertEqual(self.read_alias(), 'replica')
+        self.assertEqual(User.objects.all().db, 'default')
+
+    def test_write_outside_request_does_not_pin(self):
+        make_candidate('r1')
+        self.assertIsNone(wrote.get())
+        self.assertFalse(use_primary.get())
+        self.assertEqual(self.read_alias(), 'replica')
+
+    def test_write_in_request_pins_client(self):
+        seen = []
+
+        def view(request):
+            seen.append(self.read_alias())
+            if request.method == 'POST':
+                make_candidate(f'r{len(seen)}')
+                seen.append(self.read_alias())
+            return HttpResponse('ok')
+
+        middleware = ReplicaStickinessMiddleware(view)
+        factory = RequestFactory()
+        response = middleware(factory.post('/'))
+        self.assertEqual(seen, ['replica', 'default'])
+        self.assertIn('primary_until', response.cookies)
+        # После запроса переменные сброшены
+        self.assertFalse(use_primary.get())
+        self.assertIsNone(wrote.get())
+
+        pinned = factory.get('/')
+        pinned.COOKIES['primary_until'] = response.cookies['primary_until'].value
+        middleware(pinned)
+        middleware(factory.get('/'))
+        self.assertEqual(seen[2:], ['default', 'replica'])
+
+    def test_migrations_skip_replicas(self):
+        self.assertFalse(router.allow_migrate('replica', 'auth_freedom'))
+        self.assertTrue(router.allow_migrate('default', 'auth_freedom'))
+
+
+class BenchmarkBaselineTests(SimpleTestCase):
+    def result(self, p95, queries):
+        return {'10000': {'login': {'p95_ms': p95, 'queries': queries}}}
+
+    def test_committed_baseline_is_readable(self):
+        with open(DEFAULT_BASELINE) as f:
+            self.assertIsInstance(json.load(f)['results'], dict)
+
+    def test_regressions(self):
+        baseline = self.result(10.0, 5)
+        self.assertEqual(compare(baseline, self.result(12.0, 5), 0.25), ([], []))
+        regressions, _ = compare(baseline, self.result(13.0, 6), 0.25)
+        self.assertEqual(len(regressions), 2)
+
+    def test_missing_baseline_is_reported(self):
+        self.assertEqual(compare({}, self.result(1.0, 1), 0.25), ([], ['10000 login']))
+
+
+class MetricsTests(TestCase):
+    def test_anonymous_is_forbidden_even_from_localhost(self):
+        self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='127.0.0.1').status_code, 403)
+
+    def test_staff_session(self):
+        staff = User.objects.create_user(username='ops', password='x', user_type='admin', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer scrape-secret').status_code, 200)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    def test_timings_keep_statements_not_params(self):
+        timings = RequestTimings()
+        for _ in range(N_PLUS_ONE_THRESHOLD):
+            timings.add_query('SELECT 1 FROM t WHERE id IN (%s, %s)', 1.0)
+        timings.add_query('SELECT 1 FROM t WHERE id IN (%s)', 1.0)
+        self.assertEqual(dict(timings.statements), {'SELECT 1 FROM t WHERE id IN (...)': N_PLUS_ONE_THRESHOLD + 1})
+        self.assertEqual(timings.duplicates, N_PLUS_ONE_THRESHOLD)
+        self.assertEqual(len(timings.repeated()), 1)
+
+
+@override_settings(PROFILER_ENABLED=True, PROFILER_SAMPLE_RATE=0.0)
+class ProfilerTests(TestCase):
+    def setUp(self):
+        profiler.rules.loaded_at = None
+        self.rule = ProfilingRule.objects.create(
+            path_prefix='/candidates/', remaining=1, expires_at=timezone.now() + timedelta(hours=1),
+        )
+        self.middleware = ProfilerMiddleware(lambda request: HttpResponse('ok'))
+        self.request = RequestFactory().get('/candidates/')
+
+    def test_busy_profiler_does_not_consume_rule(self):
+        self.assertTrue(profiler.claim())
+        try:
+            self.assertIsNone(self.middleware.reason(self.request))
+        finally:
+            profiler.release()
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.remaining, 1)
+
+    def test_rule_is_consumed_when_profiled(self):
+        self.assertEqual(self.middleware.reason(self.request), 'admin')
+        # Профилировщик остаётся занятым до stop()
+        self.assertFalse(profiler.claim())
+        profiler.release()
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.remaining, 0)
+
+
+class ResumeJobTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.upload_dir = Path(directory.name)
+        override = override_settings(RESUME_UPLOAD_DIR=self.upload_dir, RESUME_JOB_MAX_ATTEMPTS=2)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.profile = make_candidate('j1')
+
+    def make_job(self, **fields):
+        job = enqueue(self.profile, SimpleUploadedFile('cv.txt', 'Python, Django и PostgreSQL'.encode()))
+        ResumeJob.objects.filter(pk=job.pk).update(**fields)
+        job.refresh_from_db()
+        return job
+
+    def test_claim_takes_pending_once(self):
+        job = self.make_job()
+        self.assertEqual(claim(10), [job.id])
+        self.assertEqual(claim(10), [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('running', 1))
+
+    def test_stale_job_is_retried_until_attempts_run_out(self):
+        stale = timezone.now() - timedelta(hours=1)
+        retried = self.make_job(status='running', locked_at=stale, attempts=1)
+        exhausted = self.make_job(status='running', locked_at=stale, attempts=2)
+        self.assertEqual(claim(10), [retried.id])
+        exhausted.refresh_from_db()
+        self.assertEqual(exhausted.status, 'failed')
+        self.assertFalse((self.upload_dir / exhausted.file_name).exists())
+
+    def test_failure_backs_off_then_fails(self):
+        job = self.make_job(status='running', attempts=1)
+        self.assertEqual(fail(job, 'boom'), 'retry')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'pending')
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(claim(10), [])
+        job.attempts = 2
+        self.assertEqual(fail(job, 'boom'), 'failed')
+
+    # Внутри транзакции теста close_old_connections() испортила бы соединение
+    @mock.patch('auth_freedom.jobs.close_old_connections')
+    def test_upload_is_removed_after_parsing(self, close_old_connections):
+        job = self.make_job()
+        claim(10)
+        self.assertEqual(process(job.id), 'done')
+        self.profile.refresh_from_db()
+        self.assertIn('Django', self.profile.resume_text)
+        self.assertFalse((self.upload_dir / job.file_name).exists())
+
+    def test_oversized_upload_is_rejected_before_reading(self):
+        self.client.force_login(self.profile.user)
+        with override_settings(RESUME_MAX_BYTES=10):
+            response = self.client.post(
+                '/resume/upload/', {'resume': SimpleUploadedFile('cv.txt', b'x' * 200 * 1024)},
+            )
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(ResumeJob.objects.exists())
+
+
+class AutomatonTests(SimpleTestCase):
+    def setUp(self):
+        patterns = {'c': 'C', 'c++': 'C++', 'java': 'Java', 'javascript': 'JavaScript', 'go': 'Go', 'sql': 'SQL'}
+        self.automaton = Automaton(patterns)
+
+    def test_whole_words_only(self):
+        self.assertEqual(self.automaton.find('c++ и javascript, golang'), ['C++', 'JavaScript'])
+        self.assertEqual(self.automaton.find('java/go; postgresql'), ['Java', 'Go'])
+
+    def test_overlapping_patterns(self):
+        self.assertEqual(self.automaton.find('sql, c, java'), ['SQL', 'C', 'Java'])
+
+
+class SkillExtractionTests(TestCase):
+    def setUp(self):
+        # Навыки, созданные в откатанном тесте, не должны найтись в кеше
+        caches['skills'].clear()
+        clear_automaton()
+
+    def test_user_entered_skills_are_not_extracted(self):
+        intern(['Фреймворкус'])
+        self.assertEqual(extract('опыт с фреймворкус'), [])
+        alias = SkillAlias.objects.get(alias='фреймворкус')
+        self.assertFalse(alias.curated)
+        alias.curated = True
+        alias.save()
+        self.assertEqual([name for _, name in extract('опыт с фреймворкус')], ['Фреймворкус'])
+
+    def test_new_curated_alias_rebuilds_automaton(self):
+        self.assertEqual(extract('пишу на джангочке'), [])
+        SkillAlias.objects.create(skill=Skill.objects.get(kind='skill', name='Django'), alias='джангочке')
+        self.assertEqual([name for _, name in extract('пишу на джангочке')], ['Django'])
+
+    @override_settings(SKILL_EXTRACTION_ON_SAVE=False)
+    # Внутри транзакции теста close_old_connections() испортила бы соединение
+    @mock.patch('auth_freedom.extraction.close_old_connections')
+    def test_chunk_saves_through_signals(self, close_old_connections):
+        profile = make_candidate('x1', resume_text='Docker и Kubernetes в продакшене')
+        FacetDelta.objects.all().delete()
+        self.assertEqual(extract_chunk(profile.id, profile.id), (1, 1, 2))
+        profile.refresh_from_db()
+        self.assertEqual(profile.hard_skills, ['Docker', 'Kubernetes'])
+        self.assertEqual(len(profile.hard_skill_ids), 2)
+        self.assertTrue(FacetDelta.objects.filter(dimension='hard_skills').exists())
+
+
+RESUME = (
+    'Пять лет разрабатываю backend на Python и Django, проектирую схемы PostgreSQL, '
+    'пишу асинхронные сервисы, настраиваю очереди задач, CI и мониторинг, провожу ревью кода '
+    'и обучаю младших разработчиков команды'
+)
+
+
+class DedupeTests(TestCase):
+    def tokens(self, text):
+        words = text.split()
+        return {' '.join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+    def test_minhash_estimates_jaccard(self):
+        same = minhash(self.tokens(RESUME))
+        edited = minhash(self.tokens(RESUME.replace('Пять', 'Шесть')))
+        other = minhash(self.tokens('Дизайнер интерфейсов: Figma, прототипы, исследования пользователей и дизайн-системы'))
+        self.assertGreater(similarity(list(same), list(edited)), 0.7)
+        self.assertLess(similarity(list(same), list(other)), 0.2)
+        # Хоть одна общая полоса у почти одинаковых, ни одной — у разных
+        self.assertTrue(set(band_hashes(same)) & set(band_hashes(edited)))
+        self.assertFalse(set(band_hashes(same)) & set(band_hashes(other)))
+
+    def test_similar_profiles_are_paired(self):
+        first = make_candidate('d1', first_name='Асель', last_name='Нурланова', resume_text=RESUME)
+        second = make_candidate('d2', first_name='Асель', last_name='Нурланова', resume_text=RESUME + ' и стажёров')
+        make_candidate('d3', first_name='Данияр', resume_text='Дизайнер интерфейсов: Figma, прототипы и дизайн-системы')
+        call_command('find_duplicates', stdout=StringIO())
+        pairs = list(DuplicateCandidate.objects.values_list('profile_a_id', 'profile_b_id', 'reason'))
+        self.assertEqual(pairs, [(first.id, second.id, 'similar')])
+
+    def test_full_run_checks_unchanged_profiles(self):
+        make_candidate('d4', resume_text=RESUME, email='same@example.com')
+        make_candidate('d5', resume_text='Другой текст резюме', email='Same+jobs@example.com')
+        call_command('find_duplicates', stdout=StringIO())
+        DuplicateCandidate.objects.all().delete()
+        call_command('find_duplicates', stdout=StringIO())
+        self.assertFalse(DuplicateCandidate.objects.exists())
+        call_command('find_duplicates', '--full', stdout=StringIO())
+        self.assertEqual(list(DuplicateCandidate.objects.values_list('reason', flat=True)), ['email'])
+
+    @override_settings(DEDUPE_MAX_BLOCK=2)
+    def test_oversized_exact_block_is_skipped(self):
+        for index in range(3):
+            make_candidate(f'd{6 + index}', phone='+77010000001')
+        with self.assertLogs('auth_freedom.dedupe', 'WARNING'):
+            call_command('find_duplicates', stdout=StringIO())
+        self.assertFalse(DuplicateCandidate.objects.filter(reason='phone').exists())
+
+
+class SimilarTests(TestCase):
+    def setUp(self):
+        texts = [
+            ('backend', 'senior', ['Python', 'Django'], 'Backend на Python, Django REST и PostgreSQL, очереди Celery'),
+            ('backend2', 'middle', ['Python', 'FastAPI'], 'Сервисы на Python и FastAPI, PostgreSQL, Docker'),
+            ('front', 'middle', ['React', 'TypeScript'], 'Интерфейсы на React и TypeScript, дизайн-системы'),
+            ('front2', 'senior', ['Vue.js', 'TypeScript'], 'Vue.js и TypeScript, вёрстка интерфейсов'),
+            ('devops', 'senior', ['Docker', 'Kubernetes'], 'Kubernetes, Docker, мониторинг и CI для сервисов'),
+        ]
+        self.profiles = {
+            name: make_candidate(f's_{name}', level=level, hard_skills=skills, resume_text=text)
+            for name, level, skills, text in texts
+        }
+
+    def neighbours(self):
+        return {
+            profile_id: (neighbours, [round(score, 4) for score in scores])
+            for profile_id, neighbours, scores in CandidateVector.objects.values_list('profile_id', 'neighbours', 'scores')
+        }
+
+    def test_incremental_update_matches_full_rebuild(self):
+        rebuild()
+        # Меняются навыки и уровень: частоты слов, а с ними и IDF, остаются
+        # прежними, поэтому результат должен совпасть с полной перестройкой
+        changed = self.profiles['front']
+        changed.hard_skills = ['React', 'Docker']
+        changed.level = 'senior'
+        changed.save()
+        update(pending_ids())
+        incremental = self.neighbours()
+        rebuild()
+        self.assertEqual(incremental, self.neighbours())
+
+    def test_deactivated_profile_leaves_neighbour_lists(self):
+        rebuild()
+        removed = self.profiles['backend2']
+        self.assertIn(removed.id, self.neighbours()[self.profiles['backend'].id][0])
+        removed.is_active = False
+        removed.save()
+        update(pending_ids())
+        lists = self.neighbours()
+        self.assertNotIn(removed.id, lists)
+        self.assertFalse(any(removed.id in neighbours for neighbours, _ in lists.values()))
+
+    def test_neighbour_candidates_are_bounded(self):
+        rebuild()
+        vector = CandidateVector.objects.get(pk=self.profiles['backend'].id)
+        with override_settings(SIMILAR_MAX_CANDIDATES=1):
+            scored = neighbours_of(vector, 5)
+        self.assertEqual([other.profile_id for other, _ in scored], [self.profiles['backend2'].id])
+
+    def test_common_skills_are_dropped(self):
+        common, rare = feature_id('s:1'), feature_id('s:2')
+        profile = self.profiles['backend']
+        profile.hard_skill_ids, profile.tech_stack_ids = [1, 2], []
+        vector = build_vector(profile, Vocabulary({common: 90, rare: 3}, 100))
+        self.assertNotIn(common, vector.terms)
+        self.assertIn(rare, vector.terms)
+
+    def test_negative_limit_is_rejected(self):
+        recruiter = User.objects.create_user(username='hr2', password='x', user_type='recruiter')
+        self.client.force_login(recruiter)
+        url = f'/candidates/{self.profiles["backend"].id}/similar/'
+        self.assertEqual(self.client.get(url, {'limit': '-1'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': '2'}).status_code, 200)
+
+
+class LocationTests(TestCase):
+    def setUp(self):
+        caches['locations'].clear()
+        self.ids = dict(Location.objects.values_list('name', 'id'))
+
+    def test_resolve_spellings(self):
+        kz, almaty = self.ids['Казахстан'], self.ids['Алматы']
+        self.assertEqual(resolve('Казахстан', 'Алматы'), (kz, almaty))
+        # Страна берётся из найденного города
+        self.assertEqual(resolve('', '  Алма-Ата '), (kz, almaty))
+        self.assertEqual(resolve('KZ', 'Все регионы'), (kz, None))
+        self.assertEqual(resolve('Атлантида', ''), (None, None))
+
+    def test_region_filter_includes_cities(self):
+        field, ids = filter_ids('region', 'Карагандинская область')
+        self.assertEqual(field, 'region_id')
+        self.assertEqual(set(ids), {self.ids['Карагандинская область'], self.ids['Караганда']})
+        self.assertEqual(filter_ids('country', 'kz'), ('country_id', [self.ids['Казахстан']]))
+        self.assertIsNone(filter_ids('region', 'Атлантида'))
+
+    def test_search_by_region(self):
+        inside = make_candidate('l1', country='Казахстан', region='Караганда')
+        make_candidate('l2', country='Казахстан', region='Алматы')
+        page, _ = search_candidates({'region': 'карагандинская область'})
+        self.assertEqual([profile.id for profile in page], [inside.id])
+
+    def test_cached_miss_is_dropped_when_reference_changes(self):
+        self.assertEqual(resolve('', 'Темиртау'), (None, None))
+        with self.captureOnCommitCallbacks(execute=True):
+            city = Location.objects.create(
+                name='Темиртау', kind='city', parent_id=self.ids['Карагандинская область'],
+            )
+            LocationAlias.objects.create(location=city, alias='темиртау')
+        self.assertEqual(resolve('', 'Темиртау'), (self.ids['Казахстан'], city.id))
+
+
+class SkillTests(TestCase):
+    def setUp(self):
+        caches['skills'].clear()
+
+    def test_intern_collapses_spellings(self):
+        names, ids = intern(['python', ' Питон ', 'Django', 'Квантовый   блокчейн'])
+        self.assertEqual(names, ['Python', 'Django', 'Квантовый блокчейн'])
+        self.assertEqual(len(ids), 3)
+        # Второй раз навык не создаётся
+        self.assertEqual(intern(['квантовый блокчейн']), (['Квантовый блокчейн'], [ids[2]]))
+        self.assertEqual(Skill.objects.filter(name='Квантовый блокчейн').count(), 1)
+
+    def test_lookup_and_canonical_names_do_not_write(self):
+        self.assertEqual(lookup(['JS', 'неизвестно'])['js'][1], 'JavaScript')
+        self.assertNotIn('неизвестно', lookup(['неизвестно']))
+        self.assertEqual(canonical_names(['js', 'Неизвестно', 'javascript']), ['JavaScript', 'Неизвестно'])
+        self.assertFalse(Skill.objects.filter(name='Неизвестно').exists())
+
+    def test_intern_profile_skills_fills_ids(self):
+        profile = make_candidate('sk1')
+        profile.hard_skills = ['golang', 'k8s']
+        profile.languages = ['english']
+        changed = intern_profile_skills(profile, update_fields=['hard_skills', 'languages'])
+        self.assertEqual(changed, {'hard_skill_ids', 'language_ids'})
+        self.assertEqual(profile.hard_skills, ['Go', 'Kubernetes'])
+        self.assertEqual(profile.languages, ['Английский'])
+        self.assertEqual(len(profile.hard_skill_ids), 2)
+
+    def test_rename_invalidates_cache(self):
+        self.assertEqual(lookup(['postgres'])['postgres'][1], 'PostgreSQL')
+        skill = Skill.objects.get(kind='skill', name='PostgreSQL')
+        with self.captureOnCommitCallbacks(execute=True):
+            skill.name = 'Postgres'
+            skill.save()
+        self.assertEqual(lookup(['postgres'])['postgres'][1], 'Postgres')
+
+    def test_overlap_with_large_ids(self):
+        self.assertEqual(skill_overlap([1, 5, 10 ** 12], [10 ** 12, 5, 7]), 2)
+
+
+class VerifiedTokenCacheTests(SimpleTestCase):
+    def claims(self, ttl=60):
+        return {'user_id': 1, 'exp': time.time() + ttl}
+
+    def test_least_recently_used_is_evicted(self):
+        cache = VerifiedTokenCache(max_size=2)
+        cache.set('a', self.claims())
+        cache.set('b', self.claims())
+        cache.get('a')
+        cache.set('c', self.claims())
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats()['size'], 2)
+
+    def test_entry_expires_with_token(self):
+        cache = VerifiedTokenCache()
+        cache.set('a', self.claims(ttl=10))
+        with mock.patch('auth_freedom.middleware.time.time', return_value=time.time() + 11):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_token_without_exp_is_not_cached(self):
+        cache = VerifiedTokenCache()
+        cache.set('a', {'user_id': 1})
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats(), {'hits': 0, 'misses': 1, 'size': 0})
+
+
+class ClaimsUserTests(TestCase):
+    def test_inactive_user_is_anonymous(self):
+        user = User.objects.create_user(username='c1', password='x', user_type='candidate')
+        claims = {'user_id': user.id}
+        self.assertEqual(get_user_from_claims(claims), user)
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        self.assertFalse(get_user_from_claims(claims).is_authenticated)
+        self.assertFalse(async_to_sync(aget_user_from_claims)(claims).is_authenticated)
+
+
+class TrackedFieldsTests(TestCase):
+    # Администратор без профиля: сигналы пользователя не дают лишних запросов
+    def updates(self, context):
+        return [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+
+    def test_unchanged_save_skips_update(self):
+        User.objects.create_user(username='t1', password='x', user_type='admin')
+        user = User.objects.get(username='t1')
+        with CaptureQueriesContext(connection) as context:
+            user.save()
+        self.assertEqual(context.captured_queries, [])
+
+    def test_update_limited_to_changed_fields(self):
+        User.objects.create_user(username='t1', password='x', user_type='admin', email='t1@example.com')
+        user = User.objects.get(username='t1')
+        user.first_name = 'Анна'
+        with CaptureQueriesContext(connection) as context:
+            user.save()
+        updates = self.updates(context)
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"first_name"', updates[0])
+        self.assertNotIn('"email"', updates[0])
+        self.assertEqual(user.get_dirty_fields(), set())
+
+    def test_deferred_fields_are_not_written_or_loaded(self):
+        User.objects.create_user(username='t1', password='x', user_type='admin', email='t1@example.com')
+        user = User.objects.only('id', 'first_name', 'user_type').get(username='t1')
+        user.first_name = 'Анна'
+        with CaptureQueriesContext(connection) as context:
+            user.save()
+        # Один UPDATE без подгрузки отложенных полей
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('"email"', context.captured_queries[0]['sql'])
+        self.assertEqual(User.objects.get(username='t1').email, 't1@example.com')
+
+    def test_in_place_array_change_is_detected(self):
+        profile = make_candidate('t1', languages=['Русский'])
+        profile = CandidateProfile.objects.get(pk=profile.pk)
+        profile.languages.append('English')
+        self.assertIn('languages', profile.get_dirty_fields())
+        profile.save()
+        self.assertEqual(CandidateProfile.objects.get(pk=profile.pk).languages, ['Русский', 'English'])
+
+
+class ImportCandidatesTests(TestCase):
+    def setUp(self):
+        caches['skills'].clear()
+        caches['locations'].clear()
+
+    def run_import(self, rows):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'candidates.jsonl'
+            path.write_text('\n'.join(json.dumps(row, ensure_ascii=False) for row in rows), encoding='utf-8')
+            call_command('import_candidates', str(path), stdout=StringIO())
+
+    def test_insert_fills_skill_and_location_ids(self):
+        self.run_import([{
+            'email': 'New@Example.com', 'first_name': 'Дана', 'country': 'Казахстан', 'region': 'Алматы',
+            'hard_skills': 'python, k8s', 'experience': '4',
+        }])
+        profile = CandidateProfile.objects.get(user__email='new@example.com')
+        self.assertEqual(profile.experience, 4)
+        self.assertEqual(profile.hard_skills, ['Python', 'Kubernetes'])
+        self.assertEqual(len(profile.hard_skill_ids), 2)
+        self.assertEqual(profile.region_id, Location.objects.get(name='Алматы').id)
+        self.assertEqual(profile.country_id, Location.objects.get(name='Казахстан').id)
+
+    def test_update_by_email_moves_location(self):
+        profile = make_candidate('im1', country='Казахстан', region='Алматы')
+        User.objects.filter(pk=profile.user_id).update(email='im1@example.com')
+        self.run_import([{'email': 'IM1@example.com', 'region': 'Караганда', 'level': 'senior'}])
+        profile.refresh_from_db()
+        self.assertEqual(profile.level, 'senior')
+        self.assertEqual(profile.region_id, Location.objects.get(name='Караганда').id)
+        self.assertEqual(CandidateProfile.objects.count(), 1)
+
+    def test_malformed_row_is_skipped(self):
+        self.run_import([
+            {'email': 'bad@example.com', 'experience': 'много'},
+            {'email': 'good@example.com'},
+            {'first_name': 'Без почты'},
+        ])
+        self.assertEqual(list(User.objects.values_list('email', flat=True)), ['good@example.com'])
+
+
+class ProfileCacheTests(TestCase):
+    def setUp(self):
+        caches['profiles'].clear()
+        self.profile = make_candidate('pc1', specialization='Backend')
+        self.user = self.profile.user
+
+    def test_profile_save_invalidates_body(self):
+        self.assertIn('Backend', profile_body('candidate', self.user))
+        with self.assertNumQueries(0):
+            profile_body('candidate', self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.specialization = 'Frontend'
+            self.profile.save()
+        self.assertIn('Frontend', profile_body('candidate', self.user))
+
+    def test_user_save_invalidates_body(self):
+        self.assertIn('pc1', profile_body('candidate', self.user))
+        # Логин в профиль не копируется: сбросить тело должен сигнал пользователя
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.username = 'pc1-renamed'
+            self.user.save()
+        self.assertIn('pc1-renamed', profile_body('candidate', self.user))
+
+
+class SlowHashing:
+    # Пул хеширования, который отвечает через паузу и запоминает, сколько
+    # вызовов ожидали одновременно
+    def __init__(self):
+        self.active = self.peak = 0
+
+    async def run(self, func, *args):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.05)
+        self.active -= 1
+        return (True, None, 1.0), 2.0
+
+
+class AsyncLoginTests(TestCase):
+    def setUp(self):
+        caches['ratelimit'].clear()
+        for username in ('al1', 'al2'):
+            User.objects.create_user(username=username, password='x', user_type='candidate')
+
+    async def test_concurrent_logins_overlap(self):
+        hashing = SlowHashing()
+        with mock.patch('auth_freedom.backends.hashing_service', hashing):
+            users = await asyncio.gather(
+                aauthenticate(None, username='al1', password='x'),
+                aauthenticate(None, username='al2', password='x'),
+            )
+        self.assertEqual([user.username for user in users], ['al1', 'al2'])
+        self.assertEqual(users[0].backend, 'auth_freedom.backends.PooledModelBackend')
+        self.assertEqual(hashing.peak, 2)
+
+    async def test_full_hash_queue_returns_503(self):
+        with mock.patch('auth_freedom.backends.hashing_service.run', side_effect=HashingBusy):
+            response = await self.async_client.post('/login/', {'username': 'al1', 'password': 'x'})
+        self.assertEqual(response.status_code, 503)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.recruiter = User.objects.create_user(username='hr3', password='x', user_type='recruiter')
+        self.profile = self.recruiter.recruiter_profile
+
+    def live(self, field):
+        return counter_value(RecruiterProfile, self.profile.id, field)
+
+    def test_increments_spread_over_shards_and_fold(self):
+        # Параллельные запросы попадают в разные шарды; в одном шарде
+        # приращения складываются в одну строку
+        for shard in (0, 3, 3, 7):
+            with mock.patch('auth_freedom.counters.random.randrange', return_value=shard):
+                increment(RecruiterProfile, self.profile.id, 'processed_applications')
+        self.assertEqual(CounterShard.objects.count(), 3)
+        self.assertEqual(self.live('processed_applications'), 4)
+        self.assertEqual(RecruiterProfile.objects.get(pk=self.profile.pk).processed_applications, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(fold_counters(batch_size=2), 3)
+        self.assertFalse(CounterShard.objects.exists())
+        self.assertEqual(RecruiterProfile.objects.get(pk=self.profile.pk).processed_applications, 4)
+        self.assertEqual(self.live('processed_applications'), 4)
+
+    def test_profile_save_keeps_folded_value(self):
+        profile = RecruiterProfile.objects.get(pk=self.profile.pk)
+        increment(RecruiterProfile, self.profile.id, 'processed_applications', 5)
+        fold_counters()
+        # Загруженный до переноса профиль сохраняет только изменённые поля
+        profile.department = 'HR'
+        profile.save()
+        self.assertEqual(RecruiterProfile.objects.get(pk=self.profile.pk).processed_applications, 5)
+
+    def test_process_application_view(self):
+        candidate = make_candidate('ca1')
+        self.client.force_login(self.recruiter)
+        url = f'/candidates/{candidate.id}/process/'
+        self.assertEqual(self.client.post(url, {'result': 'maybe'}).status_code, 400)
+        response = self.client.post(url, {'result': 'success'})
+        self.assertEqual(response.json(), {'processed_applications': 1, 'successful_applications': 1})
+        response = self.client.post(url, {'result': 'rejected'})
+        self.assertEqual(response.json(), {'processed_applications': 2, 'successful_applications': 1})
+        self.assertEqual(counter_value(CandidateProfile, candidate.id, 'applications_count'), 2)
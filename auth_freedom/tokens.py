@@ -0,0 +1,115 @@
+from django.conf import settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import CandidateProfile, RecruiterProfile
+
+
+def stateless_auth_enabled():
+    return getattr(settings, 'JWT_STATELESS_AUTH', False)
+
+
+def profile_model_for(user):
+    if user.user_type == 'candidate':
+        return CandidateProfile
+    if user.user_type in ['recruiter', 'admin'] or user.is_superuser:
+        return RecruiterProfile
+    return None
+
+
+def profile_id_for(user):
+    model = profile_model_for(user)
+    if model is None:
+        return None
+    return model.objects.filter(user=user).values_list('id', flat=True).first()
+
+
+async def aprofile_id_for(user):
+    model = profile_model_for(user)
+    if model is None:
+        return None
+    return await model.objects.filter(user=user).values_list('id', flat=True).afirst()
+
+
+def tokens_for_user(user):
+    return build_tokens(user, profile_id_for(user))
+
+
+async def atokens_for_user(user):
+    return build_tokens(user, await aprofile_id_for(user))
+
+
+def build_tokens(user, profile_id):
+    # Всё, что нужно для обычного просмотра страниц, кладём в claims, чтобы
+    # не обращаться к сессии и таблице пользователей. Access-токен копирует
+    # claims из refresh-токена
+    refresh = RefreshToken.for_user(user)
+    refresh['username'] = user.get_username()
+    refresh['name'] = user.get_full_name()
+    refresh['user_type'] = user.user_type
+    refresh['profile_id'] = profile_id
+    refresh['is_staff'] = user.is_staff
+    refresh['is_superuser'] = user.is_superuser
+    return refresh
+
+
+def set_token_cookies(response, access, refresh=None):
+    secure = not settings.DEBUG
+    response.set_cookie(
+        'access_token', str(access),
+        max_age=int(settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds()),
+        httponly=True, secure=secure, samesite='Lax',
+    )
+    if refresh is not None:
+        # Путь '/': cookie нужна и /token/refresh/, и /logout/, который её отзывает
+        response.set_cookie(
+            'refresh_token', str(refresh),
+            max_age=int(settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds()),
+            httponly=True, secure=secure, samesite='Lax',
+        )
+    return response
+
+
+def delete_token_cookies(response):
+    response.delete_cookie('access_token')
+    response.delete_cookie('refresh_token')
+    # Cookie, выданные раньше с путём /token/
+    response.delete_cookie('refresh_token', path='/token/')
+    return response
+
+
+class ClaimsUser:
+    # Пользователь, восстановленный из claims токена без запросов к БД
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, claims):
+        self.claims = claims
+        # simplejwt записывает user_id строкой
+        self.id = self.pk = int(claims[settings.SIMPLE_JWT['USER_ID_CLAIM']])
+        self.username = claims.get('username', '')
+        self.user_type = claims.get('user_type', '')
+        self.profile_id = claims.get('profile_id')
+        self.is_staff = claims.get('is_staff', False)
+        self.is_superuser = claims.get('is_superuser', False)
+
+    def __str__(self):
+        return self.username
+
+    def get_username(self):
+        return self.username
+
+    def get_full_name(self):
+        return self.claims.get('name', '')
+
+    @property
+    def candidate_profile(self):
+        if self.profile_id is None:
+            raise CandidateProfile.DoesNotExist
+        return CandidateProfile.objects.select_related('user').get(pk=self.profile_id, user_id=self.id)
+
+    @property
+    def recruiter_profile(self):
+        if self.profile_id is None:
+            raise RecruiterProfile.DoesNotExist
+        return RecruiterProfile.objects.select_related('user').get(pk=self.profile_id, user_id=self.id)
@@ -9,4 +9,14 @@ urlpatterns = [
     path('register/', views.register_view, name='register'),
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.profile_view, name='profile'),
+    path('token/', views.token_obtain_view, name='token_obtain'),
+    path('token/refresh/', views.token_refresh_view, name='token_refresh'),
+    path('candidates/search/', views.candidate_search_view, name='candidate_search'),
+    path('candidates/export/', views.candidate_export_view, name='candidate_export'),
+    path('candidates/facets/', views.candidate_facets_view, name='candidate_facets'),
+    path('candidates/<int:profile_id>/similar/', views.similar_candidates_view, name='similar_candidates'),
+    path('candidates/<int:profile_id>/process/', views.process_application_view, name='process_application'),
+    path('resume/upload/', views.resume_upload_view, name='resume_upload'),
+    path('resume/jobs/<int:job_id>/', views.resume_job_view, name='resume_job'),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
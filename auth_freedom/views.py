@@ -1,70 +1,354 @@
+import hmac
+import math
+import os
+
 from django.shortcuts import render, redirect
-from django.contrib.auth import login, logout, authenticate
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_GET, require_POST
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from asgiref.sync import sync_to_async
+from django.contrib.auth import alogin, alogout
 from django.contrib.auth.decorators import login_required
+from .backends import aauthenticate
 from .forms import ExtendedUserRegistrationForm, UserLoginForm
 from django.contrib import messages
-from .models import RecruiterProfile, CandidateProfile
+from .models import CandidateProfile, RecruiterProfile, ResumeJob
+from .instrumentation import metrics
+from .hashing import HashingBusy, RateLimited, check_rate, hash_password
+from .profile_cache import aprofile_body
+from .counters import acounter_values, arecord_application
+from .export import aexport_candidates, export_candidates, export_queryset
+from .facets import afacet_counts
+from .jobs import MULTIPART_OVERHEAD, enqueue, max_upload_bytes
+from .resume import supported_extensions
+from .revocation import arevoke_token, is_revoked, revoke_token
+from .search import RESULT_FIELDS, SearchError, aresolve_skills, asearch_candidates, serialize_candidate
+from .similar import asimilar_ids
+from .tokens import (
+    atokens_for_user, delete_token_cookies, set_token_cookies, stateless_auth_enabled,
+)
 
 def redirect_to_login(request):
     return redirect('auth_freedom:login')
 
-def login_view(request):
+async def resolve_user(request):
+    # В асинхронном представлении пользователь загружается асинхронно заранее,
+    # иначе шаблон обратился бы к ленивому request.user синхронно
+    request.user = await request.auser()
+    return request.user
+
+async def login_and_redirect(request, user):
+    response = redirect('auth_freedom:profile')
+    if stateless_auth_enabled():
+        # Без сессии: пользователь и профиль записаны в claims токена
+        refresh = await atokens_for_user(user)
+        return set_token_cookies(response, refresh.access_token, refresh)
+    await alogin(request, user)
+    return response
+
+def hashing_unavailable(request, template, form, error):
+    # Лимит попыток или переполненная очередь хеширования
+    if isinstance(error, RateLimited):
+        messages.error(request, 'Слишком много попыток, повторите позже')
+        response = render(request, template, {'form': form}, status=429)
+        response['Retry-After'] = str(math.ceil(error.retry_after))
+        return response
+    messages.error(request, 'Сервис перегружен, повторите позже')
+    return render(request, template, {'form': form}, status=503)
+
+async def login_view(request):
+    await resolve_user(request)
     if request.method == 'POST':
         form = UserLoginForm(request.POST)
         if form.is_valid():
             username = form.cleaned_data.get('username')
             password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
+            try:
+                await check_rate(request, username)
+                user = await aauthenticate(request, username=username, password=password)
+            except (RateLimited, HashingBusy) as e:
+                return hashing_unavailable(request, 'auth_freedom/login.html', form, e)
             if user is not None:
-                login(request, user)
-                return redirect('auth_freedom:profile')
+                return await login_and_redirect(request, user)
             else:
                 messages.error(request, 'Неверное имя пользователя или пароль')
     else:
         form = UserLoginForm()
     return render(request, 'auth_freedom/login.html', {'form': form})
 
-def register_view(request):
+async def register_view(request):
+    await resolve_user(request)
     if request.method == 'POST':
         form = ExtendedUserRegistrationForm(request.POST)
-        if form.is_valid():
-            user = form.save()
-            login(request, user)
-            return redirect('auth_freedom:profile')
+        # Валидация формы проверяет уникальность в БД, поэтому идёт через поток
+        if await sync_to_async(form.is_valid)():
+            try:
+                await check_rate(request)
+                form.password_hash, form.timings = await hash_password(form.cleaned_data['password1'])
+            except (RateLimited, HashingBusy) as e:
+                return hashing_unavailable(request, 'auth_freedom/register.html', form, e)
+            user = await sync_to_async(form.save)()
+            return await login_and_redirect(request, user)
     else:
         form = ExtendedUserRegistrationForm()
     return render(request, 'auth_freedom/register.html', {'form': form})
 
 @login_required
-def logout_view(request):
-    logout(request)
-    return redirect('auth_freedom:login')
+async def logout_view(request):
+    # Отзываем оба токена, иначе они остались бы действительны до exp
+    for token_class, cookie in ((AccessToken, 'access_token'), (RefreshToken, 'refresh_token')):
+        if request.COOKIES.get(cookie):
+            try:
+                await arevoke_token(token_class(request.COOKIES[cookie]).payload)
+            except TokenError:
+                pass
+    if not stateless_auth_enabled():
+        await alogout(request)
+    return delete_token_cookies(redirect('auth_freedom:login'))
 
 @login_required
-def profile_view(request):
-    user = request.user
+async def profile_view(request):
+    user = await resolve_user(request)
+    if is_recruiter(user):
+        kind = 'recruiter'
+    elif user.user_type == 'candidate':
+        kind = 'candidate'
+    else:
+        messages.error(request, 'Неверный тип пользователя')
+        return redirect('auth_freedom:login')
     try:
-        if user.is_superuser or user.user_type in ['recruiter', 'admin']:
-            profile, created = RecruiterProfile.objects.get_or_create(
-                user=user,
-                defaults={
-                    'experience': 0,
-                    'specialization': 'Администратор' if user.is_superuser or user.user_type == 'admin' else 'Рекрутер',
-                    'company': 'Freedom HK',
-                    'region': 'Все регионы',
-                    'languages': ['Русский', 'Английский'],
-                    'active_vacancies': 0
-                }
-            )
-            template = 'auth_freedom/recruiter_profile.html'
-        elif user.user_type == 'candidate':
-            profile = user.candidate_profile
-            template = 'auth_freedom/candidate_profile.html'
-        else:
-            messages.error(request, 'Неверный тип пользователя')
-            return redirect('auth_freedom:login')
-            
-        return render(request, template, {'profile': profile})
-    except (RecruiterProfile.DoesNotExist, CandidateProfile.DoesNotExist):
+        body = await aprofile_body(kind, user)
+    except CandidateProfile.DoesNotExist:
         messages.error(request, 'Профиль не найден')
-        return redirect('auth_freedom:login')
\ No newline at end of file
+        return redirect('auth_freedom:login')
+    return render(request, f'auth_freedom/{kind}_profile.html', {'profile_body': body})
+
+def is_recruiter(user):
+    return user.is_superuser or user.user_type in ['recruiter', 'admin']
+
+@login_required
+@require_GET
+async def candidate_search_view(request):
+    if not is_recruiter(await resolve_user(request)):
+        return JsonResponse({'error': 'Доступ запрещен'}, status=403)
+    try:
+        profiles, next_cursor = await asearch_candidates(request.GET)
+    except SearchError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'results': [serialize_candidate(profile) for profile in profiles],
+        'next_cursor': next_cursor,
+    })
+
+@login_required
+@require_GET
+async def candidate_export_view(request):
+    if not is_recruiter(await resolve_user(request)):
+        return JsonResponse({'error': 'Доступ запрещен'}, status=403)
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in ('csv', 'jsonl'):
+        return JsonResponse({'error': 'Поддерживаются форматы csv и jsonl'}, status=400)
+    compress = request.GET.get('gzip') in ('1', 'true')
+    try:
+        queryset = export_queryset(request.GET, await aresolve_skills(request.GET))
+    except SearchError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    filename = f'candidates.{file_format}' + ('.gz' if compress else '')
+    content_type = 'application/gzip' if compress else (
+        'text/csv; charset=utf-8' if file_format == 'csv' else 'application/x-ndjson; charset=utf-8'
+    )
+    # StreamingHttpResponse под WSGI собирает асинхронный итератор в список
+    # целиком, а под ASGI — синхронный; итератор выбирается по обработчику
+    export = aexport_candidates if isinstance(request, ASGIRequest) else export_candidates
+    response = StreamingHttpResponse(export(queryset, file_format, compress), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@login_required
+@require_GET
+async def candidate_facets_view(request):
+    if not is_recruiter(await resolve_user(request)):
+        return JsonResponse({'error': 'Доступ запрещен'}, status=403)
+    try:
+        facets = await afacet_counts(request.GET)
+    except SearchError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'facets': facets})
+
+@login_required
+@require_GET
+async def similar_candidates_view(request, profile_id):
+    if not is_recruiter(await resolve_user(request)):
+        return JsonResponse({'error': 'Доступ запрещен'}, status=403)
+    try:
+        limit = int(request.GET.get('limit', 0))
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        return JsonResponse({'error': 'Некорректное значение limit'}, status=400)
+    # Список посчитан заранее (manage.py update_similar); здесь только чтение
+    neighbours = await asimilar_ids(profile_id, limit or None)
+    profiles = {
+        profile.id: profile async for profile in CandidateProfile.objects.filter(
+            id__in=[neighbour_id for neighbour_id, _ in neighbours], is_active=True,
+        ).only(*RESULT_FIELDS)
+    }
+    return JsonResponse({'results': [
+        {**serialize_candidate(profiles[neighbour_id]), 'similarity': score}
+        for neighbour_id, score in neighbours if neighbour_id in profiles
+    ]})
+
+@login_required
+@require_POST
+async def process_application_view(request, profile_id):
+    # Рекрутер отмечает отклик кандидата обработанным (result=success|rejected).
+    # Счётчики только получают приращения: запросы одного рекрутера не ждут
+    # друг друга на строке его профиля
+    user = await resolve_user(request)
+    if not is_recruiter(user):
+        return JsonResponse({'error': 'Доступ запрещен'}, status=403)
+    result = request.POST.get('result')
+    if result not in ('success', 'rejected'):
+        return JsonResponse({'error': 'Некорректное значение result'}, status=400)
+    recruiter_id = await RecruiterProfile.objects.filter(user_id=user.id).values_list('id', flat=True).afirst()
+    if recruiter_id is None or not await CandidateProfile.objects.filter(pk=profile_id).aexists():
+        return JsonResponse({'error': 'Профиль не найден'}, status=404)
+    await arecord_application(recruiter_id, profile_id, result == 'success')
+    processed = await acounter_values(RecruiterProfile, 'processed_applications', [recruiter_id])
+    successful = await acounter_values(RecruiterProfile, 'successful_applications', [recruiter_id])
+    return JsonResponse({
+        'processed_applications': processed[recruiter_id],
+        'successful_applications': successful[recruiter_id],
+    })
+
+@csrf_exempt
+@require_POST
+async def token_obtain_view(request):
+    form = UserLoginForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'error': 'Не указаны имя пользователя или пароль'}, status=400)
+    try:
+        await check_rate(request, form.cleaned_data['username'])
+        user = await aauthenticate(
+            request, username=form.cleaned_data['username'], password=form.cleaned_data['password'],
+        )
+    except RateLimited as e:
+        response = JsonResponse({'error': 'Слишком много попыток'}, status=429)
+        response['Retry-After'] = str(math.ceil(e.retry_after))
+        return response
+    except HashingBusy:
+        return JsonResponse({'error': 'Сервис перегружен'}, status=503)
+    if user is None:
+        return JsonResponse({'error': 'Неверное имя пользователя или пароль'}, status=401)
+    refresh = await atokens_for_user(user)
+    response = JsonResponse({'access': str(refresh.access_token), 'refresh': str(refresh)})
+    return set_token_cookies(response, refresh.access_token, refresh)
+
+@csrf_exempt
+@require_POST
+def token_refresh_view(request):
+    token = request.POST.get('refresh') or request.COOKIES.get('refresh_token')
+    if not token:
+        return JsonResponse({'error': 'No refresh token'}, status=401)
+    try:
+        claims = RefreshToken(token).payload
+    except TokenError:
+        return JsonResponse({'error': 'Invalid token'}, status=401)
+    if is_revoked(claims):
+        return JsonResponse({'error': 'Token revoked'}, status=401)
+    # Ротация и срок жизни берутся из настроек SIMPLE_JWT
+    serializer = TokenRefreshSerializer(data={'refresh': token})
+    try:
+        serializer.is_valid(raise_exception=True)
+    except (TokenError, InvalidToken, ValidationError):
+        return JsonResponse({'error': 'Invalid token'}, status=401)
+    except (AuthenticationFailed, ObjectDoesNotExist):
+        # Пользователь отключён или удалён после выдачи токена
+        return JsonResponse({'error': 'User inactive or deleted'}, status=401)
+    if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+        # Отзыв и проверка повтора одной операцией: из двух параллельных
+        # запросов с одним токеном новую пару получит только один
+        if not revoke_token(claims):
+            return JsonResponse({'error': 'Token revoked'}, status=401)
+    data = serializer.validated_data
+    response = JsonResponse(data)
+    return set_token_cookies(response, data['access'], data.get('refresh'))
+
+@csrf_exempt
+@login_required
+@require_POST
+def resume_upload_view(request):
+    # Размер проверяется по Content-Length до разбора тела: иначе
+    # CsrfViewMiddleware, читая request.POST, приняла бы файл целиком ещё до
+    # представления. CSRF проверяется после этого в _resume_upload
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    if not length:
+        return JsonResponse({'error': 'Не указан размер запроса'}, status=411)
+    if length > max_upload_bytes() + MULTIPART_OVERHEAD:
+        return JsonResponse({'error': 'Файл слишком большой'}, status=413)
+    return _resume_upload(request)
+
+@csrf_protect
+def _resume_upload(request):
+    # Файл сохраняется и ставится в очередь; разбирает его manage.py resume_worker
+    if request.user.user_type != 'candidate':
+        return JsonResponse({'error': 'Доступ запрещен'}, status=403)
+    uploaded = request.FILES.get('resume')
+    if uploaded is None:
+        return JsonResponse({'error': 'Файл не передан'}, status=400)
+    extension = os.path.splitext(uploaded.name)[1].lower()
+    if extension not in supported_extensions():
+        return JsonResponse({'error': 'Поддерживаются форматы: ' + ', '.join(sorted(supported_extensions()))}, status=400)
+    if uploaded.size > max_upload_bytes():
+        return JsonResponse({'error': 'Файл слишком большой'}, status=413)
+    try:
+        profile = CandidateProfile.objects.only('id').get(user_id=request.user.id)
+    except CandidateProfile.DoesNotExist:
+        return JsonResponse({'error': 'Профиль не найден'}, status=404)
+    job = enqueue(profile, uploaded)
+    return JsonResponse({'job_id': job.id, 'status': job.status}, status=202)
+
+@login_required
+@require_GET
+async def resume_job_view(request, job_id):
+    user = await resolve_user(request)
+    try:
+        job = await ResumeJob.objects.aget(pk=job_id, profile__user_id=user.id)
+    except ResumeJob.DoesNotExist:
+        return JsonResponse({'error': 'Задача не найдена'}, status=404)
+    return JsonResponse({
+        'job_id': job.id,
+        'status': job.status,
+        'attempts': job.attempts,
+        'error': job.error,
+        'finished_at': job.finished_at,
+    })
+
+def metrics_allowed(request):
+    # Сборщик метрик — по METRICS_TOKEN в заголовке Authorization: Bearer,
+    # человек — сотрудник, вошедший в админку. Адрес клиента не проверяется:
+    # за прокси REMOTE_ADDR у всех запросов один
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    scheme, _, value = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if token and scheme == 'Bearer' and hmac.compare_digest(value.encode(), token.encode()):
+        return True
+    return request.user.is_active and request.user.is_staff
+
+@require_GET
+def metrics_view(request):
+    # Гистограммы этого процесса в текстовом формате Prometheus
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
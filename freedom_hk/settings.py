@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'auth_freedom',
     'rest_framework',
     'rest_framework_simplejwt',
@@ -70,6 +71,12 @@ SIMPLE_JWT = {
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Снаружи остальных, чтобы видеть и запись сессии в ответе
+    'auth_freedom.middleware.ReplicaStickinessMiddleware',
+    # Замеры запроса (SQL, шаблоны, JWT, хеширование) и заголовок Server-Timing
+    'auth_freedom.middleware.RequestTimingMiddleware',
+    # Профилирование по запросу; при PROFILER_ENABLED = False не подключается
+    'auth_freedom.middleware.ProfilerMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,15 +85,36 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Режим без сессий: пользователь берётся только из JWT в cookie access_token.
+# Middleware сессий и аутентификации остаются для админки, но на обычных
+# страницах сессия не читается и не пишется
+JWT_STATELESS_AUTH = False
+# Пути — префиксы, кроме '/': корень (редирект на вход) исключается только сам.
+# /metrics/ проверяет доступ сам: METRICS_TOKEN или сотрудник с сессией админки
+JWT_EXEMPT_PATHS = ('/', '/admin/', '/login/', '/register/', '/token/', '/metrics/')
+
+if JWT_STATELESS_AUTH:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.auth.middleware.AuthenticationMiddleware') + 1,
+        'auth_freedom.middleware.JWTAuthenticationMiddleware',
+    )
+
 ROOT_URLCONF = 'freedom_hk.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендеринга для Server-Timing
+        'BACKEND': 'auth_freedom.instrumentation.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates']
         ,
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Скомпилированные шаблоны держатся в памяти процесса
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -111,9 +139,127 @@ DATABASES = {
         'PASSWORD': 'zharashan',  # Пароль ля доступа к базе данных
         'HOST': 'localhost',  # Адрес сервера базы данных
         'PORT': '5432',  # Порт сервера базы данных, обычно 5432 для PostgreSQL
+        # Постоянные соединения с проверкой перед повторным использованием
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'connect_timeout': 3},
     }
 }
 
+# Реплики для чтения профилей кандидатов и рекрутеров (auth_freedom.routers).
+# Псевдоним 'replica' по умолчанию смотрит в основную базу (в тестах —
+# зеркало default) и используется, только если указан в DATABASE_REPLICAS;
+# для настоящей реплики замените HOST/NAME
+DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['auth_freedom.routers.ReplicaRouter']
+
+# Сколько секунд после записи клиент читает с основной базы, как часто
+# проверяются реплики и какое отставание репликации допустимо
+REPLICA_STICKY_SECONDS = 10
+REPLICA_HEALTH_CHECK_SECONDS = 5
+REPLICA_MAX_LAG_SECONDS = 10
+
+# Кеш отрендеренных профилей. По умолчанию память процесса; при нескольких
+# воркерах нужен общий бэкенд (Redis, Memcached), иначе сброс после
+# сохранения профиля увидит только один процесс
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'profiles': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'profiles',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Написания навыков (auth_freedom.skills)
+    'skills': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'skills',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    # Справочник мест (auth_freedom.locations). Версия справочника лежит в
+    # том же кеше: с общим для процессов бэкендом (Redis, memcached) правка
+    # мест видна всем сразу, с локальным — не позже LOCATION_CACHE_TIMEOUT
+    'locations': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'locations',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Вёдра лимита попыток входа общие для всех процессов; таблицу создаёт
+    # manage.py createcachetable
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'auth_freedom_ratelimit',
+    },
+}
+
+RATELIMIT_CACHE_ALIAS = 'ratelimit'
+
+PROFILE_CACHE_ALIAS = 'profiles'
+PROFILE_CACHE_TIMEOUT = 3600
+
+SKILL_CACHE_ALIAS = 'skills'
+SKILL_CACHE_TIMEOUT = 3600
+
+LOCATION_CACHE_ALIAS = 'locations'
+LOCATION_CACHE_TIMEOUT = 300
+
+# Число строк-шардов на счётчик профиля (auth_freedom.counters): чем больше,
+# тем меньше параллельные инкременты ждут друг друга
+COUNTER_SHARDS = 16
+
+# Инструментирование запросов (auth_freedom.instrumentation): порог медленного
+# запроса для лога, заголовок Server-Timing и токен сборщика для /metrics/
+# (Authorization: Bearer <токен>); пустой — метрики видят только сотрудники
+SLOW_REQUEST_MS = 500
+SERVER_TIMING_HEADER = True
+METRICS_TOKEN = ''
+
+# Профилирование запросов (auth_freedom.profiler): доля случайных запросов,
+# срок действия подписанного заголовка и ограничения на хранимые дампы
+PROFILER_ENABLED = False
+PROFILER_SAMPLE_RATE = 0.0
+PROFILER_TOKEN_MAX_AGE = 3600
+PROFILER_DIR = BASE_DIR / 'profiles'
+PROFILER_MAX_FILES = 200
+PROFILER_MAX_FILE_BYTES = 5 * 1024 * 1024
+PROFILER_MAX_BYTES = 200 * 1024 * 1024
+
+# Загрузка и разбор резюме (auth_freedom.jobs, manage.py resume_worker)
+RESUME_UPLOAD_DIR = BASE_DIR / 'uploads' / 'resumes'
+RESUME_MAX_BYTES = 10 * 1024 * 1024
+RESUME_JOB_MAX_ATTEMPTS = 5
+RESUME_JOB_BACKOFF_SECONDS = 30
+# Задача в статусе running дольше этого считается брошенной и берётся снова
+RESUME_JOB_TIMEOUT = 600
+
+# Извлечение навыков из текста резюме (auth_freedom.extraction, manage.py extract_skills)
+SKILL_EXTRACTION_ON_SAVE = True
+# Однобуквенные написания ("c", "r") в обычном тексте дают ложные срабатывания
+SKILL_EXTRACTION_MIN_LENGTH = 2
+SKILL_EXTRACTION_RELOAD_SECONDS = 300
+
+# Поиск дублей кандидатов (auth_freedom.dedupe, manage.py find_duplicates)
+# Минимальная оценка сходства по MinHash для пары похожих профилей
+DEDUPE_SIMILARITY = 0.7
+# Профили с меньшим числом фраз в резюме сравниваются только по email и телефону
+DEDUPE_MIN_SHINGLES = 10
+# Email или телефон, общий для большего числа профилей, в пары не попадает
+DEDUPE_MAX_BLOCK = 50
+
+# Похожие кандидаты (auth_freedom.similar, manage.py update_similar)
+SIMILAR_TOP_K = 20
+# Веса составляющих сходства: text, skills, level, location
+SIMILAR_WEIGHTS = {}
+# Слова, встречающиеся в большей доле резюме, в векторы не входят
+SIMILAR_MAX_DF = 0.3
+SIMILAR_MAX_TERMS = 200
+# Поиск соседей: по стольким самым весомым признакам профиля и не больше
+# стольких кандидатов с наибольшим числом общих признаков
+SIMILAR_QUERY_TERMS = 32
+SIMILAR_MAX_CANDIDATES = 2000
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -132,6 +278,29 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Первый хешер — целевой: пароли в старых форматах перехешируются им при входе
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Проверка пароля в пуле процессов; authenticate() и admin идут через него
+AUTHENTICATION_BACKENDS = ['auth_freedom.backends.PooledModelBackend']
+
+# Пул процессов для хеширования паролей (по умолчанию — по числу ядер)
+# и предел очереди, после которого вход отвечает 503
+PASSWORD_HASH_WORKERS = None
+PASSWORD_HASH_MAX_QUEUE = 64
+
+# Ведро токенов (ёмкость, пополнение в секунду) до хеширования пароля
+PASSWORD_RATE_LIMITS = {
+    'ip': (20, 1.0),
+    'username': (5, 0.1),
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/